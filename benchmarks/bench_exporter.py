@@ -0,0 +1,47 @@
+"""Cost of a Prometheus scrape of a fleet of fully equipped plants
+
+Run with `uv run python benchmarks/bench_exporter.py`.
+"""
+import time
+from unittest.mock import patch
+
+from bench_memory import build_plant
+
+from pysolarfocus.prometheus import PrometheusExporter
+
+PLANTS = 50
+SCRAPES = 200
+
+
+def measure_scrape(plants: int = PLANTS, scrapes: int = SCRAPES) -> tuple:
+    """Returns the seconds of a scrape without changes and of an update followed by a scrape"""
+    exporter = PrometheusExporter()
+    fleet = []
+    with patch("pysolarfocus.ModbusConnector"):
+        for index in range(plants):
+            api = build_plant()
+            exporter.add_plant(api, {"plant": str(index)})
+            fleet.append(api)
+    names = list(fleet[0].component_manager.components)
+    for api in fleet:
+        exporter.update(api, {"system": api.system.value, "plant": "0"}, names)
+    exporter.exposition()
+
+    start = time.perf_counter()
+    for _ in range(scrapes):
+        exporter.exposition()
+    unchanged = (time.perf_counter() - start) / scrapes
+
+    start = time.perf_counter()
+    for round in range(scrapes):
+        for api in fleet:
+            api.heatpump.supply_temperature.value = round
+            exporter.update(api, {}, ["heatpump"])
+        exporter.exposition()
+    changed = (time.perf_counter() - start) / scrapes
+    return unchanged, changed
+
+
+if __name__ == "__main__":
+    unchanged, changed = measure_scrape()
+    print(f"scrape of {PLANTS} plants: {unchanged * 1e6:,.1f} us unchanged, {changed * 1e3:,.2f} ms after an update of every heat pump")
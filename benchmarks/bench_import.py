@@ -0,0 +1,62 @@
+"""Import time and cold start budget
+
+Run with `uv run python benchmarks/bench_import.py`. Exits non-zero if a budget is exceeded,
+so it can be used as a regression check.
+"""
+import statistics
+import subprocess
+import sys
+
+RUNS = 7
+
+# Budgets in milliseconds, generous enough for slow CI runners and small ARM boxes
+IMPORT_BUDGET_MS = 60.0
+COLD_START_BUDGET_MS = 400.0
+
+# Modules that must not be loaded by a plain `import pysolarfocus`
+LAZY_MODULES = ("pymodbus", "packaging", "importlib.metadata", "pysolarfocus.modbus_wrapper", "pysolarfocus.components.base.component")
+
+COLD_START = """
+import time
+start = time.perf_counter()
+from pysolarfocus import ApiVersions, SolarfocusAPI, Systems
+SolarfocusAPI(ip="localhost", heating_circuit_count=8, buffer_count=4, boiler_count=4, system=Systems.VAMPAIR, api_version=ApiVersions.V_26_020)
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure_import_ms() -> float:
+    """Returns the cumulative import time of pysolarfocus in a fresh interpreter, as reported by -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import pysolarfocus"], capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        _, _, cumulative, name = (p.strip() for p in line.replace(":", "|", 1).split("|"))
+        if name == "pysolarfocus":
+            return int(cumulative) / 1000
+    raise RuntimeError("pysolarfocus not found in import time report")
+
+
+def measure_cold_start_ms() -> float:
+    """Returns the time to import pysolarfocus and create a plant in a fresh interpreter"""
+    result = subprocess.run([sys.executable, "-c", COLD_START], capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def eagerly_imported_modules() -> list[str]:
+    """Returns the modules of LAZY_MODULES that a plain import loads"""
+    script = f"import sys, pysolarfocus; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+if __name__ == "__main__":
+    import_ms = statistics.median(measure_import_ms() for _ in range(RUNS))
+    cold_start_ms = statistics.median(measure_cold_start_ms() for _ in range(RUNS))
+    eager = eagerly_imported_modules()
+
+    print(f"import pysolarfocus: {import_ms:.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    print(f"cold start:          {cold_start_ms:.1f} ms (budget {COLD_START_BUDGET_MS:.0f} ms)")
+    print(f"eagerly imported:    {', '.join(eager) or 'none'}")
+
+    if import_ms > IMPORT_BUDGET_MS or cold_start_ms > COLD_START_BUDGET_MS or eager:
+        print("Import budget exceeded")
+        sys.exit(1)
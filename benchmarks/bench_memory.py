@@ -0,0 +1,44 @@
+"""Memory footprint of a fully equipped plant
+
+Run with `uv run python benchmarks/bench_memory.py`.
+"""
+import gc
+import tracemalloc
+
+from pysolarfocus import ApiVersions, SolarfocusAPI, Systems
+
+PLANTS = 50
+
+
+def build_plant() -> SolarfocusAPI:
+    return SolarfocusAPI(
+        ip="localhost",
+        heating_circuit_count=8,
+        buffer_count=4,
+        boiler_count=4,
+        fresh_water_module_count=4,
+        circulation_count=4,
+        differential_module_count=4,
+        solar_count=4,
+        system=Systems.VAMPAIR,
+        api_version=ApiVersions.V_26_020,
+    )
+
+
+def measure_bytes_per_plant(plants: int = PLANTS) -> float:
+    """Returns the memory allocated per plant, averaged over `plants` plants"""
+    # Warm up: the first plant pays for imports and one-off caches
+    build_plant()
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    held = [build_plant() for _ in range(plants)]
+    gc.collect()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return (end - start) / plants
+
+
+if __name__ == "__main__":
+    print(f"bytes per plant: {measure_bytes_per_plant():,.0f}")
@@ -1,10 +1,11 @@
 """Python client lib for Solarfocus"""
-import importlib.metadata
+import importlib
 from enum import Enum
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, List, Optional
 
-from packaging import version
-
-__version__ = importlib.metadata.version("pysolarfocus")
+if TYPE_CHECKING:
+    from packaging.version import Version
 
 # Default port for modbus
 PORT = 502
@@ -41,11 +42,44 @@ class ApiVersions(str, Enum):
 
     def greater_or_equal(self, api_version) -> bool:
         """Compare given version with own version."""
-        return version.parse(self.value) >= version.parse(api_version)
+        return _parse_version(self.value) >= _parse_version(api_version)
+
+
+@lru_cache(maxsize=None)
+def _parse_version(value: str) -> "Version":
+    """Parse a version once per process, it is compared on every component construction."""
+    from packaging import version
+
+    return version.parse(value)
+
+
+# The transport and the components are imported on first use, so that tools which
+# only need the enums or decode captured registers do not pay for pymodbus
+_LAZY_ATTRIBUTES = {
+    "ComponentFactory": ".component_factory",
+    "ComponentManager": ".component_manager",
+    "ModbusConnector": ".modbus_wrapper",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name == "__version__":
+        from importlib import metadata
+
+        value = metadata.version("pysolarfocus")
+    elif name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def _load(name: str) -> Any:
+    """Returns a lazily imported attribute of this module, preferring one already set (or patched)."""
+    return globals()[name] if name in globals() else __getattr__(name)
 
 
-from .component_factory import ComponentFactory
-from .component_manager import ComponentManager
 from .config_validator import ConfigValidator
 from .const import (
     SLAVE_ID,
@@ -56,7 +90,6 @@ from .const import (
     HeatPumpSgReadyMode,
 )
 from .exceptions import InvalidConfigurationError
-from .modbus_wrapper import ModbusConnector
 
 
 class SolarfocusAPI:
@@ -70,6 +103,10 @@ class SolarfocusAPI:
     def api_version(self) -> ApiVersions:
         return self._api_version
 
+    @property
+    def slave_id(self) -> int:
+        return self._slave_id
+
     def __init__(
         self,
         ip: str,
@@ -84,8 +121,16 @@ class SolarfocusAPI:
         port: int = PORT,
         slave_id: int = SLAVE_ID,
         api_version: ApiVersions = ApiVersions.V_21_140,
+        max_age: float = 0.0,
+        max_gap: int = 0,
     ):
-        """Initialize Solarfocus communication."""
+        """Initialize Solarfocus communication.
+
+        `max_age` is how many seconds a successful update is fresh enough to be
+        shared with later update calls instead of reading again (0 to always read).
+        `max_gap` is how many unpolled registers between the instances of a
+        multi-instance component are read to save requests (0 to read none).
+        """
         if not isinstance(system, Systems):
             raise InvalidConfigurationError("system not of type Systems")
         if not isinstance(api_version, ApiVersions):
@@ -100,13 +145,13 @@ class SolarfocusAPI:
         ConfigValidator.validate_component_count("differential_module", differential_module_count)
         ConfigValidator.validate_component_count("solar", solar_count, is_modern_api)
 
-        self.__conn = ModbusConnector(ip, port, slave_id)
+        self.__conn = _load("ModbusConnector")(ip, port, slave_id)
         self._slave_id = slave_id
         self._system = system
         self._api_version = api_version
 
         # Initialize component manager
-        self.__component_manager = ComponentManager(self.__conn)
+        self.__component_manager = _load("ComponentManager")(self.__conn, max_age, max_gap)
         self.__component_manager.create_components(
             system, api_version, heating_circuit_count, buffer_count, boiler_count, fresh_water_module_count, circulation_count, differential_module_count, solar_count
         )
@@ -143,9 +188,31 @@ class SolarfocusAPI:
         """Check if connection is established"""
         return self.__conn.is_connected
 
-    def update(self) -> bool:
-        """Read values from Heating System"""
-        return self.__component_manager.update_all()
+    @property
+    def modbus_connector(self):
+        """Connection to the eco manager-touch, shared by everything serving this plant"""
+        return self.__conn
+
+    @property
+    def component_manager(self):
+        """Manager of the components of this plant"""
+        return self.__component_manager
+
+    def add_update_listener(self, callback: Callable[[List[str]], None]) -> None:
+        """Call `callback` with the names of the components read by every completed update"""
+        self.__component_manager.add_listener(callback)
+
+    def remove_update_listener(self, callback: Callable[[List[str]], None]) -> None:
+        """Remove a callback registered with `add_update_listener`"""
+        self.__component_manager.remove_listener(callback)
+
+    def update(self, deadline: Optional[float] = None) -> bool:
+        """Read values from Heating System
+
+        Args:
+            deadline: Seconds the update may take, see `ComponentManager.update_all`
+        """
+        return self.__component_manager.update_all(deadline)
 
     def update_heating(self) -> bool:
         """Read values from Heating System"""
@@ -280,7 +347,7 @@ class SolarfocusAPI:
 
     def __repr__(self) -> str:
         message = ["-" * 50]
-        message.append(f"{self.__class__.__name__}, v{__version__}")
+        message.append(f"{self.__class__.__name__}, v{_load('__version__')}")
         message.append("-" * 50)
         message.append(f"+ System: {self.system.value}")
         message.append(f"+ Version: {self._api_version.value}")
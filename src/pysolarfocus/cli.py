@@ -0,0 +1,60 @@
+"""Command line helpers of the services serving a plant"""
+
+import argparse
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+_COMPONENT_COUNTS = ("heating_circuit", "buffer", "boiler", "fresh_water_module", "circulation", "differential_module", "solar")
+
+
+def plant_parser(prog: str, description: Optional[str]) -> argparse.ArgumentParser:
+    """
+    Returns a parser of the options describing a plant and how often it is polled
+    """
+    from . import PORT, ApiVersions, Systems
+
+    parser = argparse.ArgumentParser(prog=prog, description=description.strip().splitlines()[0] if description else None)
+    parser.add_argument("ip", help="Address of the eco manager-touch")
+    parser.add_argument("--port", type=int, default=PORT, help="Modbus port of the eco manager-touch")
+    parser.add_argument("--system", default=Systems.VAMPAIR.value, choices=[s.value for s in Systems])
+    parser.add_argument("--api-version", default=ApiVersions.V_21_140.value, choices=[v.value for v in ApiVersions])
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds between updates of the plant")
+    for name in _COMPONENT_COUNTS:
+        parser.add_argument(f"--{name.replace('_', '-')}-count", type=int, default=1)
+    return parser
+
+
+def plant_from_args(options: argparse.Namespace) -> "SolarfocusAPI":
+    """
+    Creates the plant described by options parsed with `plant_parser`
+    """
+    from . import ApiVersions, SolarfocusAPI, Systems
+
+    counts = {f"{name}_count": getattr(options, f"{name}_count") for name in _COMPONENT_COUNTS}
+    return SolarfocusAPI(options.ip, system=Systems(options.system), port=options.port, api_version=ApiVersions(options.api_version), **counts)
+
+
+def serve(api: "SolarfocusAPI", interval: float, *services: Any) -> None:
+    """
+    Starts the services and polls the plant until interrupted, then stops everything
+    """
+    from .poller import Poller
+
+    logging.basicConfig(level=logging.INFO)
+    poller = Poller(api, interval)
+    for service in services:
+        service.start()
+    poller.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.stop()
+        for service in reversed(services):
+            service.stop()
+        api.modbus_connector.close()
@@ -0,0 +1,241 @@
+"""Gorilla-style compression of series of integer raw values"""
+
+import json
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"SFGZ"
+VERSION = 1
+
+# Bit patterns announcing a delta of delta, and the zigzag encoded bits following them;
+# regular polling and slowly changing registers make almost every delta of delta 0.
+# The delta of delta of 64 bit values needs up to 66 bits, and one more for the sign.
+_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+    (0b11110, 5, 32),
+    (0b11111, 5, 68),
+)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value) << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+class BitWriter:
+    """Appends bits to a byte buffer, most significant bit first"""
+
+    __slots__ = ("buffer", "__bits", "__count")
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.__bits = 0
+        self.__count = 0
+
+    def write(self, value: int, count: int) -> None:
+        """
+        Appends the lowest `count` bits of a value
+        """
+        self.__bits = (self.__bits << count) | (value & ((1 << count) - 1))
+        self.__count += count
+        while self.__count >= 8:
+            self.__count -= 8
+            self.buffer.append((self.__bits >> self.__count) & 0xFF)
+        self.__bits &= (1 << self.__count) - 1
+
+    def getvalue(self) -> bytes:
+        """
+        Returns the bits written so far, padded with zeros to whole bytes
+        """
+        if self.__count:
+            return bytes(self.buffer) + bytes(((self.__bits << (8 - self.__count)) & 0xFF,))
+        return bytes(self.buffer)
+
+
+class BitReader:
+    """Reads bits from bytes, most significant bit first"""
+
+    __slots__ = ("data", "position")
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.position = 0
+
+    def read(self, count: int) -> int:
+        value = 0
+        for _ in range(count):
+            byte = self.data[self.position >> 3]
+            value = (value << 1) | ((byte >> (7 - (self.position & 7))) & 1)
+            self.position += 1
+        return value
+
+
+class DeltaOfDeltaEncoder:
+    """Streaming encoder of a series of integers.
+
+    Each value is stored as the change of its delta to the previous one, in as
+    few bits as the change needs: a single bit for an unchanged delta (a regular
+    timestamp, a constant temperature, a steadily counting energy register),
+    and between 9 and 73 bits otherwise. The first value is the delta of delta
+    from 0.
+    """
+
+    __slots__ = ("writer", "count", "__previous", "__delta")
+
+    def __init__(self, writer: Optional[BitWriter] = None) -> None:
+        """Initialize the encoder.
+
+        Args:
+            writer: Bit stream to append to, a new one if None
+        """
+        self.writer = writer if writer is not None else BitWriter()
+        self.count = 0
+        self.__previous = 0
+        self.__delta = 0
+
+    def append(self, value: int) -> None:
+        delta = value - self.__previous
+        delta_of_delta = delta - self.__delta
+        self.__previous, self.__delta = value, delta
+        self.count += 1
+        if delta_of_delta == 0:
+            self.writer.write(0, 1)
+            return
+        encoded = _zigzag(delta_of_delta)
+        for prefix, prefix_bits, bits in _BUCKETS:
+            if encoded < 1 << bits:
+                self.writer.write(prefix, prefix_bits)
+                self.writer.write(encoded, bits)
+                return
+        raise ValueError(f"Value {value} does not fit in 64 bits")
+
+    def extend(self, values: Iterable[int]) -> None:
+        for value in values:
+            self.append(value)
+
+
+class DeltaOfDeltaDecoder:
+    """Streaming decoder of a series encoded by `DeltaOfDeltaEncoder`"""
+
+    __slots__ = ("reader", "__previous", "__delta")
+
+    def __init__(self, reader: BitReader) -> None:
+        self.reader = reader
+        self.__previous = 0
+        self.__delta = 0
+
+    def next(self) -> int:
+        read = self.reader.read
+        if not read(1):
+            delta_of_delta = 0
+        else:
+            prefix_bits = 1
+            while prefix_bits < 5 and read(1):
+                prefix_bits += 1
+            bits = _BUCKETS[prefix_bits - 1][2]
+            delta_of_delta = _unzigzag(read(bits))
+        self.__delta += delta_of_delta
+        self.__previous += self.__delta
+        return self.__previous
+
+
+class SeriesEncoder:
+    """Streaming encoder of timestamped integer samples.
+
+    Timestamps (in milliseconds) and values are encoded as delta of delta,
+    interleaved in one bit stream, so samples can be appended as they arrive
+    and `getvalue` returns a self-contained block at any time.
+    """
+
+    def __init__(self) -> None:
+        self.__writer = BitWriter()
+        self.__times = DeltaOfDeltaEncoder(self.__writer)
+        self.__values = DeltaOfDeltaEncoder(self.__writer)
+
+    def __len__(self) -> int:
+        return self.__times.count
+
+    def append(self, timestamp: int, value: int) -> None:
+        """
+        Adds a sample, the timestamp in milliseconds
+        """
+        self.__times.append(timestamp)
+        self.__values.append(value)
+
+    def getvalue(self) -> bytes:
+        """
+        Returns the encoded samples, prefixed with their count
+        """
+        return struct.pack("<I", len(self)) + self.__writer.getvalue()
+
+
+def decode_series(data: bytes) -> Iterator[Tuple[int, int]]:
+    """
+    Yields the timestamps and values of a block returned by `SeriesEncoder.getvalue`
+    """
+    (count,) = struct.unpack_from("<I", data, 0)
+    reader = BitReader(data[4:])
+    times, values = DeltaOfDeltaDecoder(reader), DeltaOfDeltaDecoder(reader)
+    for _ in range(count):
+        timestamp = times.next()
+        yield timestamp, values.next()
+
+
+def encode_columns(times: Sequence[int], columns: Dict[str, Sequence[int]]) -> bytes:
+    """Encodes rows of raw values, e.g. the rows of a history segment or an exported batch.
+
+    Args:
+        times: Timestamp of every row in milliseconds
+        columns: Raw value of every row by column name
+
+    Returns:
+        Self-contained block with the column names, the row count and a stream per column
+    """
+    names = json.dumps(list(columns)).encode()
+    parts = [MAGIC, struct.pack("<BII", VERSION, len(times), len(names)), names]
+    for values in [times] + list(columns.values()):
+        encoder = DeltaOfDeltaEncoder()
+        encoder.extend(values)
+        stream = encoder.writer.getvalue()
+        parts.append(struct.pack("<I", len(stream)))
+        parts.append(stream)
+    return b"".join(parts)
+
+
+def decode_columns(data: bytes) -> Tuple[List[int], Dict[str, List[int]]]:
+    """
+    Returns the timestamps and the values by column name of a block returned by `encode_columns`
+    """
+    if data[:4] != MAGIC:
+        raise ValueError("Not an encoded block")
+    version, rows, names_size = struct.unpack_from("<BII", data, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported version {version}")
+    offset = 13
+    names = json.loads(data[offset : offset + names_size])
+    offset += names_size
+    streams = []
+    for _ in range(len(names) + 1):
+        (size,) = struct.unpack_from("<I", data, offset)
+        decoder = DeltaOfDeltaDecoder(BitReader(data[offset + 4 : offset + 4 + size]))
+        streams.append([decoder.next() for _ in range(rows)])
+        offset += 4 + size
+    return streams[0], dict(zip(names, streams[1:]))
+
+
+def encode_segment(segment, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+    """
+    Encodes the rows of a `columnar.Segment` in a time range (milliseconds), see `encode_columns`
+    """
+    times, columns = segment.range(start, end)
+    try:
+        return encode_columns(times, columns)
+    finally:
+        times.release()
+        for view in columns.values():
+            view.release()
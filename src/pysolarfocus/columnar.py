@@ -0,0 +1,457 @@
+"""Append-only columnar history files of the raw register values of a plant"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .codec import encode_columns
+from .components.base.data_value import DataValue
+from .components.base.enums import DataTypes
+from .snapshot import group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+MAGIC = b"SFCOL001"
+# Magic, header size, flags, capacity and row count
+_HEADER = struct.Struct("<8sIIQQ")
+_ROWS_OFFSET = 24
+SEALED = 1
+
+SEGMENT_SUFFIX = ".col"
+# Rows per segment by default, a day at a 10 second poll interval
+DEFAULT_CAPACITY = 8640
+
+TIME_TYPECODE = "q"
+_BITS = {"h": 16, "H": 16, "i": 32, "I": 32, "q": 64}
+
+# A column is its name and the array typecode of its values
+Column = Tuple[str, str]
+
+
+def typecode(data_value: DataValue) -> str:
+    """
+    Returns the narrowest array typecode holding the raw values of a DataValue
+    """
+    signed = data_value.data_type == DataTypes.INT
+    if data_value.count == 2:
+        return "i" if signed else "I"
+    return "h" if signed else "H"
+
+
+def _fit(value: int, code: str) -> int:
+    """
+    Wraps a raw value into the range of a typecode, the way the registers hold it
+    """
+    bits = _BITS[code]
+    value = int(value) & ((1 << bits) - 1)
+    if code.islower() and value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class Segment:
+    """One file of rows of a fixed set of columns.
+
+    The file holds a header with the column names, then every column -
+    timestamps in milliseconds first - as a fixed-width array sized for the
+    capacity of the segment. It is memory-mapped, so appending a row is a write
+    into each column and range reads are slices of the mapping without copies.
+    A sealed segment is rewritten with its columns sized to its rows.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Open an existing segment.
+
+        Args:
+            filename: Path of the segment file
+        """
+        self.filename = filename
+        self.__views: Dict[str, memoryview] = {}
+        self.__file = open(filename, "r+b")
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+        magic, header_size, flags, capacity, rows = _HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{filename} is not a history segment")
+        self.sealed = bool(flags & SEALED)
+        self.capacity = capacity
+        self.rows = rows
+        self.columns: List[Column] = [tuple(c) for c in json.loads(bytes(self.__map[_HEADER.size : header_size]).rstrip(b"\0"))]  # type: ignore[misc]
+        offset = header_size
+        view = memoryview(self.__map)
+        for name, code in [("", TIME_TYPECODE)] + self.columns:
+            size = array(code).itemsize * capacity
+            self.__views[name] = view[offset : offset + size].cast(code)
+            offset = _align(offset + size)
+        self.times = self.__views[""]
+
+    @staticmethod
+    def create(filename: str, columns: Sequence[Column], capacity: int) -> "Segment":
+        """
+        Creates an empty segment file
+        """
+        header, size = Segment.__layout(columns, capacity, 0, 0)
+        with open(filename, "wb") as file:
+            file.write(header)
+            file.truncate(size)
+        return Segment(filename)
+
+    @staticmethod
+    def __layout(columns: Sequence[Column], capacity: int, flags: int, rows: int) -> Tuple[bytes, int]:
+        """
+        Returns the header and the file size of a segment
+        """
+        names = json.dumps([list(c) for c in columns]).encode()
+        header_size = _align(_HEADER.size + len(names))
+        header = _HEADER.pack(MAGIC, header_size, flags, capacity, rows) + names
+        size = header_size
+        for _, code in [("", TIME_TYPECODE)] + list(columns):
+            size = _align(size + array(code).itemsize * capacity)
+        return header.ljust(header_size, b"\0"), size
+
+    @property
+    def full(self) -> bool:
+        return self.rows >= self.capacity
+
+    @property
+    def first_time(self) -> Optional[int]:
+        return self.times[0] if self.rows else None
+
+    @property
+    def last_time(self) -> Optional[int]:
+        return self.times[self.rows - 1] if self.rows else None
+
+    def append(self, timestamp: int, values: Sequence[int]) -> None:
+        """Appends a row.
+
+        Args:
+            timestamp: Time in milliseconds, not before the last row (it is raised to it otherwise)
+            values: Raw value of every column
+        """
+        if self.sealed or self.full:
+            raise ValueError(f"{self.filename} is full")
+        row = self.rows
+        if row:
+            timestamp = max(timestamp, self.times[row - 1])
+        self.times[row] = timestamp
+        for (name, code), value in zip(self.columns, values):
+            self.__views[name][row] = _fit(value, code)
+        self.rows = row + 1
+        struct.pack_into("<Q", self.__map, _ROWS_OFFSET, self.rows)
+
+    def __bisect(self, timestamp: int) -> int:
+        low, high = 0, self.rows
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[middle] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def range(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[memoryview, Dict[str, memoryview]]:
+        """Returns the rows in a time range, as views into the file.
+
+        Args:
+            start: First time included in milliseconds, None for the first row
+            end: Time excluded in milliseconds, None to include the last row
+
+        Returns:
+            Timestamps and values by column name, valid until the segment is closed
+        """
+        first = 0 if start is None else self.__bisect(start)
+        last = max(first, self.rows if end is None else self.__bisect(end))
+        return self.times[first:last], {name: self.__views[name][first:last] for name, _ in self.columns}
+
+    def seal(self) -> None:
+        """
+        Rewrites the segment with its columns sized to its rows, after which no rows can be appended
+        """
+        if self.sealed:
+            return
+        header, _ = Segment.__layout(self.columns, self.rows, SEALED, self.rows)
+        temporary = self.filename + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(header)
+            for name, _ in [("", TIME_TYPECODE)] + self.columns:
+                data = self.__views[name][: self.rows].tobytes()
+                file.write(data.ljust(_align(len(data)), b"\0"))
+        self.close()
+        os.replace(temporary, self.filename)
+        self.__init__(self.filename)  # type: ignore[misc]
+
+    def flush(self) -> None:
+        self.__map.flush()
+
+    def close(self) -> None:
+        """
+        Closes the mapping, views returned by `range` must be released before
+        """
+        for view in self.__views.values():
+            view.release()
+        self.__views.clear()
+        if not self.__map.closed:
+            self.__map.close()
+        self.__file.close()
+
+
+class ColumnStore:
+    """Append-only history of a fixed set of columns in a directory of segments.
+
+    Rows are appended to the newest segment until it is full, then it is sealed
+    and a new one is started (also when the store is opened with other
+    columns). The first and last time of every segment are kept in memory, so
+    a range read only opens the segments it overlaps. `compact` merges small
+    sealed segments, e.g. those left by restarts, and `drop` removes old ones.
+    """
+
+    def __init__(self, directory: str, columns: Sequence[Column], capacity: int = DEFAULT_CAPACITY) -> None:
+        """Open or create a store.
+
+        Args:
+            directory: Directory of the segment files, created if missing
+            columns: Name and typecode of every column
+            capacity: Rows per segment
+        """
+        self.directory = directory
+        self.columns = [tuple(c) for c in columns]
+        self.capacity = capacity
+        self.__lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self.__segments: List[Segment] = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(SEGMENT_SUFFIX):
+                self.__segments.append(Segment(os.path.join(directory, name)))
+        self.__sequence = int(self.__segments[-1].filename[-len(SEGMENT_SUFFIX) - 8 : -len(SEGMENT_SUFFIX)]) + 1 if self.__segments else 0
+        for segment in self.__segments[:-1]:
+            segment.seal()
+        if self.__segments and not self.__segments[-1].rows:
+            # An empty segment left by a restart
+            empty = self.__segments.pop()
+            empty.close()
+            os.remove(empty.filename)
+        if self.__segments and (self.__segments[-1].columns != self.columns or self.__segments[-1].full):
+            self.__segments[-1].seal()
+
+    @property
+    def segments(self) -> List[Segment]:
+        with self.__lock:
+            return list(self.__segments)
+
+    def __next_filename(self) -> str:
+        filename = os.path.join(self.directory, f"{self.__sequence:08d}{SEGMENT_SUFFIX}")
+        self.__sequence += 1
+        return filename
+
+    def append(self, timestamp: float, values: Sequence[int]) -> None:
+        """Appends a row.
+
+        Args:
+            timestamp: Time in seconds since the epoch
+            values: Raw value of every column, in the order of the columns
+        """
+        with self.__lock:
+            current = self.__segments[-1] if self.__segments else None
+            if current is None or current.sealed or current.full:
+                if current is not None:
+                    current.seal()
+                current = Segment.create(self.__next_filename(), self.columns, self.capacity)
+                self.__segments.append(current)
+            current.append(int(timestamp * 1000), values)
+
+    def rotate(self) -> None:
+        """
+        Seals the newest segment, the next row starts a new one
+        """
+        with self.__lock:
+            if self.__segments and self.__segments[-1].rows:
+                self.__segments[-1].seal()
+
+    def scan(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[Segment, memoryview, Dict[str, memoryview]]]:
+        """
+        Yields every segment overlapping a time range (seconds since the epoch) with its rows in it, as views into the files
+        """
+        first = None if start is None else int(start * 1000)
+        last = None if end is None else int(end * 1000)
+        for segment in self.segments:
+            if not segment.rows or (first is not None and segment.last_time < first) or (last is not None and segment.first_time >= last):
+                continue
+            times, values = segment.range(first, last)
+            yield segment, times, values
+
+    def read(self, column: str, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[array, array]:
+        """
+        Returns copies of the timestamps (seconds since the epoch) and raw values of a column in a time range
+        """
+        times, values = array("d"), None
+        with self.__lock:
+            for segment, segment_times, segment_values in self.scan(start, end):
+                if column not in segment_values:
+                    continue
+                times.extend(t / 1000 for t in segment_times)
+                if values is None:
+                    values = array(segment_values[column].format)
+                values.frombytes(segment_values[column].tobytes())
+        return times, values if values is not None else array("q")
+
+    def export(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[bytes]:
+        """
+        Yields the rows of every segment overlapping a time range (seconds since the epoch), compressed by `codec.encode_columns`
+        """
+        with self.__lock:
+            for _, times, values in self.scan(start, end):
+                try:
+                    yield encode_columns(times, values)
+                finally:
+                    times.release()
+                    for view in values.values():
+                        view.release()
+
+    def compact(self) -> int:
+        """Merges consecutive sealed segments of the same columns into segments of up to `capacity` rows.
+
+        Returns:
+            Number of segments removed
+        """
+        with self.__lock:
+            sealed = [s for s in self.__segments if s.sealed]
+            removed = 0
+            groups: List[List[Segment]] = []
+            for segment in sealed:
+                group = groups[-1] if groups else None
+                if group is not None and group[0].columns == segment.columns and sum(s.rows for s in group) + segment.rows <= self.capacity:
+                    group.append(segment)
+                else:
+                    groups.append([segment])
+            for group in groups:
+                if len(group) < 2:
+                    continue
+                target, rows = group[0], sum(s.rows for s in group)
+                merged = Segment.create(target.filename + ".merge", target.columns, rows)
+                for segment in group:
+                    times, values = segment.range()
+                    for row in range(len(times)):
+                        merged.append(times[row], [values[name][row] for name, _ in segment.columns])
+                    del times, values
+                merged.seal()
+                merged.close()
+                for segment in group:
+                    segment.close()
+                    self.__segments.remove(segment)
+                for segment in group[1:]:
+                    os.remove(segment.filename)
+                os.replace(target.filename + ".merge", target.filename)
+                self.__segments.append(Segment(target.filename))
+                self.__segments.sort(key=lambda s: s.filename)
+                removed += len(group) - 1
+            return removed
+
+    def drop(self, before: float) -> int:
+        """Removes the sealed segments whose rows are all before a time.
+
+        Args:
+            before: Time in seconds since the epoch
+
+        Returns:
+            Number of segments removed
+        """
+        with self.__lock:
+            old = [s for s in self.__segments if s.sealed and s.rows and s.last_time < int(before * 1000)]
+            for segment in old:
+                segment.close()
+                os.remove(segment.filename)
+                self.__segments.remove(segment)
+            return len(old)
+
+    def flush(self) -> None:
+        with self.__lock:
+            for segment in self.__segments:
+                if not segment.sealed:
+                    segment.flush()
+
+    def close(self) -> None:
+        with self.__lock:
+            for segment in self.__segments:
+                segment.close()
+            self.__segments.clear()
+
+
+class ColumnarHistory:
+    """Long-term history of the raw register values of a plant.
+
+    Every component (or list of components) has a `ColumnStore` in a
+    subdirectory of its name, with a column per DataValue at the narrowest
+    width of its register (e.g. 2 bytes for a 16 bit temperature), and every
+    update appends a row to the stores of the updated components. Values are
+    stored unscaled, as `Component._parse` decodes them.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", directory: str, capacity: int = DEFAULT_CAPACITY) -> None:
+        """Initialize the history.
+
+        Args:
+            api: Plant to record
+            directory: Directory of the stores, created if missing
+            capacity: Rows per segment
+        """
+        self.api = api
+        self.directory = directory
+        self.capacity = capacity
+        self.__lock = threading.Lock()
+        self.__stores: Dict[str, Tuple[ColumnStore, List[DataValue]]] = {}
+
+    def start(self) -> None:
+        """
+        Records the updates of the plant
+        """
+        self.api.add_update_listener(self.record)
+
+    def stop(self) -> None:
+        """
+        Stops recording and closes the stores
+        """
+        self.api.remove_update_listener(self.record)
+        with self.__lock:
+            for store, _ in self.__stores.values():
+                store.close()
+            self.__stores.clear()
+
+    def store(self, name: str) -> Optional[ColumnStore]:
+        """
+        Returns the store of a component (list), opening it if the plant has one
+        """
+        with self.__lock:
+            return self.__store(name)[0] if name in self.__stores or name in self.api.component_manager.components else None
+
+    def __store(self, name: str) -> Tuple[ColumnStore, List[DataValue]]:
+        entry = self.__stores.get(name)
+        if entry is None:
+            parts = [("/".join(keys[1:]), part) for keys, part in group_parts(name, self.api.component_manager.components[name]) if isinstance(part, DataValue)]
+            columns = [(path, typecode(part)) for path, part in parts]
+            entry = self.__stores[name] = (ColumnStore(os.path.join(self.directory, name), columns, self.capacity), [part for _, part in parts])
+        return entry
+
+    def record(self, updated: List[str], timestamp: Optional[float] = None) -> None:
+        """Appends the raw values of updated components.
+
+        Args:
+            updated: Names of the updated components
+            timestamp: Time of the row in seconds since the epoch, now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        components = self.api.component_manager.components
+        with self.__lock:
+            for name in updated:
+                if name in components:
+                    store, values = self.__store(name)
+                    store.append(timestamp, [value.value for value in values])
@@ -1,5 +1,9 @@
 """Solarfocus component factory"""
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
 from . import ApiVersions, Systems
+from .components.base.component import Component
+from .components.base.component_schema import ComponentSchema
 from .components.biomass_boiler import BiomassBoiler
 from .components.boiler import Boiler
 from .components.buffer import Buffer, TherminatorBuffer
@@ -14,13 +18,65 @@ from .components.heat_pump import HeatPump
 from .components.heating_circuit import HeatingCircuit, TherminatorHeatingCircuit
 from .components.photovoltaic import Photovoltaic
 from .components.solar import Solar
-from .modbus_wrapper import ModbusConnector
+
+if TYPE_CHECKING:
+    from .modbus_wrapper import ModbusConnector
+
+T = TypeVar("T", bound=Component)
 
 
 class ComponentFactory:
-    def __init__(self, modbus_connector: ModbusConnector) -> None:
+    def __init__(self, modbus_connector: Optional["ModbusConnector"] = None) -> None:
+        """Initialize the factory.
+
+        Args:
+            modbus_connector: Connection the components are initialized with, None to create them uninitialized
+        """
         self.__modbus_connector = modbus_connector
 
+    def plant(self, system: Systems, api_version: ApiVersions, counts: Tuple[int, ...]) -> Dict[str, Any]:
+        """Creates the components a plant configuration has, by component name.
+
+        Args:
+            system: Solarfocus system type
+            api_version: API version
+            counts: Number of heating circuits, buffers, boilers, fresh water modules,
+                circulations, differential modules and solar components
+        """
+        heating_circuit_count, buffer_count, boiler_count, fresh_water_module_count, circulation_count, differential_module_count, solar_count = counts
+        components: Dict[str, Any] = {}
+        components["heating_circuits"] = self.heating_circuit(system, heating_circuit_count, api_version)
+        components["boilers"] = self.boiler(system, boiler_count, api_version)
+        components["buffers"] = self.buffer(system, buffer_count, api_version)
+        components["solar"] = self.solar(system, solar_count, api_version)
+
+        if api_version.greater_or_equal(ApiVersions.V_23_020.value):
+            components["fresh_water_modules"] = self.fresh_water_modules(system, fresh_water_module_count, api_version)
+
+        if api_version.greater_or_equal(ApiVersions.V_25_030.value):
+            components["circulations"] = self.circulation(system, circulation_count, api_version)
+            components["differential_modules"] = self.differential_modules(system, differential_module_count, api_version)
+
+        components["heatpump"] = self.heatpump(system, api_version)
+        components["photovoltaic"] = self.photovoltaic(system, api_version)
+        components["biomassboiler"] = self.pelletsboiler(system, api_version)
+        return components
+
+    def __create(self, key: Hashable, construct: Callable[[], T], input_address: Optional[int] = None, holding_address: Optional[int] = None) -> T:
+        """
+        Creates a component, constructing it only for the first instance of its class and configuration (the key, led by the component class)
+        and creating every further instance from the schema shared with it; initialized if the factory has a connection
+        """
+        schema = ComponentSchema.lookup(key)
+        if schema is None:
+            component = construct()
+            ComponentSchema.register(key, component.schema)
+        else:
+            component = key[0].from_schema(schema, input_address, holding_address)
+        if self.__modbus_connector is None:
+            return component
+        return component.initialize(self.__modbus_connector)
+
     def heating_circuit(self, system: Systems, count: int, api_version: ApiVersions) -> list[HeatingCircuit]:
         input_addresses = list(range(1100, 1100 + (50 * count), 50))
         holding_addresses = list(range(32600, 32600 + (50 * count), 50))
@@ -28,9 +84,9 @@ class ComponentFactory:
         for i in range(count):
             input, holding = input_addresses[i], holding_addresses[i]
             if system in [Systems.THERMINATOR, Systems.ECOTOP]:
-                heating_circuit = TherminatorHeatingCircuit(input, holding, api_version=api_version).initialize(self.__modbus_connector)
+                heating_circuit = self.__create((TherminatorHeatingCircuit, api_version), lambda: TherminatorHeatingCircuit(input, holding, api_version=api_version), input, holding)
             else:
-                heating_circuit = HeatingCircuit(input, holding, api_version=api_version).initialize(self.__modbus_connector)
+                heating_circuit = self.__create((HeatingCircuit, api_version), lambda: HeatingCircuit(input, holding, api_version=api_version), input, holding)
             heating_circuits.append(heating_circuit)
         return heating_circuits
 
@@ -40,7 +96,7 @@ class ComponentFactory:
         boilers = []
         for i in range(count):
             input, holding = input_addresses[i], holding_addresses[i]
-            boilers.append(Boiler(input, holding, api_version=api_version).initialize(self.__modbus_connector))
+            boilers.append(self.__create((Boiler, api_version), lambda: Boiler(input, holding, api_version=api_version), input, holding))
         return boilers
 
     def buffer(self, system: Systems, count: int, api_version: ApiVersions) -> list[Buffer]:
@@ -56,9 +112,9 @@ class ComponentFactory:
             else:
                 holding = -1
             if system in [Systems.THERMINATOR, Systems.ECOTOP]:
-                buffer = TherminatorBuffer(input).initialize(self.__modbus_connector)
+                buffer = self.__create((TherminatorBuffer,), lambda: TherminatorBuffer(input), input, -1)
             else:
-                buffer = Buffer(input, holding, api_version=api_version).initialize(self.__modbus_connector)
+                buffer = self.__create((Buffer, api_version), lambda: Buffer(input, holding, api_version=api_version), input, holding)
             buffers.append(buffer)
         return buffers
 
@@ -67,7 +123,7 @@ class ComponentFactory:
         fresh_water_modules = []
         for i in range(count):
             input = input_addresses[i]
-            fresh_water_modules.append(FreshWaterModule(input, api_version=api_version).initialize(self.__modbus_connector))
+            fresh_water_modules.append(self.__create((FreshWaterModule, api_version), lambda: FreshWaterModule(input, api_version=api_version), input, -1))
         return fresh_water_modules
 
     def circulation(self, system: Systems, count: int, api_version: ApiVersions) -> list[Circulation]:
@@ -75,7 +131,7 @@ class ComponentFactory:
         circulation = []
         for i in range(count):
             input = input_addresses[i]
-            circulation.append(Circulation(input, api_version=api_version).initialize(self.__modbus_connector))
+            circulation.append(self.__create((Circulation, api_version), lambda: Circulation(input, api_version=api_version), input, -1))
         return circulation
 
     def differential_modules(self, system: Systems, count: int, api_version: ApiVersions) -> list[DifferentialModule]:
@@ -83,30 +139,30 @@ class ComponentFactory:
         differential_modules = []
         for i in range(count):
             input = input_addresses[i]
-            differential_modules.append(DifferentialModule(input, api_version=api_version).initialize(self.__modbus_connector))
+            differential_modules.append(self.__create((DifferentialModule, api_version), lambda: DifferentialModule(input, api_version=api_version), input, -1))
         return differential_modules
 
     def heatpump(self, system: Systems, api_version: ApiVersions) -> HeatPump:
-        return HeatPump(api_version=api_version).initialize(self.__modbus_connector)
+        return self.__create((HeatPump, api_version), lambda: HeatPump(api_version=api_version))
 
     def photovoltaic(self, system: Systems, api_version: ApiVersions) -> Photovoltaic:
-        return Photovoltaic(api_version=api_version).initialize(self.__modbus_connector)
+        return self.__create((Photovoltaic, api_version), lambda: Photovoltaic(api_version=api_version))
 
     def pelletsboiler(self, system: Systems, api_version: ApiVersions) -> BiomassBoiler:
-        return BiomassBoiler(api_version=api_version, system=system).initialize(self.__modbus_connector)
+        return self.__create((BiomassBoiler, api_version, system), lambda: BiomassBoiler(api_version=api_version, system=system))
 
     def solar(self, system: Systems, count: int, api_version: ApiVersions) -> list[Solar]:
         input_addresses = list(range(2100, 2100 + (20 * count), 20))
         solar_modules = []
         for i in range(count):
             input = input_addresses[i]
-            solar_modules.append(Solar(input, api_version=api_version).initialize(self.__modbus_connector))
+            solar_modules.append(self.__create((Solar, api_version), lambda: Solar(input, api_version=api_version), input, -1))
         return solar_modules
 
     def fresh_water_module_cascade(self, system: Systems, api_version: ApiVersions) -> FreshWaterModuleCascade:
         """Get the Fresh Water Module Cascade component (address 800)"""
-        return FreshWaterModuleCascade(api_version=api_version).initialize(self.__modbus_connector)
+        return self.__create((FreshWaterModuleCascade, api_version), lambda: FreshWaterModuleCascade(api_version=api_version))
 
     def circulation_module(self, system: Systems, api_version: ApiVersions) -> CirculationModule:
         """Get the Circulation Module for DHW component (address 850)"""
-        return CirculationModule(api_version=api_version).initialize(self.__modbus_connector)
+        return self.__create((CirculationModule, api_version), lambda: CirculationModule(api_version=api_version))
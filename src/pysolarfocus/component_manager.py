@@ -1,27 +1,85 @@
 """Component manager for centralized component lifecycle management"""
 
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
 from . import ApiVersions, Systems
-from .component_factory import ComponentFactory
+from .components.base.component_group import DEFAULT_MAX_GAP, ComponentGroup
 from .exceptions import ComponentInitializationError
-from .modbus_wrapper import ModbusConnector
+from .plant_layout import PlantLayout
+from .rate_limiter import RateLimiter, RequestKind
+
+if TYPE_CHECKING:
+    from .modbus_wrapper import ModbusConnector
+
+
+class _Flight:
+    """An update in progress, shared by every caller that asks for it while it runs"""
+
+    __slots__ = ("done", "result")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = False
+
+
+# Order in which an update with a deadline reads the components, lower first; others come last
+PRIORITIES = {
+    "photovoltaic": 0,
+    "heatpump": 1,
+    "biomassboiler": 1,
+    "heating_circuits": 2,
+    "buffers": 3,
+    "boilers": 4,
+    "fresh_water_modules": 5,
+    "solar": 6,
+}
+# Weight of the latest read in the moving average of the read time of a component
+_DURATION_WEIGHT = 0.3
 
 
 class ComponentManager:
-    """Manages the lifecycle of all Solarfocus components with centralized error handling."""
+    """Manages the lifecycle of all Solarfocus components with centralized error handling.
+
+    Updates are single-flight: a caller asking for a component that is already being
+    updated waits for that update and shares its result instead of reading again, and
+    with `max_age` a component updated successfully within that many seconds is not
+    read again at all.
 
-    def __init__(self, modbus_connector: ModbusConnector):
+    An update of all components can be given a deadline: components are read in the
+    order of `priorities`, and a component whose expected read time (a moving average
+    of its previous reads) would overrun the deadline, or whose requests the rate
+    limiter of the connection would not allow by then, is skipped for the next ones
+    that still fit. Skipped components are stale until read, and are read first by the
+    next update with a deadline, so a slow connection still covers every component
+    over a few updates.
+    """
+
+    def __init__(self, modbus_connector: "ModbusConnector", max_age: float = 0.0, max_gap: int = DEFAULT_MAX_GAP):
         """Initialize component manager.
 
         Args:
             modbus_connector: Modbus connection instance
+            max_age: Seconds a successful update is fresh enough to be shared with later callers (0 to always read)
+            max_gap: Most unpolled registers between the instances of a multi-instance component read as part of
+                one request, see `ComponentGroup` (0 to not read registers which are not polled)
         """
         self.modbus_connector = modbus_connector
-        self.factory = ComponentFactory(modbus_connector)
+        self.max_age = max_age
+        self.max_gap = max_gap
         self.components: Dict[str, Any] = {}
+        self._groups: Dict[str, ComponentGroup] = {}
         self._failed_components: List[str] = []
+        self.__lock = threading.Lock()
+        self.__flights: Dict[str, _Flight] = {}
+        self.__updated: Dict[str, Tuple[float, bool]] = {}
+        self.__listeners: List[Callable[[List[str]], None]] = []
+        self.priorities: Dict[str, int] = dict(PRIORITIES)
+        self.__durations: Dict[str, float] = {}
+        # Components an update with a deadline did not get to, in the order they were skipped
+        self.__stale: List[str] = []
 
     def create_components(
         self,
@@ -43,48 +101,154 @@ class ComponentManager:
             *_count: Number of each component type to create
         """
         try:
-            # Create multi-instance components
-            self.components["heating_circuits"] = self.factory.heating_circuit(system, heating_circuit_count, api_version)
-            self.components["boilers"] = self.factory.boiler(system, boiler_count, api_version)
-            self.components["buffers"] = self.factory.buffer(system, buffer_count, api_version)
-            self.components["solar"] = self.factory.solar(system, solar_count, api_version)
-
-            # Create version-specific components
-            if api_version.greater_or_equal(ApiVersions.V_23_020.value):
-                self.components["fresh_water_modules"] = self.factory.fresh_water_modules(system, fresh_water_module_count, api_version)
+            # The layout of a configuration is compiled once per process, creating the components is a lookup
+            counts = (heating_circuit_count, buffer_count, boiler_count, fresh_water_module_count, circulation_count, differential_module_count, solar_count)
+            self.components = PlantLayout.get(system, api_version, counts).instantiate(self.modbus_connector)
 
-            if api_version.greater_or_equal(ApiVersions.V_25_030.value):
-                self.components["circulations"] = self.factory.circulation(system, circulation_count, api_version)
-                self.components["differential_modules"] = self.factory.differential_modules(system, differential_module_count, api_version)
-
-            # Create single-instance components
-            self.components["heatpump"] = self.factory.heatpump(system, api_version)
-            self.components["photovoltaic"] = self.factory.photovoltaic(system, api_version)
-            self.components["biomassboiler"] = self.factory.pelletsboiler(system, api_version)
+            # Multi-instance components sharing one layout are read and decoded together
+            for name, component in self.components.items():
+                if isinstance(component, list) and ComponentGroup.can_group(component):
+                    self._groups[name] = ComponentGroup(component, self.modbus_connector, self.max_gap)
 
             logging.info("All components created successfully")
 
         except Exception as e:
             raise ComponentInitializationError(f"Failed to create components: {e}")
 
-    def update_all(self) -> bool:
+    def update_all(self, deadline: Optional[float] = None) -> bool:
         """Update all components and track failures.
 
+        Args:
+            deadline: Seconds the update may take, None to read every component. Components are
+                read whole, so at least one is read however short the deadline
+
         Returns:
-            True if all components updated successfully, False otherwise
+            True if all components read updated successfully, False otherwise
         """
         success = True
         self._failed_components.clear()
+        updated = []
+        if deadline is None:
+            names = list(self.components)
+            self.__stale.clear()
+        else:
+            names = self.__schedule()
+            deadline += time.monotonic()
 
-        for component_name in self.components:
-            if not self.update(component_name):
+        skipped: List[str] = []
+        for index, component_name in enumerate(names):
+            if deadline is not None and index > 0 and not self.__fits(component_name, deadline - time.monotonic()):
+                skipped.append(component_name)
+                continue
+            started = time.monotonic()
+            result, was_read = self.__update_shared(component_name, None)
+            if was_read:
+                duration = time.monotonic() - started
+                previous = self.__durations.get(component_name)
+                self.__durations[component_name] = duration if previous is None else previous + _DURATION_WEIGHT * (duration - previous)
+            if not result:
                 success = False
+            elif was_read:
+                updated.append(component_name)
+        if deadline is not None:
+            self.__stale = skipped
 
         if not success:
             logging.warning(f"Failed to update components: {', '.join(self._failed_components)}")
 
+        self.__notify(updated)
         return success
 
+    def __schedule(self) -> List[str]:
+        """
+        Orders the components for an update with a deadline: the stale ones first, then by priority
+        """
+        stale = [name for name in self.__stale if name in self.components]
+        rest = sorted((name for name in self.components if name not in stale), key=lambda name: self.priorities.get(name, len(self.priorities)))
+        return stale + rest
+
+    def __fits(self, name: str, remaining: float) -> bool:
+        """
+        Tells whether a component is expected to be read within the remaining seconds, and within the budget of the rate limiter
+        """
+        if self.__expected_duration(name) > remaining:
+            return False
+        limiter = getattr(self.modbus_connector, "rate_limiter", None)
+        if not isinstance(limiter, RateLimiter):
+            return True
+        requests, registers = self.read_cost(name)
+        return limiter.affordable(RequestKind.READ, requests, registers, within=max(0.0, remaining))
+
+    def read_cost(self, name: str) -> Tuple[int, int]:
+        """Get the requests and registers a read of a component takes.
+
+        Args:
+            name: Component name
+
+        Returns:
+            Number of requests and of registers
+        """
+        component = self._groups.get(name) or self.components.get(name)
+        parts = component if isinstance(component, list) else [component]
+        slices = [s for part in parts for s in (getattr(part, "input_slices", None) or []) + (getattr(part, "holding_slices", None) or [])]
+        return len(slices), sum(s.count for s in slices)
+
+    def __expected_duration(self, name: str) -> float:
+        """
+        Expected read time of a component, the average of the others for one not read yet
+        """
+        if name in self.__durations:
+            return self.__durations[name]
+        return sum(self.__durations.values()) / len(self.__durations) if self.__durations else 0.0
+
+    def get_stale_components(self) -> List[str]:
+        """Get list of components the last update with a deadline did not read.
+
+        Returns:
+            List of stale component names, in the order the next update reads them
+        """
+        return self.__stale.copy()
+
+    def get_read_duration(self, name: str) -> Optional[float]:
+        """Get the moving average of the seconds a read of a component takes.
+
+        Args:
+            name: Component name
+
+        Returns:
+            Average read time, None if the component was not read yet
+        """
+        return self.__durations.get(name)
+
+    def add_listener(self, callback: Callable[[List[str]], None]) -> None:
+        """Register a callback for completed updates.
+
+        The callback is called after every update with the names of the components that
+        were read successfully, on the thread that ran the update.
+
+        Args:
+            callback: Function called with the list of updated component names
+        """
+        self.__listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[List[str]], None]) -> None:
+        """Remove a callback registered with `add_listener`.
+
+        Args:
+            callback: Function to remove
+        """
+        if callback in self.__listeners:
+            self.__listeners.remove(callback)
+
+    def __notify(self, updated: List[str]) -> None:
+        if not updated:
+            return
+        for callback in list(self.__listeners):
+            try:
+                callback(updated)
+            except Exception as e:
+                logging.exception(f"Error in update listener {callback}: {e}")
+
     def get_component(self, name: str) -> Optional[Any]:
         """Get component by name.
 
@@ -112,21 +276,62 @@ class ComponentManager:
         """
         return len(self._failed_components) == 0
 
-    def update(self, component_name: str) -> bool:
+    def update(self, component_name: str, max_age: Optional[float] = None) -> bool:
         """Update a single component or component list.
 
+        If the component is already being updated, waits for that update and returns its result.
+
         Args:
             component_name: Name of the component to update
+            max_age: Seconds a previous successful update is fresh enough to skip reading (None for the default of the manager)
 
         Returns:
             True if update was successful, False otherwise
         """
+        result, was_read = self.__update_shared(component_name, max_age)
+        if result and was_read:
+            self.__notify([component_name])
+        return result
+
+    def __update_shared(self, component_name: str, max_age: Optional[float]) -> Tuple[bool, bool]:
+        """
+        Updates a component single-flight, returns the result and whether this call read the component
+        """
         if component_name not in self.components:
-            return False
+            return False, False
+
+        max_age = self.max_age if max_age is None else max_age
+        with self.__lock:
+            updated_at, result = self.__updated.get(component_name, (0.0, False))
+            if result and max_age > 0 and time.monotonic() - updated_at <= max_age:
+                return True, False
+            flight = self.__flights.get(component_name)
+            is_leader = flight is None
+            if flight is None:
+                flight = self.__flights[component_name] = _Flight()
+
+        if not is_leader:
+            flight.done.wait()
+            return flight.result, False
 
+        try:
+            flight.result = self.__update(component_name)
+        finally:
+            with self.__lock:
+                self.__updated[component_name] = (time.monotonic(), flight.result)
+                del self.__flights[component_name]
+            flight.done.set()
+        return flight.result, True
+
+    def __update(self, component_name: str) -> bool:
         component = self.components[component_name]
         try:
-            if isinstance(component, list):
+            if component_name in self._groups:
+                group = self._groups[component_name]
+                if not group.update():
+                    self._failed_components.extend(f"{component_name}[{i}]" for i in group.failed)
+                    return False
+            elif isinstance(component, list):
                 for i, comp in enumerate(component):
                     if not comp.update():
                         self._failed_components.append(f"{component_name}[{i}]")
@@ -1,12 +1,18 @@
 """Solarfocus abstract component"""
 import logging
-from typing import List, Optional, Tuple
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from ...modbus_wrapper import ModbusConnector
+from .component_schema import ComponentSchema
+from .counter import Counter
 from .data_value import DataValue
-from .enums import DataTypes, RegisterTypes
+from .enums import RegisterTypes
 from .performance_calculator import PerformanceCalculator
 from .register_slice import RegisterSlice
+from .register_spec import RegisterSpec
+
+if TYPE_CHECKING:
+    from ...modbus_wrapper import ModbusConnector
 
 
 class Component:
@@ -26,45 +32,78 @@ class Component:
         self.input_count = 0
         self.holding_address = holding_address
         self.holding_count = 0
-        self.__data_values: Optional[List[Tuple[str, DataValue]]] = None
-        self.__input_values: Optional[List[Tuple[str, DataValue]]] = None
-        self.__holding_values: Optional[List[Tuple[str, DataValue]]] = None
-        self.__performance_calculators: Optional[List[Tuple[str, PerformanceCalculator]]] = None
-        self.__modbus: Optional[ModbusConnector] = None
+        self.__schema: Optional[ComponentSchema] = None
+        self.__input_values: List[DataValue] = []
+        self.__holding_values: List[DataValue] = []
+        self.__performance_calculators: List[PerformanceCalculator] = []
+        self.__counters: Dict[RegisterTypes, List[Counter]] = {}
+        self.__modbus: Optional["ModbusConnector"] = None
+
+    @classmethod
+    def from_schema(cls, schema: ComponentSchema, input_address: Optional[int] = None, holding_address: Optional[int] = None):
+        """
+        Creates a component of a shared schema without running the constructor of the subclass
+        """
+        component = cls.__new__(cls)
+        Component.__init__(
+            component,
+            schema.input_address if input_address is None else input_address,
+            schema.holding_address if holding_address is None else holding_address,
+        )
+        for name, spec, default_value in schema.input_fields + schema.holding_fields:
+            setattr(component, name, (Counter if name in schema.counters else DataValue).from_spec(spec, default_value))
+        for name, nominator, denominator in schema.calculators:
+            setattr(component, name, PerformanceCalculator(getattr(component, nominator), getattr(component, denominator)))
+        component.__bind(schema)
+        return component
+
+    def __bind(self, schema: ComponentSchema) -> None:
+        """
+        Binds the DataValues and PerformanceCalculators of this Component in the order of the schema
+        """
+        self.__schema = schema
+        self.__input_values = [getattr(self, name) for name, _, _ in schema.input_fields]
+        self.__holding_values = [getattr(self, name) for name, _, _ in schema.holding_fields]
+        self.__performance_calculators = [getattr(self, name) for name, _, _ in schema.calculators]
+        self.__counters = {}
+        for name in schema.counters:
+            counter = getattr(self, name)
+            self.__counters.setdefault(counter.register_type, []).append(counter)
 
-    def initialize(self, modbus: ModbusConnector):
+    @property
+    def schema(self) -> ComponentSchema:
+        """
+        Returns the register layout of this Component
+        """
+        if self.__schema is None:
+            self.__bind(ComponentSchema.from_component(self))
+        assert self.__schema is not None  # Type assertion for type checker
+        return self.__schema
+
+    def initialize(self, modbus: "ModbusConnector"):
         """
         Initializes the absolute addresses of the DataValues and the count of the Component
         """
 
         self.__modbus = modbus
+        schema = self.schema
 
-        for _, value in self.__get_data_values():
-
-            if value.register_type == RegisterTypes.INPUT:
-                value.absolut_address = self.input_address
-            else:
-                value.absolut_address = self.holding_address
-                # Holding registers can write to the heating system
-                value.modbus = modbus
+        for value in self.__input_values:
+            value.absolut_address = self.input_address
+        for value in self.__holding_values:
+            value.absolut_address = self.holding_address
+            # Holding registers can write to the heating system
+            value.modbus = modbus
 
         # Dynamically calculate how many registers have to be read
-        if len(self.__get_input_values()) > 0:
-            _, last_input_value = self.__get_input_values()[-1]
-            self.input_count = last_input_value.address + last_input_value.count
-
-        if len(self.__get_holding_values()) > 0:
-            _, last_holding_value = self.__get_holding_values()[-1]
-            self.holding_count = last_holding_value.address + last_holding_value.count
+        self.input_count = schema.input_count
+        self.holding_count = schema.holding_count
 
         # Calculate the address slices we need to read
         # This is necessary because the modbus protocol can block the read/write of some registers
         # => if one of these registers is between the start and end address of the read/write we need to skip it
-        self.__input_slices = Component._calculate_ranges([v for (n, v) in self.__get_input_values()])
-        self.__holding_slices = Component._calculate_ranges([v for (n, v) in self.__get_holding_values()])
-
-        # Initialize has_performance_calculators
-        self.__get_performance_calculators()
+        self.__input_slices = [RegisterSlice(self.input_address + address, address, count) for address, count in schema.input_ranges]
+        self.__holding_slices = [RegisterSlice(self.holding_address + address, address, count) for address, count in schema.holding_ranges]
 
         return self
 
@@ -84,23 +123,10 @@ class Component:
 
     @staticmethod
     def _calculate_ranges(datavalues: list[DataValue]) -> list[RegisterSlice]:
-        slices = []
         if len(datavalues) < 1:
-            return slices
-        # The count of a slice is how many registers to read from where it
-        # starts, so it is measured from its own address - the first value of a
-        # component is not necessarily the one at relative address 0.
-        current_slice = RegisterSlice(datavalues[0].get_absolute_address(), datavalues[0].address, (datavalues[-1].address + datavalues[-1].count) - datavalues[0].address)
-        for i, datavalue in enumerate(datavalues[:-1]):
-            if datavalue.address + datavalue.count != datavalues[i + 1].address:
-                # A gap was found => define the range from the start of the current slice to the end of the current address+count
-                current_slice.count = (datavalue.address + datavalue.count) - current_slice.relative_address
-                slices.append(current_slice)
-                # the new count is the distance between the next address and the last address
-                new_count = (datavalues[-1].address + datavalues[-1].count) - datavalues[i + 1].address
-                current_slice = RegisterSlice(datavalues[i + 1].get_absolute_address(), datavalues[i + 1].address, new_count)
-        slices.append(current_slice)
-        return slices
+            return []
+        base_address = datavalues[0].get_absolute_address() - datavalues[0].address
+        return [RegisterSlice(base_address + address, address, count) for address, count in ComponentSchema.ranges(datavalues)]
 
     @property
     def has_input_address(self) -> bool:
@@ -112,45 +138,14 @@ class Component:
 
     @property
     def has_performance_calculators(self) -> bool:
-        return len(self.__get_performance_calculators()) > 0
-
-    def __get_data_values(self) -> list[tuple[str, DataValue]]:
-        """
-        Returns all DataValues of this Component
-        """
-        if self.__data_values is None:
-            self.__data_values = [(k, v) for k, v in self.__dict__.items() if isinstance(v, DataValue)]
-        return self.__data_values
+        return len(self.schema.calculators) > 0
 
-    def __get_input_values(self) -> list[tuple[str, DataValue]]:
+    def _get_values(self, type: RegisterTypes) -> list[tuple[str, DataValue]]:
         """
-        Get sorted list of all DataValues with RegisterType Input
+        Get sorted list of all DataValues of the given RegisterType
         """
-        if self.__input_values is None:
-            self.__input_values = [(k, v) for k, v in self.__get_data_values() if v.register_type == RegisterTypes.INPUT]
-            self.__input_values = sorted(self.__input_values, key=lambda item: item[1].address)
-        return self.__input_values
-
-    def __get_holding_values(self) -> list[tuple[str, DataValue]]:
-        """
-        Get sorted list of all DataValues with RegisterType Holding
-        """
-        if self.__holding_values is None:
-            self.__holding_values = [(k, v) for k, v in self.__get_data_values() if v.register_type == RegisterTypes.HOLDING]
-            self.__holding_values = sorted(self.__holding_values, key=lambda item: item[1].address)
-        return self.__holding_values
-
-    def __get_performance_calculators(self) -> list[tuple[str, PerformanceCalculator]]:
-        """
-        Returns all PerformanceCalculators of this Component
-        """
-        if self.__performance_calculators is None:
-            self.__performance_calculators = [(k, v) for k, v in self.__dict__.items() if isinstance(v, PerformanceCalculator)]
-        return self.__performance_calculators
-
-    @staticmethod
-    def __unsigned_to_signed(number: int, byte_count: int) -> int:
-        return int.from_bytes(number.to_bytes(byte_count, "little", signed=False), "little", signed=True)
+        values = self.__input_values if type == RegisterTypes.INPUT else self.__holding_values
+        return [(name, value) for (name, _, _), value in zip(self.schema.fields(type), values)]
 
     def update(self) -> bool:
         """
@@ -182,6 +177,10 @@ class Component:
             failed = not (parsing_success and read_success) or failed
             if not (parsing_success and read_success):
                 logging.error(f"Failed to read holding registers of {self.__class__.__name__}")
+
+        # A failed update is not reported to listeners, so its increase is carried to the next successful one
+        if not failed:
+            self._advance_counters(time.monotonic())
         return not failed
 
     def _parse(self, data: list[int], type: RegisterTypes) -> bool:
@@ -194,40 +193,45 @@ class Component:
             )
             return False
 
+        schema = self.schema
+        if type == RegisterTypes.INPUT:
+            decoding, values = schema.input_decoding, self.__input_values
+        else:
+            decoding, values = schema.holding_decoding, self.__holding_values
+
         encountered_error = False
-        for name, value in self.__get_input_values() if type == RegisterTypes.INPUT else self.__get_holding_values():
+        for i, ((address, count, sign_bit), value) in enumerate(zip(decoding, values)):
             try:
-                # Multi-register values (UINT32, INT32)
-                if value.count == 2:
-                    _value = (data[value.address] << 16) + data[value.address + 1]
-                else:
-                    _value = data[value.address]
-
-                # Datatype
-                if value.data_type == DataTypes.INT:
-                    _value = Component.__unsigned_to_signed(_value, value.count * 2)
-
-                # Store
-                value.value = _value
+                value.value = RegisterSpec.decode(data, address, count, sign_bit)
             except Exception as e:
+                name, _, _ = schema.fields(type)[i]
                 logging.exception(f"Error while parsing {name} of {self.__class__.__name__}: {e}")
                 encountered_error = True
+
         return not encountered_error
 
+    def _advance_counters(self, timestamp: float) -> None:
+        """
+        Accounts the values of the Counters as the reading of a new cycle, once all registers were read
+        """
+        for counters in self.__counters.values():
+            for counter in counters:
+                counter.advance(timestamp)
+
     def __repr__(self) -> str:
         message = ["=" * 12]
         message.append(f"{self.__class__.__name__}")
         message.append("=" * 12)
         if self.has_input_address:
             message.append("---Input:")
-            for name, value in self.__get_input_values():
+            for name, value in self._get_values(RegisterTypes.INPUT):
                 message.append(f"{name} | raw:{value.value} scaled:{value.scaled_value}")
         if self.has_holding_address:
             message.append("---Holding:")
-            for name, value in self.__get_holding_values():
+            for name, value in self._get_values(RegisterTypes.HOLDING):
                 message.append(f"{name} | raw:{value.value} scaled:{value.scaled_value}")
         if self.has_performance_calculators:
             message.append("---Calculations:")
-            for name, value in self.__get_performance_calculators():
+            for (name, _, _), value in zip(self.schema.calculators, self.__performance_calculators):
                 message.append(f"{name} | raw:{value.value} scaled:{value.scaled_value}")
         return "\n".join(message)
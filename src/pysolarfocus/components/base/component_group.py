@@ -0,0 +1,261 @@
+"""Solarfocus component group"""
+import logging
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .component import Component
+from .data_value import DataValue
+from .enums import RegisterTypes
+from .register_slice import RegisterSlice
+from .register_spec import RegisterSpec
+
+if TYPE_CHECKING:
+    from ...modbus_wrapper import ModbusConnector
+
+# Maximum number of registers a single modbus read request may return
+MAX_READ_COUNT = 125
+# Registers between two slices which are read and discarded rather than sent as a request of their own. The
+# controller may refuse registers nobody polls, so reading gaps is opted in to
+DEFAULT_MAX_GAP = 0
+# Consecutive updates whose merged read failed while the slices on their own were read, before the gaps are skipped
+GAP_REFUSALS = 3
+# Updates the gaps are skipped for before the merged read is tried again
+GAP_RETRY = 100
+
+
+class ComponentGroup:
+    """Reads and decodes a list of components that share one register layout.
+
+    Multi-instance components (heating circuits, boilers, buffers, ...) repeat the
+    same layout at a fixed stride. Instead of every instance reading and decoding
+    on its own, the group reads the registers of all instances in one request to
+    the connector and fills the values of all instances in a single pass over the
+    shared layout. Slices no more than `max_gap` registers apart are merged into
+    one modbus request (of up to `MAX_READ_COUNT` registers) which reads the gap
+    too, so e.g. heating circuits 50 registers apart take a request per two
+    circuits instead of one each. If a merged read fails, the update reads the
+    slices on their own instead; if that keeps working for `GAP_REFUSALS`
+    updates in a row, the controller refuses some register in a gap rather than
+    timing out once, and the group reads the slices on their own for the next
+    `GAP_RETRY` updates before trying the merged read again.
+    """
+
+    def __init__(self, components: List[Component], modbus: "ModbusConnector", max_gap: int = DEFAULT_MAX_GAP) -> None:
+        """Initialize the group.
+
+        Args:
+            components: Initialized components of the same class and layout
+            modbus: Modbus connection instance
+            max_gap: Most registers between two slices read as part of one request, 0 to only merge touching slices
+
+        Raises:
+            ValueError: If the components cannot be read as a group
+        """
+        if not ComponentGroup.can_group(components):
+            raise ValueError("Components do not share a layout and stride")
+        self.components = components
+        self.max_gap = max_gap
+        self.__modbus = modbus
+        self.__layouts = {register_type: self.__compile(register_type) for register_type in RegisterTypes}
+        # The slices without merged gaps, read if a merged read is refused
+        self.__exact = {register_type: self.__merge(register_type, 0) for register_type in RegisterTypes}
+        # Merged reads refused in a row, and the updates left until a refused merged read is tried again
+        self.__refusals = {register_type: 0 for register_type in RegisterTypes}
+        self.__skipping = {register_type: 0 for register_type in RegisterTypes}
+        # Indices of the components whose values failed in the last update
+        self.failed: List[int] = []
+
+    @staticmethod
+    def __base_address(component: Component, type: RegisterTypes) -> int:
+        return component.input_address if type == RegisterTypes.INPUT else component.holding_address
+
+    @staticmethod
+    def __has_address(component: Component, type: RegisterTypes) -> bool:
+        return component.has_input_address if type == RegisterTypes.INPUT else component.has_holding_address
+
+    @staticmethod
+    def __stride(components: List[Component], type: RegisterTypes) -> Optional[int]:
+        """
+        Returns the distance between the base addresses of two instances, None if it is not constant
+        """
+        addresses = [ComponentGroup.__base_address(c, type) for c in components]
+        strides = {b - a for a, b in zip(addresses, addresses[1:])}
+        if len(strides) != 1:
+            return None
+        return strides.pop()
+
+    @staticmethod
+    def can_group(components: List[Component]) -> bool:
+        """
+        Checks whether the components can be read and decoded as one group
+        """
+        if len(components) < 2:
+            return False
+        first = components[0]
+        if any(type(c) is not type(first) for c in components):
+            return False
+        # Components created from one shared schema have the same layout by definition
+        shared_schema = all(c.schema is first.schema for c in components)
+        for register_type in RegisterTypes:
+            if not shared_schema:
+                layout = [(n, v.address, v.count, v.data_type) for n, v in first._get_values(register_type)]
+                if any([(n, v.address, v.count, v.data_type) for n, v in c._get_values(register_type)] != layout for c in components[1:]):
+                    return False
+            has_address = {ComponentGroup.__has_address(c, register_type) for c in components}
+            if len(has_address) != 1:
+                return False
+            if has_address.pop():
+                stride = ComponentGroup.__stride(components, register_type)
+                _, last_value = first._get_values(register_type)[-1]
+                # Overlapping instances cannot be told apart in a combined read
+                if stride is None or stride < last_value.address + last_value.count:
+                    return False
+        return True
+
+    def __compile(self, type: RegisterTypes) -> Optional[Tuple[List[RegisterSlice], int, list, list]]:
+        """
+        Compiles the combined slices and the shared decoding layout of one register type
+        """
+        first = self.components[0]
+        if not ComponentGroup.__has_address(first, type):
+            return None
+
+        stride = ComponentGroup.__stride(self.components, type)
+        offsets = [i * stride for i in range(len(self.components))]
+        slices = self.__merge(type, self.max_gap)
+        last_slice = slices[-1]
+        count = last_slice.relative_address + last_slice.count
+
+        instance_values = [[value for _, value in component._get_values(type)] for component in self.components]
+        fields = []
+        for i, (name, spec, _) in enumerate(first.schema.fields(type)):
+            values: List[DataValue] = [values[i] for values in instance_values]
+            fields.append((name, values, spec.address, spec.count, spec.sign_bit))
+        return slices, count, offsets, fields
+
+    def __merge(self, type: RegisterTypes, max_gap: int) -> List[RegisterSlice]:
+        """
+        Returns the slices of all instances, merging slices up to `max_gap` registers apart
+        """
+        first = self.components[0]
+        if not ComponentGroup.__has_address(first, type):
+            return []
+        stride = ComponentGroup.__stride(self.components, type)
+        base = ComponentGroup.__base_address(first, type)
+        instance_slices = first.input_slices if type == RegisterTypes.INPUT else first.holding_slices
+
+        # The slices of all instances, indexed relative to the base address of the first one, so the
+        # registers of every instance have the same place in the combined result however they are read
+        slices: List[RegisterSlice] = []
+        for index in range(len(self.components)):
+            for instance_slice in instance_slices:
+                relative_address = index * stride + instance_slice.relative_address
+                previous = slices[-1] if slices else None
+                if previous is not None:
+                    end = relative_address + instance_slice.count
+                    gap = relative_address - (previous.relative_address + previous.count)
+                    if gap <= max_gap and end - previous.relative_address <= MAX_READ_COUNT:
+                        previous.count = end - previous.relative_address
+                        continue
+                slices.append(RegisterSlice(base + relative_address, relative_address, instance_slice.count))
+        return slices
+
+    @property
+    def input_slices(self) -> List[RegisterSlice]:
+        """
+        Returns the combined address slices of the input registers
+        """
+        layout = self.__layouts[RegisterTypes.INPUT]
+        return layout[0] if layout else []
+
+    @property
+    def holding_slices(self) -> List[RegisterSlice]:
+        """
+        Returns the combined address slices of the holding registers
+        """
+        layout = self.__layouts[RegisterTypes.HOLDING]
+        return layout[0] if layout else []
+
+    def update(self) -> bool:
+        """
+        Retrieve current values of all components of the group from the heating system
+        """
+        failed = set()
+        for register_type in (RegisterTypes.INPUT, RegisterTypes.HOLDING):
+            layout = self.__layouts[register_type]
+            if layout is None:
+                continue
+            slices, count, _, _ = layout
+            read_success, registers = self.__read_slices(register_type, slices, count)
+            if not (read_success and registers is not None):
+                logging.error(f"Failed to read {register_type.value.lower()} registers of {len(self.components)} x {self.components[0].__class__.__name__}")
+                failed.update(range(len(self.components)))
+            else:
+                failed.update(self.__parse(registers, register_type))
+        self.failed = sorted(failed)
+        # As for a single component, the increases of a failed update are carried to the next successful one
+        if not failed:
+            now = time.monotonic()
+            for component in self.components:
+                component._advance_counters(now)
+        return not failed
+
+    def __read_slices(self, type: RegisterTypes, slices: List[RegisterSlice], count: int) -> Tuple[bool, Optional[List[int]]]:
+        """
+        Reads the merged slices of a register type, or the slices on their own while the merged read is refused
+        """
+        exact = self.__exact[type]
+        if len(exact) == len(slices):
+            return self.__read(type, slices, count)
+        if self.__skipping[type]:
+            self.__skipping[type] -= 1
+            return self.__read(type, exact, count)
+
+        read_success, registers = self.__read(type, slices, count)
+        if read_success:
+            self.__refusals[type] = 0
+            return read_success, registers
+        read_success, registers = self.__read(type, exact, count)
+        if read_success:
+            self.__refusals[type] += 1
+            if self.__refusals[type] >= GAP_REFUSALS:
+                logging.warning(
+                    f"Reading the gaps between the {type.value.lower()} registers of {self.components[0].__class__.__name__} failed {GAP_REFUSALS} times, "
+                    f"reading them separately for {GAP_RETRY} updates"
+                )
+                self.__refusals[type] = 0
+                self.__skipping[type] = GAP_RETRY
+        return read_success, registers
+
+    def __read(self, type: RegisterTypes, slices: List[RegisterSlice], count: int) -> Tuple[bool, Optional[List[int]]]:
+        if type == RegisterTypes.INPUT:
+            return self.__modbus.read_input_registers(slices, count)
+        return self.__modbus.read_holding_registers(slices, count)
+
+    def _parse(self, data: list[int], type: RegisterTypes) -> bool:
+        """
+        Assigns the values of all components of the group in one pass over the shared layout
+        """
+        return not self.__parse(data, type)
+
+    def __parse(self, data: list[int], type: RegisterTypes) -> List[int]:
+        """
+        Assigns the values of all components of the group, returns the indices of the components which failed
+        """
+        layout = self.__layouts[type]
+        if layout is None:
+            return []
+        _, count, offsets, fields = layout
+        if len(data) != count:
+            logging.error(f"Data length does not match the expected length of {count} for {len(self.components)} x {self.components[0].__class__.__name__}")
+            return list(range(len(self.components)))
+
+        failed = set()
+        for name, values, address, value_count, sign_bit in fields:
+            for index, (offset, value) in enumerate(zip(offsets, values)):
+                try:
+                    value.value = RegisterSpec.decode(data, offset + address, value_count, sign_bit)
+                except Exception as e:
+                    logging.exception(f"Error while parsing {name} of {self.components[0].__class__.__name__} {index}: {e}")
+                    failed.add(index)
+        return sorted(failed)
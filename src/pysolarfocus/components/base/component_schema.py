@@ -0,0 +1,127 @@
+"""Solarfocus component schema"""
+
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+from .counter import Counter
+from .data_value import DataValue
+from .enums import RegisterTypes
+from .performance_calculator import PerformanceCalculator
+from .register_spec import RegisterSpec
+
+
+class ComponentSchema:
+    """Register layout of a component class in one configuration.
+
+    The layout - which registers a component reads, how they are decoded and in
+    which slices they are requested - is the same for every instance of a class
+    at a given api version, so it is built once and shared by all instances (and
+    all controllers of the process); instances only hold their base addresses and
+    values.
+    """
+
+    __slots__ = ("input_address", "holding_address", "input_fields", "holding_fields", "calculators", "input_count", "holding_count", "input_ranges", "holding_ranges", "input_decoding", "holding_decoding", "counters")
+
+    def __init__(
+        self,
+        input_address: int,
+        holding_address: int,
+        fields: List[Tuple[str, RegisterSpec, Union[int, float]]],
+        calculators: List[Tuple[str, str, str]],
+        counters: Tuple[str, ...] = (),
+    ) -> None:
+        """Initialize the schema.
+
+        Args:
+            input_address: Default base address for input registers
+            holding_address: Default base address for holding registers
+            fields: Name, register specification and default value of every DataValue
+            calculators: Name, nominator name and denominator name of every PerformanceCalculator
+            counters: Names of the fields which are a `Counter`
+        """
+        self.input_address = input_address
+        self.holding_address = holding_address
+        self.input_fields = tuple(sorted((f for f in fields if f[1].register_type == RegisterTypes.INPUT), key=lambda f: f[1].address))
+        self.holding_fields = tuple(sorted((f for f in fields if f[1].register_type == RegisterTypes.HOLDING), key=lambda f: f[1].address))
+        self.calculators = tuple(calculators)
+        self.counters = tuple(counters)
+        self.input_count = ComponentSchema.__count(self.input_fields)
+        self.holding_count = ComponentSchema.__count(self.holding_fields)
+        self.input_ranges = ComponentSchema.ranges([spec for _, spec, _ in self.input_fields])
+        self.holding_ranges = ComponentSchema.ranges([spec for _, spec, _ in self.holding_fields])
+        self.input_decoding = tuple((spec.address, spec.count, spec.sign_bit) for _, spec, _ in self.input_fields)
+        self.holding_decoding = tuple((spec.address, spec.count, spec.sign_bit) for _, spec, _ in self.holding_fields)
+
+    @staticmethod
+    def __count(fields) -> int:
+        """
+        Returns how many registers have to be read, counted from the base address
+        """
+        if len(fields) < 1:
+            return 0
+        _, last, _ = fields[-1]
+        return last.address + last.count
+
+    @staticmethod
+    def ranges(registers: list) -> List[Tuple[int, int]]:
+        """
+        Returns the relative address and count of the slices covering the given registers, sorted by address
+        """
+        ranges: List[Tuple[int, int]] = []
+        if len(registers) < 1:
+            return ranges
+        # The count of a slice is how many registers to read from where it
+        # starts, so it is measured from its own address - the first value of a
+        # component is not necessarily the one at relative address 0.
+        start = registers[0].address
+        for register, following in zip(registers, registers[1:]):
+            if register.address + register.count != following.address:
+                # A gap was found => close the current slice at the end of this register
+                ranges.append((start, register.address + register.count - start))
+                start = following.address
+        ranges.append((start, registers[-1].address + registers[-1].count - start))
+        return ranges
+
+    def fields(self, type: RegisterTypes) -> tuple:
+        """
+        Returns the fields of the given RegisterType, sorted by address
+        """
+        return self.input_fields if type == RegisterTypes.INPUT else self.holding_fields
+
+    @classmethod
+    def from_component(cls, component) -> "ComponentSchema":
+        """
+        Extracts the schema of a constructed component from its DataValues and PerformanceCalculators
+        """
+        fields = []
+        counters = []
+        names: Dict[int, str] = {}
+        for name, value in component.__dict__.items():
+            if isinstance(value, DataValue):
+                fields.append((name, value.spec, value.value))
+                names[id(value)] = name
+                if isinstance(value, Counter):
+                    counters.append(name)
+        calculators = [
+            (name, names[id(value.nominator)], names[id(value.denominator)])
+            for name, value in component.__dict__.items()
+            if isinstance(value, PerformanceCalculator)
+        ]
+        return cls(component.input_address, component.holding_address, fields, calculators, tuple(counters))
+
+    @staticmethod
+    def lookup(key: Hashable) -> Optional["ComponentSchema"]:
+        """
+        Returns the shared schema registered for the given key
+        """
+        return _SCHEMAS.get(key)
+
+    @staticmethod
+    def register(key: Hashable, schema: "ComponentSchema") -> "ComponentSchema":
+        """
+        Shares the schema under the given key, keeping a schema already registered for it
+        """
+        return _SCHEMAS.setdefault(key, schema)
+
+
+# Shared schemas, keyed by component class and the configuration it was constructed with
+_SCHEMAS: Dict[Hashable, ComponentSchema] = {}
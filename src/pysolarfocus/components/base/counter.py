@@ -0,0 +1,95 @@
+"""Solarfocus cumulative counter"""
+
+from typing import Optional, Union
+
+from .data_value import DataValue
+from .enums import DataTypes, RegisterTypes
+from .register_spec import RegisterSpec
+
+
+class Counter(DataValue):
+    """Cumulative register, e.g. an energy meter or the pellets used so far.
+
+    Counters are unsigned. Every time the component is updated successfully,
+    `advance` compares the new raw value with the previous one: the increase is
+    `delta` and, divided by the time since, `rate`. An update which failed does
+    not advance, so its increase is part of the next successful one. A decrease is either a rollover of the register
+    (from the top of its range to the bottom, counted as the increase across it)
+    or a reset of the counter by the controller (counted as the increase from 0).
+    `total` sums the scaled increases since the first read, so it keeps growing
+    across resets and rollovers.
+    """
+
+    __slots__ = ("delta", "rate", "total", "resets", "rollovers", "__previous", "__time")
+
+    def __init__(
+        self,
+        address: int,
+        count: int = 2,
+        default_value: int = 0,
+        multiplier: Optional[float] = None,
+        data_type: DataTypes = DataTypes.UINT,
+        register_type: RegisterTypes = RegisterTypes.INPUT,
+        write_multiplier: Optional[float] = None,
+    ) -> None:
+        """Initialize the counter, see `DataValue`; counters span 2 registers and are unsigned by default."""
+        super().__init__(address, count, default_value, multiplier, data_type, register_type, write_multiplier)
+        self.__reset_state()
+
+    @classmethod
+    def from_spec(cls, spec: RegisterSpec, default_value: int = 0) -> "Counter":
+        counter = super().from_spec(spec, default_value)
+        counter.__reset_state()
+        return counter
+
+    def __reset_state(self) -> None:
+        self.delta: Union[int, float] = 0
+        self.rate = 0.0
+        self.total = 0.0
+        self.resets = 0
+        self.rollovers = 0
+        self.__previous: Optional[int] = None
+        self.__time = 0.0
+
+    @property
+    def modulus(self) -> int:
+        """
+        Returns the number of raw values of the register
+        """
+        return 1 << (16 * self.count)
+
+    @property
+    def scaled_delta(self) -> float:
+        """
+        Scaled increase of the last cycle
+        """
+        if self.has_scaler and self.multiplier is not None:
+            return self.delta * self.multiplier
+        return self.delta
+
+    def advance(self, timestamp: float) -> None:
+        """Accounts the current raw value as the reading of a new cycle.
+
+        Args:
+            timestamp: Time of the reading in seconds, of a monotonic clock
+        """
+        value = int(self.value)
+        if self.data_type == DataTypes.INT and value < 0:
+            # A counter declared signed still counts unsigned
+            value += self.modulus
+        previous, self.__previous = self.__previous, value
+        elapsed, self.__time = timestamp - self.__time, timestamp
+        if previous is None:
+            self.delta, self.rate = 0, 0.0
+            return
+        if value >= previous:
+            self.delta = value - previous
+        elif previous >= self.modulus * 3 // 4 and value < self.modulus // 4:
+            self.delta = value + self.modulus - previous
+            self.rollovers += 1
+        else:
+            self.delta = value
+            self.resets += 1
+        scaled = self.scaled_delta
+        self.total += scaled
+        self.rate = scaled / elapsed if elapsed > 0 else 0.0
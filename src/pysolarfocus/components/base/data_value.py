@@ -1,11 +1,14 @@
 """Solarfocus data value"""
 
 import logging
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Optional, Union
 
-from ...modbus_wrapper import ModbusConnector
 from .enums import DataTypes, RegisterTypes
 from .part import Part
+from .register_spec import RegisterSpec
+
+if TYPE_CHECKING:
+    from ...modbus_wrapper import ModbusConnector
 
 
 class DataValue(Part):
@@ -13,6 +16,10 @@ class DataValue(Part):
     Abstraction of a certain relative address in the modbus register with validation and error handling.
     """
 
+    # A plant holds hundreds of these, so they do without a per-instance __dict__ and
+    # share the description of their register with every other instance reading it
+    __slots__ = ("spec", "value", "absolut_address", "modbus")
+
     def __init__(
         self,
         address: int,
@@ -39,20 +46,87 @@ class DataValue(Part):
         Raises:
             ValueError: If parameters are invalid
         """
-        self._validate_parameters(address, count, multiplier, data_type, register_type)
-        if write_multiplier is not None and write_multiplier < 0:
-            raise ValueError("Write multiplier must be non-negative")
-
-        self.address = address
-        self.count = count
+        self.spec = RegisterSpec.of(address, count, multiplier, data_type, register_type, write_multiplier)
         self.value: Union[int, float] = default_value
-        self.multiplier = multiplier
-        self.write_multiplier = write_multiplier
-        self.data_type = data_type
-        self.register_type = register_type
         # These are set by the parent component
         self.absolut_address: Optional[int] = None
-        self.modbus: Optional[ModbusConnector] = None
+        self.modbus: Optional["ModbusConnector"] = None
+
+    @classmethod
+    def from_spec(cls, spec: RegisterSpec, default_value: int = 0) -> "DataValue":
+        """
+        Creates a DataValue of an already validated register specification
+        """
+        data_value = cls.__new__(cls)
+        data_value.spec = spec
+        data_value.value = default_value
+        data_value.absolut_address = None
+        data_value.modbus = None
+        return data_value
+
+    # The register is described by the shared `spec`: setting one of its attributes replaces
+    # the spec of this DataValue only. Components compile their layout once they are
+    # initialized, so registers are changed before that.
+    def __replace(self, **changes) -> None:
+        spec = self.spec
+        fields = dict(
+            address=spec.address,
+            count=spec.count,
+            multiplier=spec.multiplier,
+            data_type=spec.data_type,
+            register_type=spec.register_type,
+            write_multiplier=spec.write_multiplier,
+        )
+        fields.update(changes)
+        self.spec = RegisterSpec.of(**fields)
+
+    @property
+    def address(self) -> int:
+        return self.spec.address
+
+    @address.setter
+    def address(self, address: int) -> None:
+        self.__replace(address=address)
+
+    @property
+    def count(self) -> int:
+        return self.spec.count
+
+    @count.setter
+    def count(self, count: int) -> None:
+        self.__replace(count=count)
+
+    @property
+    def multiplier(self) -> Optional[float]:
+        return self.spec.multiplier
+
+    @multiplier.setter
+    def multiplier(self, multiplier: Optional[float]) -> None:
+        self.__replace(multiplier=multiplier)
+
+    @property
+    def write_multiplier(self) -> Optional[float]:
+        return self.spec.write_multiplier
+
+    @write_multiplier.setter
+    def write_multiplier(self, write_multiplier: Optional[float]) -> None:
+        self.__replace(write_multiplier=write_multiplier)
+
+    @property
+    def data_type(self) -> DataTypes:
+        return self.spec.data_type
+
+    @data_type.setter
+    def data_type(self, data_type: DataTypes) -> None:
+        self.__replace(data_type=data_type)
+
+    @property
+    def register_type(self) -> RegisterTypes:
+        return self.spec.register_type
+
+    @register_type.setter
+    def register_type(self, register_type: RegisterTypes) -> None:
+        self.__replace(register_type=register_type)
 
     def _validate_parameters(
         self,
@@ -63,16 +137,7 @@ class DataValue(Part):
         register_type: RegisterTypes,
     ) -> None:
         """Validate initialization parameters."""
-        if address < 0:
-            raise ValueError("Address must be non-negative")
-        if count < 1 or count > 10:  # Allow reasonable range for register count
-            raise ValueError("Count must be between 1 and 10")
-        if multiplier is not None and multiplier < 0:
-            raise ValueError("Multiplier must be non-negative")
-        if not isinstance(data_type, DataTypes):
-            raise ValueError("Invalid data_type")
-        if not isinstance(register_type, RegisterTypes):
-            raise ValueError("Invalid register_type")
+        RegisterSpec.validate(address, count, multiplier, data_type, register_type)
 
     def get_absolute_address(self) -> int:
         """
@@ -0,0 +1,51 @@
+"""Solarfocus derived metric"""
+
+from abc import abstractmethod
+from typing import Hashable, Optional
+
+from .part import Part
+
+
+class Metric(Part):
+    """Value derived from other parts, e.g. registers or other metrics.
+
+    A metric declares its inputs and is only recomputed when one of them
+    changed since it was last read: the raw values of the inputs (or the values
+    of input metrics, which are validated the same way, recursively) are compared
+    with those of the last computation, which is much cheaper than the floating
+    point work of `compute` for consumers reading many metrics at a high rate.
+    """
+
+    __slots__ = ("inputs", "__key", "__value")
+
+    def __init__(self, *inputs: Part) -> None:
+        self.inputs = inputs
+        self.__key: Optional[Hashable] = None
+        self.__value = 0.0
+
+    @abstractmethod
+    def compute(self) -> float:
+        """
+        Computes the value of the metric from its inputs
+        """
+
+    def _key(self) -> Hashable:
+        """
+        Returns what the value of the metric depends on, it is recomputed when this changes
+        """
+        return tuple([part.value for part in self.inputs])  # type: ignore[attr-defined]
+
+    @property
+    def value(self) -> float:
+        """
+        Returns the value of the metric, recomputed if an input changed
+        """
+        key = self._key()
+        if key != self.__key:
+            self.__value = self.compute()
+            self.__key = key
+        return self.__value
+
+    @property
+    def scaled_value(self) -> float:
+        return self.value
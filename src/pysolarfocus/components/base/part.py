@@ -8,6 +8,8 @@ class Part:
     Abstraction of a metric of the heating system
     """
 
+    __slots__ = ()
+
     @property
     @abstractmethod
     def scaled_value(self) -> float:
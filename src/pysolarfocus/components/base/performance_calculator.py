@@ -1,23 +1,25 @@
 """Solarfocus performance calculator"""
 
+from .metric import Metric
 from .part import Part
 
 
-class PerformanceCalculator(Part):
+class PerformanceCalculator(Metric):
     """
-    Performing performance calculations
+    Performing performance calculations, the ratio of two parts
     """
 
+    __slots__ = ("nominator", "denominator")
+
     nominator: Part
     denominator: Part
-    value: int = None
 
     def __init__(self, nominator: Part, denominator: Part) -> None:
+        super().__init__(nominator, denominator)
         self.nominator = nominator
         self.denominator = denominator
 
-    @property
-    def value(self) -> float:
+    def compute(self) -> float:
         """
         Return value of the calculation
         """
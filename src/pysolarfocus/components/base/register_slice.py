@@ -3,7 +3,7 @@
 from dataclasses import dataclass
 
 
-@dataclass()
+@dataclass(slots=True)
 class RegisterSlice:
     absolute_address: int
     relative_address: int
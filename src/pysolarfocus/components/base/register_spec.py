@@ -0,0 +1,109 @@
+"""Solarfocus register specification"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+from .enums import DataTypes, RegisterTypes
+
+
+@dataclass(frozen=True, slots=True)
+class RegisterSpec:
+    """
+    Immutable description of a register, shared by every DataValue that reads it the same way
+    """
+
+    address: int
+    count: int
+    multiplier: Optional[float]
+    write_multiplier: Optional[float]
+    data_type: DataTypes
+    register_type: RegisterTypes
+
+    @property
+    def sign_bit(self) -> int:
+        """
+        Returns the sign bit of the raw value, 0 for unsigned values
+        """
+        if self.data_type == DataTypes.INT:
+            return 1 << (self.count * 16 - 1)
+        return 0
+
+    @property
+    def raw_range(self) -> Tuple[int, int]:
+        """
+        Returns the smallest and largest raw value the register holds
+        """
+        if self.sign_bit:
+            return -self.sign_bit, self.sign_bit - 1
+        return 0, (1 << (self.count * 16)) - 1
+
+    @staticmethod
+    def decode(data: Sequence[int], position: int, count: int, sign_bit: int) -> int:
+        """Returns the raw value of a register read at a position, the hot path of every update.
+
+        Args:
+            data: Registers read
+            position: Index of the first register of the value in the data
+            count: Number of registers of the value, the first holds the high word
+            sign_bit: Sign bit of the value (see `sign_bit`), 0 for unsigned values
+        """
+        # Multi-register values (UINT32, INT32)
+        value = (data[position] << 16) + data[position + 1] if count == 2 else data[position]
+        if sign_bit and value >= sign_bit:
+            value -= sign_bit << 1
+        return value
+
+    @classmethod
+    def of(
+        cls,
+        address: int,
+        count: int = 1,
+        multiplier: Optional[float] = None,
+        data_type: DataTypes = DataTypes.INT,
+        register_type: RegisterTypes = RegisterTypes.INPUT,
+        write_multiplier: Optional[float] = None,
+    ) -> "RegisterSpec":
+        """Returns the shared specification for the given parameters, validating it on first use.
+
+        Raises:
+            ValueError: If parameters are invalid
+        """
+        # Keyed with the types as well: 1 and 1.0 scale differently, and the enums
+        # compare equal to their plain values, which must not skip the validation
+        key = tuple((v, type(v)) for v in (address, count, multiplier, write_multiplier, data_type, register_type))
+        spec = _SPECS.get(key)
+        if spec is None:
+            RegisterSpec.validate(address, count, multiplier, data_type, register_type, write_multiplier)
+            spec = _SPECS[key] = cls(address, count, multiplier, write_multiplier, data_type, register_type)
+        return spec
+
+    @staticmethod
+    def validate(
+        address: int,
+        count: int,
+        multiplier: Optional[float],
+        data_type: DataTypes,
+        register_type: RegisterTypes,
+        write_multiplier: Optional[float] = None,
+    ) -> None:
+        """Validate register parameters.
+
+        Raises:
+            ValueError: If parameters are invalid
+        """
+        if address < 0:
+            raise ValueError("Address must be non-negative")
+        if count < 1 or count > 10:  # Allow reasonable range for register count
+            raise ValueError("Count must be between 1 and 10")
+        if multiplier is not None and multiplier < 0:
+            raise ValueError("Multiplier must be non-negative")
+        if write_multiplier is not None and write_multiplier < 0:
+            raise ValueError("Write multiplier must be non-negative")
+        if not isinstance(data_type, DataTypes):
+            raise ValueError("Invalid data_type")
+        if not isinstance(register_type, RegisterTypes):
+            raise ValueError("Invalid register_type")
+
+
+# Interned specifications, shared across all components and controllers of the process
+_SPECS: Dict[Tuple, RegisterSpec] = {}
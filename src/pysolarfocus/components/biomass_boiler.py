@@ -2,6 +2,7 @@
 
 from .. import ApiVersions, Systems
 from .base.component import Component
+from .base.counter import Counter
 from .base.data_value import DataValue
 from .base.enums import DataTypes, RegisterTypes
 
@@ -49,9 +50,9 @@ class BiomassBoiler(Component):
             self.sweep_function_extend = DataValue(address=11, register_type=RegisterTypes.HOLDING)
 
         if api_version.greater_or_equal(ApiVersions.V_23_010.value):
-            self.pellet_usage_last_fill = DataValue(address=14, count=2, multiplier=0.1)
-            self.pellet_usage_total = DataValue(address=16, count=2, multiplier=0.1)
-            self.heat_energy_total = DataValue(address=18, count=2, multiplier=0.1)
+            self.pellet_usage_last_fill = Counter(address=14, multiplier=0.1)
+            self.pellet_usage_total = Counter(address=16, multiplier=0.1)
+            self.heat_energy_total = Counter(address=18, multiplier=0.1)
 
             self.outdoor_temperature_external = DataValue(address=6, multiplier=10, register_type=RegisterTypes.HOLDING)
 
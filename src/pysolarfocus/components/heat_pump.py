@@ -2,6 +2,7 @@
 
 from .. import ApiVersions
 from .base.component import Component
+from .base.counter import Counter
 from .base.data_value import DataValue
 from .base.enums import DataTypes, RegisterTypes
 from .base.performance_calculator import PerformanceCalculator
@@ -19,33 +20,33 @@ class HeatPump(Component):
         if api_version.greater_or_equal(ApiVersions.V_25_030.value):
             self.defrost_active = DataValue(address=6, data_type=DataTypes.UINT)
             self.boiler_charge = DataValue(address=7, data_type=DataTypes.UINT)
-            self.thermal_energy_total = DataValue(address=10, count=2, multiplier=0.001)
-            self.thermal_energy_drinking_water = DataValue(address=12, count=2, multiplier=0.001)
-            self.thermal_energy_heating = DataValue(address=14, count=2, multiplier=0.001)
-            self.electrical_energy_total = DataValue(address=16, count=2, multiplier=0.001)
-            self.electrical_energy_drinking_water = DataValue(address=18, count=2, multiplier=0.001)
-            self.electrical_energy_heating = DataValue(address=20, count=2, multiplier=0.001)
+            self.thermal_energy_total = Counter(address=10, multiplier=0.001)
+            self.thermal_energy_drinking_water = Counter(address=12, multiplier=0.001)
+            self.thermal_energy_heating = Counter(address=14, multiplier=0.001)
+            self.electrical_energy_total = Counter(address=16, multiplier=0.001)
+            self.electrical_energy_drinking_water = Counter(address=18, multiplier=0.001)
+            self.electrical_energy_heating = Counter(address=20, multiplier=0.001)
             self.electrical_power = DataValue(address=22)
             self.thermal_power_cooling = DataValue(address=23)
             self.thermal_power_heating = DataValue(address=24)
-            self.thermal_energy_cooling = DataValue(address=26, count=2, multiplier=0.001, data_type=DataTypes.UINT)
-            self.electrical_energy_cooling = DataValue(address=28, count=2, multiplier=0.001, data_type=DataTypes.UINT)
+            self.thermal_energy_cooling = Counter(address=26, multiplier=0.001)
+            self.electrical_energy_cooling = Counter(address=28, multiplier=0.001)
 
             self.vampair_state = DataValue(address=30, data_type=DataTypes.UINT)
         else:
             self.defrost_active = DataValue(address=5, data_type=DataTypes.UINT)
             self.boiler_charge = DataValue(address=6, data_type=DataTypes.UINT)
-            self.thermal_energy_total = DataValue(address=7, count=2, multiplier=0.001)
-            self.thermal_energy_drinking_water = DataValue(address=9, count=2, multiplier=0.001)
-            self.thermal_energy_heating = DataValue(address=11, count=2, multiplier=0.001)
-            self.electrical_energy_total = DataValue(address=13, count=2, multiplier=0.001)
-            self.electrical_energy_drinking_water = DataValue(address=15, count=2, multiplier=0.001)
-            self.electrical_energy_heating = DataValue(address=17, count=2, multiplier=0.001)
+            self.thermal_energy_total = Counter(address=7, multiplier=0.001)
+            self.thermal_energy_drinking_water = Counter(address=9, multiplier=0.001)
+            self.thermal_energy_heating = Counter(address=11, multiplier=0.001)
+            self.electrical_energy_total = Counter(address=13, multiplier=0.001)
+            self.electrical_energy_drinking_water = Counter(address=15, multiplier=0.001)
+            self.electrical_energy_heating = Counter(address=17, multiplier=0.001)
             self.electrical_power = DataValue(address=19)
             self.thermal_power_cooling = DataValue(address=20)
             self.thermal_power_heating = DataValue(address=21)
-            self.thermal_energy_cooling = DataValue(address=22, count=2, multiplier=0.001, data_type=DataTypes.UINT)
-            self.electrical_energy_cooling = DataValue(address=24, count=2, multiplier=0.001, data_type=DataTypes.UINT)
+            self.thermal_energy_cooling = Counter(address=22, multiplier=0.001)
+            self.electrical_energy_cooling = Counter(address=24, multiplier=0.001)
 
             self.vampair_state = DataValue(address=26, data_type=DataTypes.UINT)
 
@@ -1,6 +1,7 @@
 """Solarfocus solar component"""
 from .. import ApiVersions
 from .base.component import Component
+from .base.counter import Counter
 from .base.data_value import DataValue
 from .base.enums import DataTypes
 
@@ -15,7 +16,7 @@ class Solar(Component):
         self.flow_heat_meter = DataValue(address=4, multiplier=0.1)
         self.current_power = DataValue(address=5, multiplier=0.1)
         self.current_yield_heat_meter = DataValue(address=6, count=2)
-        self.today_yield = DataValue(address=8, count=2)
+        self.today_yield = Counter(address=8)
         self.buffer_sensor_1 = DataValue(address=10, multiplier=0.1)
         self.buffer_sensor_2 = DataValue(address=11, multiplier=0.1)
         self.buffer_sensor_3 = DataValue(address=12, multiplier=0.1)
@@ -0,0 +1,318 @@
+"""Low-latency control loop for home energy management systems"""
+
+import logging
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import ApiVersions
+from .components.base.data_value import DataValue
+from .components.base.enums import RegisterTypes
+from .components.base.register_slice import RegisterSlice
+from .components.base.register_spec import RegisterSpec
+from .modbus_wrapper import ModbusConnector, RequestPriority
+from .snapshot import group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+# The registers a PV surplus controller needs: 2500-2511 and the power draw of the heat pump
+PV_SURPLUS_INPUTS = (
+    "photovoltaic/power",
+    "photovoltaic/house_consumption",
+    "photovoltaic/heatpump_consumption",
+    "photovoltaic/grid_import",
+    "photovoltaic/grid_export",
+    "photovoltaic/overcharge_possible",
+    "photovoltaic/overcharge_active",
+    "heatpump/electrical_power",
+)
+# Upper bounds in milliseconds of the bins of the latency histogram, the last bin is unbounded
+LATENCY_BINS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class LoopStatistics:
+    """Latency and jitter of the cycles of a control loop, in constant memory.
+
+    Latency is the time from the start of a cycle to the completion of its
+    write (or read, if nothing was written); jitter is how late a cycle started
+    compared to its deadline. Both are kept as count, mean and maximum, and the
+    latency also as a histogram (see `LATENCY_BINS`) for percentiles.
+    """
+
+    __slots__ = ("cycles", "errors", "overruns", "writes", "clamped", "rejected", "latency_sum", "latency_max", "last_latency", "jitter_sum", "jitter_max", "histogram")
+
+    def __init__(self) -> None:
+        self.cycles = 0
+        self.errors = 0
+        # Cycles which took longer than the period, so at least one deadline was skipped
+        self.overruns = 0
+        self.writes = 0
+        # Targets written at a bound of the register instead of their value, and targets which were not a number
+        self.clamped = 0
+        self.rejected = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.last_latency = 0.0
+        self.jitter_sum = 0.0
+        self.jitter_max = 0.0
+        self.histogram = [0] * (len(LATENCY_BINS) + 1)
+
+    def add(self, latency: float, jitter: float) -> None:
+        """
+        Accounts a cycle, latency and jitter in seconds
+        """
+        self.cycles += 1
+        self.last_latency = latency
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.jitter_sum += jitter
+        self.jitter_max = max(self.jitter_max, jitter)
+        milliseconds = latency * 1000
+        for index, bound in enumerate(LATENCY_BINS):
+            if milliseconds < bound:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    @property
+    def latency_mean(self) -> float:
+        return self.latency_sum / self.cycles if self.cycles else 0.0
+
+    @property
+    def jitter_mean(self) -> float:
+        return self.jitter_sum / self.cycles if self.cycles else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        """
+        Returns the upper bound in seconds of the histogram bin holding a percentile of the latencies, inf past the last bin
+        """
+        if not self.cycles:
+            return 0.0
+        rank = percentile / 100 * self.cycles
+        seen = 0
+        for bound, count in zip(LATENCY_BINS, self.histogram):
+            seen += count
+            if seen >= rank:
+                return bound / 1000
+        return float("inf")
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "cycles": self.cycles,
+            "errors": self.errors,
+            "overruns": self.overruns,
+            "writes": self.writes,
+            "clamped": self.clamped,
+            "rejected": self.rejected,
+            "latency_mean": self.latency_mean,
+            "latency_max": self.latency_max,
+            "latency_p99": self.latency_percentile(99),
+            "jitter_mean": self.jitter_mean,
+            "jitter_max": self.jitter_max,
+        }
+
+
+class ControlLoop:
+    """Reads a pinned set of registers, runs a controller and writes its output at a fixed rate.
+
+    Made for PV surplus control: every cycle reads the photovoltaic registers
+    2500-2511 and the electrical power of the heat pump (see
+    `PV_SURPLUS_INPUTS`) in as few requests as their addresses allow, passes
+    their scaled values by path to the controller and writes the target
+    electrical power it returns to register 33415. The read plan is compiled
+    once, and the loop runs on its own thread and, by default, its own
+    connection, so it neither waits behind nor delays full updates of the
+    plant. Cycles start at fixed deadlines (multiples of the period from the
+    start), not a period after the previous cycle, so the rate does not drift;
+    a cycle overrunning its period skips the deadlines it missed.
+    """
+
+    def __init__(
+        self,
+        api: "SolarfocusAPI",
+        controller: Callable[[Dict[str, float]], Optional[float]],
+        rate: float = 2.0,
+        inputs: Sequence[str] = PV_SURPLUS_INPUTS,
+        connector: Optional[ModbusConnector] = None,
+        keepalive: float = 30.0,
+    ) -> None:
+        """Initialize the loop.
+
+        Args:
+            api: Plant to control, supplies the register layout and the address of the connection
+            controller: Gets the values read by path, returns the target electrical power in W or None to not write;
+                targets outside of the register's range (and never below 0) are clamped, targets which are not
+                a finite number are not written
+            rate: Cycles per second
+            inputs: Paths of the input registers read every cycle, see `PlantSnapshot`
+            connector: Connection of the loop, a new one to the address and with the rate limiter of the plant's
+                connection if None; reads on a connection shared with updates jump the queued polls
+            keepalive: Seconds after which an unchanged target is written again
+
+        Raises:
+            ValueError: If the api version has no HEMS target register, or an input is not an input register
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        if not api.api_version.greater_or_equal(ApiVersions.V_26_020.value):
+            raise ValueError(f"The HEMS target power needs api version {ApiVersions.V_26_020.value} or later")
+        self.api = api
+        self.controller = controller
+        self.period = 1.0 / rate
+        self.keepalive = keepalive
+        self.__owns_connector = connector is None
+        if connector is None:
+            shared = api.modbus_connector
+            # Both connections poll the same controller, so they spend the same budget
+            connector = ModbusConnector(shared.ip, shared.port, shared.slave_id, retry_count=1, retry_delay=0.0, rate_limiter=shared.rate_limiter)
+        self.connector = connector
+        self.statistics = LoopStatistics()
+        self.target = api.photovoltaic.hems_target_electrical_power
+        self.__plan, self.__count, self.__decoding = self.__compile(inputs)
+        self.__written: Optional[int] = None
+        self.__written_at = 0.0
+        self.__stopped = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def __compile(self, inputs: Sequence[str]) -> Tuple[List[RegisterSlice], int, List[Tuple[str, DataValue, int, int, int]]]:
+        """
+        Compiles the slices reading the inputs and where each input is in the registers read
+        """
+        registers: List[Tuple[int, str, DataValue]] = []
+        components = self.api.component_manager.components
+        for path in inputs:
+            name = path.split("/", 1)[0]
+            part = None
+            if name in components and components[name] is not None:
+                part = next((part for keys, part in group_parts(name, components[name]) if "/".join(keys) == path), None)
+            if not isinstance(part, DataValue) or part.register_type != RegisterTypes.INPUT:
+                raise ValueError(f"{path} is not an input register of the plant")
+            registers.append((part.get_absolute_address(), path, part))
+        registers.sort(key=lambda register: register[0])
+
+        slices: List[RegisterSlice] = []
+        decoding = []
+        position = 0
+        for address, path, part in registers:
+            previous = slices[-1] if slices else None
+            if previous is not None and address < previous.absolute_address + previous.count:
+                raise ValueError(f"{path} overlaps another input")
+            if previous is not None and previous.absolute_address + previous.count == address:
+                previous.count += part.count
+            else:
+                slices.append(RegisterSlice(address, position, part.count))
+            decoding.append((path, part, position, part.count, part.spec.sign_bit))
+            position += part.count
+        return slices, position, decoding
+
+    @property
+    def requests(self) -> int:
+        """
+        Number of read requests of a cycle
+        """
+        return len(self.__plan)
+
+    def read(self) -> Optional[Dict[str, float]]:
+        """
+        Reads the inputs, returns their scaled values by path or None if the read failed
+        """
+        success, registers = self.connector.read_input_registers(self.__plan, self.__count, priority=RequestPriority.INTERACTIVE)
+        if not success or registers is None:
+            return None
+        values = {}
+        for path, part, position, count, sign_bit in self.__decoding:
+            raw = RegisterSpec.decode(registers, position, count, sign_bit)
+            if part.multiplier is not None:
+                values[path] = raw * part.multiplier
+            else:
+                values[path] = raw
+        return values
+
+    def cycle(self, now: Optional[float] = None) -> bool:
+        """Runs one cycle: read, control, write.
+
+        Args:
+            now: Monotonic time the cycle started, now if None
+
+        Returns:
+            Whether the cycle completed without an error
+        """
+        now = time.monotonic() if now is None else now
+        values = self.read()
+        if values is None:
+            return False
+        try:
+            target = self.controller(values)
+        except Exception as e:
+            logging.exception(f"Control loop controller failed: {e}")
+            return False
+        if target is None:
+            return True
+        scaled = self.target.reverse_scale(target) if isinstance(target, (int, float)) else math.nan
+        if not math.isfinite(scaled):
+            logging.error(f"Control loop controller returned {target!r}, not writing it")
+            self.statistics.rejected += 1
+            return False
+        # The target power is never negative, and must fit the register
+        low, high = self.target.spec.raw_range
+        low = max(0, low)
+        raw = int(scaled)
+        if not low <= raw <= high:
+            logging.warning(f"Control loop target {target!r} is out of range, writing {min(max(raw, low), high)}")
+            self.statistics.clamped += 1
+            raw = min(max(raw, low), high)
+        if raw == self.__written and now - self.__written_at < self.keepalive:
+            return True
+        if not self.connector.write_register(raw, self.target.get_absolute_address()):
+            return False
+        self.__written, self.__written_at = raw, now
+        self.statistics.writes += 1
+        return True
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Connects and starts the loop on its own thread
+        """
+        if self.is_running:
+            return
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name="pysolarfocus-control-loop", daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the loop after the running cycle, and closes its connection if it owns it
+        """
+        self.__stopped.set()
+        thread, self.__thread = self.__thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if self.__owns_connector:
+            self.connector.close()
+
+    def __run(self) -> None:
+        deadline = time.monotonic()
+        while not self.__stopped.is_set():
+            if not self.connector.is_connected and not self.connector.connect():
+                self.statistics.errors += 1
+                self.__stopped.wait(self.period)
+                deadline = time.monotonic()
+                continue
+            start = time.monotonic()
+            if not self.cycle(start):
+                self.statistics.errors += 1
+            end = time.monotonic()
+            self.statistics.add(end - start, max(0.0, start - deadline))
+            deadline += self.period
+            if end > deadline:
+                # Skip the deadlines this cycle overran
+                self.statistics.overruns += 1
+                deadline += ((end - deadline) // self.period + 1) * self.period
+            self.__stopped.wait(deadline - time.monotonic())
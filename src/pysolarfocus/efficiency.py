@@ -0,0 +1,199 @@
+"""Windowed efficiency statistics of the heat pump"""
+
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .components.base.counter import Counter
+from .metrics import SlidingWindow
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+# Thermal and electrical counter of every mode
+MODES = {
+    "total": ("thermal_energy_total", "electrical_energy_total"),
+    "heating": ("thermal_energy_heating", "electrical_energy_heating"),
+    "drinking_water": ("thermal_energy_drinking_water", "electrical_energy_drinking_water"),
+    "cooling": ("thermal_energy_cooling", "electrical_energy_cooling"),
+}
+# Name and length in seconds of the rolling windows
+WINDOWS = (("1h", 3600.0), ("24h", 86400.0), ("7d", 7 * 86400.0))
+# Intervals each window is divided into
+SLOTS = 48
+
+
+class HeatPumpEfficiency:
+    """Rolling and seasonal COPs of the heat pump, per mode.
+
+    Every update of the heat pump adds the increases of its energy counters
+    (see `Counter`) to a `SlidingWindow` per window, whose sums hold the thermal
+    and electrical energy of every mode over the window, and to the sums of the
+    current season. The COP of a mode over a window is the ratio of its sums,
+    so reading it costs a division whatever the length of the window, and the
+    state of a heat pump fits in a few kilobytes (see `state`).
+
+    Seasons start every year at `season_start` (a month, in local time): the
+    seasonal performance factor of the last season is kept once a new one
+    starts.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", windows: Tuple[Tuple[str, float], ...] = WINDOWS, slots: int = SLOTS, season_start: int = 9) -> None:
+        """Initialize the statistics.
+
+        Args:
+            api: Plant whose heat pump is followed
+            windows: Name and length in seconds of the rolling windows
+            slots: Intervals each window is divided into, the resolution of a window is its length divided by this
+            season_start: Month in which a season starts
+        """
+        if not 1 <= season_start <= 12:
+            raise ValueError(f"Season must start in a month between 1 and 12, got {season_start}")
+        self.api = api
+        self.season_start = season_start
+        self.__lock = threading.Lock()
+        heatpump = api.component_manager.components.get("heatpump")
+        self.__counters: List[Tuple[str, Counter, Counter]] = []
+        for mode, (thermal, electrical) in MODES.items():
+            counters = getattr(heatpump, thermal, None), getattr(heatpump, electrical, None)
+            if isinstance(counters[0], Counter) and isinstance(counters[1], Counter):
+                self.__counters.append((mode, counters[0], counters[1]))
+        columns = 2 * len(self.__counters)
+        self.__windows: Dict[str, SlidingWindow] = {name: SlidingWindow(length, slots, columns) for name, length in windows}
+        self.__season: Optional[int] = None
+        self.__season_sums = [0.0] * columns
+        self.__previous_season_sums: Optional[List[float]] = None
+
+    @property
+    def modes(self) -> List[str]:
+        """
+        Modes the heat pump counts energy of
+        """
+        return [mode for mode, _, _ in self.__counters]
+
+    @property
+    def windows(self) -> List[str]:
+        return list(self.__windows) + ["season", "previous_season"]
+
+    def attach(self) -> "HeatPumpEfficiency":
+        """
+        Follows the updates of the heat pump
+        """
+        self.api.add_update_listener(self.record)
+        return self
+
+    def detach(self) -> None:
+        self.api.remove_update_listener(self.record)
+
+    def season_of(self, timestamp: float) -> int:
+        """
+        Returns the year in which the season of a time started
+        """
+        date = datetime.fromtimestamp(timestamp)
+        return date.year if date.month >= self.season_start else date.year - 1
+
+    def record(self, updated: List[str], timestamp: Optional[float] = None) -> None:
+        """Adds the increases of the energy counters of an update.
+
+        Args:
+            updated: Names of the updated components
+            timestamp: Time of the update, now if None
+        """
+        if "heatpump" not in updated or not self.__counters:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        deltas = []
+        for _, thermal, electrical in self.__counters:
+            deltas.append(thermal.scaled_delta)
+            deltas.append(electrical.scaled_delta)
+        with self.__lock:
+            for window in self.__windows.values():
+                window.add(timestamp, *deltas)
+            season = self.season_of(timestamp)
+            if season != self.__season:
+                if self.__season is not None:
+                    self.__previous_season_sums = self.__season_sums
+                self.__season = season
+                self.__season_sums = [0.0] * len(deltas)
+            for column, delta in enumerate(deltas):
+                self.__season_sums[column] += delta
+
+    def __sums(self, window: str) -> Optional[List[float]]:
+        if window == "season":
+            return self.__season_sums
+        if window == "previous_season":
+            return self.__previous_season_sums
+        sliding = self.__windows.get(window)
+        if sliding is None:
+            raise KeyError(f"{window} is not one of {self.windows}")
+        return list(sliding.sums)
+
+    def energy(self, mode: str = "total", window: str = "24h") -> Tuple[float, float]:
+        """Returns the energy of a mode over a window.
+
+        Args:
+            mode: One of `modes`
+            window: Name of a rolling window, `season` or `previous_season`
+
+        Returns:
+            Thermal and electrical energy in kWh, 0 for a previous season not followed
+        """
+        column = self.modes.index(mode) * 2 if mode in self.modes else None
+        if column is None:
+            raise KeyError(f"{mode} is not one of {self.modes}")
+        with self.__lock:
+            sums = self.__sums(window)
+        if sums is None:
+            return 0.0, 0.0
+        return sums[column], sums[column + 1]
+
+    def cop(self, mode: str = "total", window: str = "24h") -> float:
+        """
+        Returns the COP of a mode over a window, see `energy`; 0 if no electrical energy was consumed
+        """
+        thermal, electrical = self.energy(mode, window)
+        return thermal / electrical if electrical else 0.0
+
+    @property
+    def values(self) -> Dict[str, float]:
+        """
+        COPs of every mode and window, by `<window>/<mode>`
+        """
+        return {f"{window}/{mode}": self.cop(mode, window) for window in self.windows for mode in self.modes}
+
+    def state(self) -> bytes:
+        """
+        Returns the sums of all windows and seasons, to be restored by `restore` after a restart
+        """
+        with self.__lock:
+            columns = len(self.__season_sums)
+            previous = self.__previous_season_sums
+            parts = [
+                struct.pack(f"<iB{columns}d", -1 if self.__season is None else self.__season, previous is not None, *self.__season_sums),
+                struct.pack(f"<{columns}d", *(previous or [0.0] * columns)),
+            ]
+            for window in self.__windows.values():
+                window_state = window.state()
+                parts.append(struct.pack("<I", len(window_state)))
+                parts.append(window_state)
+        return b"".join(parts)
+
+    def restore(self, state: bytes) -> None:
+        """
+        Restores the sums returned by `state` of statistics with the same modes and windows
+        """
+        with self.__lock:
+            columns = len(self.__season_sums)
+            season, has_previous, *season_sums = struct.unpack_from(f"<iB{columns}d", state, 0)
+            offset = struct.calcsize(f"<iB{columns}d")
+            previous = list(struct.unpack_from(f"<{columns}d", state, offset))
+            offset += 8 * columns
+            for window in self.__windows.values():
+                (size,) = struct.unpack_from("<I", state, offset)
+                window.restore(state[offset + 4 : offset + 4 + size])
+                offset += 4 + size
+            self.__season = None if season < 0 else season
+            self.__season_sums = season_sums
+            self.__previous_season_sums = previous if has_previous else None
@@ -0,0 +1,262 @@
+"""Operational events of a plant, detected as its values are updated"""
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from .metrics import SlidingWindow
+from .snapshot import group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.part import Part
+
+# Upper bounds in seconds of the bins of the duration histogram, the last bin is unbounded
+DURATION_BINS = (60, 300, 600, 1800, 3600, 7200)
+
+
+class Event:
+    """A period during which a value was active, e.g. a run of the compressor"""
+
+    __slots__ = ("kind", "path", "start", "end", "peak")
+
+    def __init__(self, kind: str, path: str, start: float, end: Optional[float] = None, peak: float = 0.0) -> None:
+        """Initialize the event.
+
+        Args:
+            kind: Kind of the event, e.g. `compressor`
+            path: Path of the value the event was detected on
+            start: Time the value became active, in seconds since the epoch
+            end: Time the value became inactive, None while it is active
+            peak: Highest value during the event
+        """
+        self.kind = kind
+        self.path = path
+        self.start = start
+        self.end = end
+        self.peak = peak
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else self.start) - self.start
+
+    def __repr__(self) -> str:
+        return f"Event(kind={self.kind!r}, path={self.path!r}, start={self.start}, end={self.end}, peak={self.peak})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "path": self.path, "start": self.start, "end": self.end, "duration": self.duration, "peak": self.peak}
+
+
+class EventDetector:
+    """State machine detecting the events of one value.
+
+    The value is active while `active` holds for it; an event starts with the
+    first active sample and ends with the first inactive one. Events shorter
+    than `min_duration` are dropped as noise. The statistics - how many events
+    completed, how many started in the last hour (counted when they start, so
+    short cycling shows while it happens) and a histogram of the durations of
+    the completed events (see `DURATION_BINS`) - take constant memory however
+    long the detector runs.
+    """
+
+    __slots__ = ("kind", "path", "active", "min_duration", "current", "last", "count", "total_duration", "histogram", "__starts")
+
+    def __init__(self, kind: str, path: str, active: Callable[[float], bool], min_duration: float = 0.0) -> None:
+        """Initialize the detector.
+
+        Args:
+            kind: Kind of the events
+            path: Path of the value
+            active: Tells whether a scaled value is active
+            min_duration: Events shorter than this, in seconds, are dropped
+        """
+        self.kind = kind
+        self.path = path
+        self.active = active
+        self.min_duration = min_duration
+        self.current: Optional[Event] = None
+        self.last: Optional[Event] = None
+        self.count = 0
+        self.total_duration = 0.0
+        self.histogram = [0] * (len(DURATION_BINS) + 1)
+        self.__starts = SlidingWindow(3600.0, 60)
+
+    def observe(self, timestamp: float, value: float) -> Optional[Event]:
+        """Feeds a sample.
+
+        Args:
+            timestamp: Time of the sample in seconds since the epoch
+            value: Scaled value
+
+        Returns:
+            The event the sample completed, if any
+        """
+        self.__starts.advance(timestamp)
+        if self.active(value):
+            if self.current is None:
+                self.current = Event(self.kind, self.path, timestamp, peak=value)
+                self.__starts.add(timestamp, 1.0)
+            elif value > self.current.peak:
+                self.current.peak = value
+            return None
+        event, self.current = self.current, None
+        if event is None:
+            return None
+        event.end = timestamp
+        if event.duration < self.min_duration:
+            # Noise is no start either, unless it already left the window
+            if event.duration < self.__starts.length:
+                self.__starts.add(timestamp, -1.0)
+            return None
+        self.last = event
+        self.count += 1
+        self.total_duration += event.duration
+        self.histogram[_bin(event.duration)] += 1
+        return event
+
+    @property
+    def starts_per_hour(self) -> int:
+        """
+        Number of events started in about the last hour, the running one included
+        """
+        return int(self.__starts.sums[0])
+
+    @property
+    def mean_duration(self) -> float:
+        return self.total_duration / self.count if self.count else 0.0
+
+    def statistics(self) -> Dict[str, Any]:
+        return {
+            "active": self.current is not None,
+            "count": self.count,
+            "starts_per_hour": self.starts_per_hour,
+            "mean_duration": self.mean_duration,
+            "histogram": dict(zip([f"<{bound}" for bound in DURATION_BINS] + [f">={DURATION_BINS[-1]}"], self.histogram)),
+        }
+
+
+def _bin(duration: float) -> int:
+    for index, bound in enumerate(DURATION_BINS):
+        if duration < bound:
+            return index
+    return len(DURATION_BINS)
+
+
+class EventMonitor:
+    """Detects operational events of a plant as it is updated.
+
+    Detectors are attached to values by the paths of `PlantSnapshot` and only
+    fed when their component was updated, with the time of the update;
+    completed events are passed to the listeners. See `plant_events` for the
+    common events of a plant.
+    """
+
+    def __init__(self, api: "SolarfocusAPI") -> None:
+        self.api = api
+        self.__lock = threading.Lock()
+        self.__detectors: Dict[str, List[Tuple[EventDetector, "Part"]]] = {}
+        self.__listeners: List[Callable[[Event], None]] = []
+
+    def attach(self) -> "EventMonitor":
+        """
+        Detects events in the updates of the plant
+        """
+        self.api.add_update_listener(self.record)
+        return self
+
+    def detach(self) -> None:
+        self.api.remove_update_listener(self.record)
+
+    def add_listener(self, callback: Callable[[Event], None]) -> None:
+        """
+        Calls the callback with every completed event
+        """
+        self.__listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Event], None]) -> None:
+        if callback in self.__listeners:
+            self.__listeners.remove(callback)
+
+    def add(self, kind: str, path: str, active: Callable[[float], bool], min_duration: float = 0.0) -> EventDetector:
+        """Detects events of a value.
+
+        Args:
+            kind: Kind of the events
+            path: Path of the value, e.g. `heatpump/compressor_speed`
+            active: Tells whether a scaled value is active
+            min_duration: Events shorter than this, in seconds, are dropped
+
+        Raises:
+            KeyError: If the plant has no value of the path
+        """
+        name = path.split("/", 1)[0]
+        group = self.api.component_manager.components.get(name)
+        part = None
+        if group is not None:
+            part = next((part for keys, part in group_parts(name, group) if "/".join(keys) == path), None)
+        if part is None:
+            raise KeyError(f"{path} is not a value of the plant")
+        detector = EventDetector(kind, path, active, min_duration)
+        with self.__lock:
+            self.__detectors.setdefault(name, []).append((detector, part))
+        return detector
+
+    @property
+    def detectors(self) -> List[EventDetector]:
+        with self.__lock:
+            return [detector for detectors in self.__detectors.values() for detector, _ in detectors]
+
+    def record(self, updated: List[str], timestamp: Optional[float] = None) -> None:
+        """Feeds the current values of updated components to their detectors.
+
+        Args:
+            updated: Names of the updated components
+            timestamp: Time of the update, now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        with self.__lock:
+            for name in updated:
+                for detector, part in self.__detectors.get(name, ()):
+                    event = detector.observe(timestamp, part.scaled_value)
+                    if event is not None:
+                        events.append(event)
+        for event in events:
+            for callback in list(self.__listeners):
+                try:
+                    callback(event)
+                except Exception as e:
+                    logging.exception(f"Event listener failed: {e}")
+
+    def statistics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Statistics of every detector, by `<kind>:<path>`
+        """
+        return {f"{detector.kind}:{detector.path}": detector.statistics() for detector in self.detectors}
+
+
+def plant_events(api: "SolarfocusAPI", burner_active: Callable[[float], bool] = lambda status: status != 0) -> EventMonitor:
+    """Returns a monitor of the common events of a plant, for the components it has.
+
+    - `compressor`: the compressor of the heat pump runs (its speed is above 0)
+    - `defrost`: the heat pump defrosts
+    - `tap`: hot water is drawn from a fresh water module (its flow rate is above 0)
+    - `burner`: the biomass boiler burns, by default whenever its status is not 0; the
+      meaning of the status codes depends on the boiler, so pass `burner_active` to narrow it
+
+    Args:
+        api: Plant to monitor
+        burner_active: Tells whether a status of the biomass boiler is a burn
+    """
+    monitor = EventMonitor(api)
+    components = api.component_manager.components
+    if components.get("heatpump") is not None:
+        monitor.add("compressor", "heatpump/compressor_speed", lambda speed: speed > 0)
+        monitor.add("defrost", "heatpump/defrost_active", lambda active: active != 0)
+    for index, module in enumerate(components.get("fresh_water_modules") or []):
+        if hasattr(module, "flow_rate"):
+            monitor.add("tap", f"fresh_water_modules/{index}/flow_rate", lambda flow: flow > 0)
+    if components.get("biomassboiler") is not None:
+        monitor.add("burner", "biomassboiler/status", burner_active)
+    return monitor
@@ -0,0 +1,334 @@
+"""Modbus TCP gateway sharing one connection to the eco manager-touch between many clients"""
+
+import logging
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .components.base.enums import RegisterTypes
+from .components.base.register_slice import RegisterSlice
+from .modbus_wrapper import RequestPriority
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.component import Component
+
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_VALUE = 0x03
+GATEWAY_PATH_UNAVAILABLE = 0x0A
+GATEWAY_TARGET_FAILED = 0x0B
+
+# Most registers a single modbus read may request
+MAX_READ_COUNT = 125
+# Most registers a single modbus write may carry
+MAX_WRITE_COUNT = 123
+
+_READ_FUNCTIONS = {READ_HOLDING_REGISTERS: RegisterTypes.HOLDING, READ_INPUT_REGISTERS: RegisterTypes.INPUT}
+
+
+class RegisterCache:
+    """Last known words of the registers of a plant, by register type and absolute address"""
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__words: Dict[RegisterTypes, Dict[int, Tuple[int, float]]] = {RegisterTypes.INPUT: {}, RegisterTypes.HOLDING: {}}
+
+    def refresh(self, components: Iterable["Component"]) -> None:
+        """
+        Stores the current values of the given components
+        """
+        now = time.monotonic()
+        with self.__lock:
+            for component in components:
+                for type in RegisterTypes:
+                    if not (component.has_input_address if type == RegisterTypes.INPUT else component.has_holding_address):
+                        continue
+                    words = self.__words[type]
+                    for _, value in component._get_values(type):
+                        address = value.get_absolute_address()
+                        raw = int(value.value)
+                        if value.count == 2:
+                            raw &= 0xFFFFFFFF
+                            words[address] = (raw >> 16, now)
+                            words[address + 1] = (raw & 0xFFFF, now)
+                        else:
+                            words[address] = (raw & 0xFFFF, now)
+
+    def store(self, type: RegisterTypes, address: int, registers: List[int]) -> None:
+        """
+        Stores words read or written at the given address
+        """
+        now = time.monotonic()
+        with self.__lock:
+            words = self.__words[type]
+            for offset, word in enumerate(registers):
+                words[address + offset] = (word & 0xFFFF, now)
+
+    def get(self, type: RegisterTypes, address: int, count: int, max_age: float) -> Optional[List[int]]:
+        """
+        Returns the words at the given address if all of them are cached and not older than `max_age` seconds
+        """
+        oldest = time.monotonic() - max_age
+        with self.__lock:
+            words = self.__words[type]
+            result = []
+            for current in range(address, address + count):
+                entry = words.get(current)
+                if entry is None or entry[1] < oldest:
+                    return None
+                result.append(entry[0])
+        return result
+
+    def clear(self) -> None:
+        with self.__lock:
+            for words in self.__words.values():
+                words.clear()
+
+
+class _Read:
+    """A forwarded read in progress, shared by every request it covers"""
+
+    __slots__ = ("type", "address", "count", "done", "registers")
+
+    def __init__(self, type: RegisterTypes, address: int, count: int) -> None:
+        self.type = type
+        self.address = address
+        self.count = count
+        self.done = threading.Event()
+        self.registers: Optional[List[int]] = None
+
+    def covers(self, type: RegisterTypes, address: int, count: int) -> bool:
+        return self.type == type and self.address <= address and address + count <= self.address + self.count
+
+
+class ModbusGateway:
+    """Modbus TCP server answering any number of clients over the one connection of a plant.
+
+    The eco manager-touch accepts only a few connections, so clients (the Home
+    Assistant integration, a HEMS, a logger, ...) connect to the gateway instead.
+    Reads are answered from a cache refreshed by every update of the plant, e.g.
+    by a `Poller`; reads of registers the plant does not poll are forwarded, and
+    concurrent reads covered by one that is already forwarded wait for it
+    instead of being read again. Writes are forwarded through the write queue of
+    the connector, which serves them ahead of polling, a block of registers as
+    one request. Only requests to the unit id of the plant are served, others
+    are answered with a gateway path unavailable exception.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", host: str = "127.0.0.1", port: int = 5020, max_age: float = 60.0) -> None:
+        """Initialize the gateway.
+
+        Args:
+            api: Plant whose connection is shared
+            host: Address to listen on, `0.0.0.0` to serve other hosts too
+            port: Port to listen on (0 for any free port)
+            max_age: Seconds a cached register is answered from memory before it is read again
+        """
+        self.api = api
+        self.unit_id = api.slave_id
+        self.host = host
+        self.port = port
+        self.max_age = max_age
+        self.cache = RegisterCache()
+        self.__lock = threading.Lock()
+        self.__reads: List[_Read] = []
+        self.__server: Optional[socketserver.ThreadingTCPServer] = None
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def server_address(self) -> Tuple[str, int]:
+        """
+        Address the gateway listens on, once started
+        """
+        if self.__server is None:
+            raise RuntimeError("Gateway is not started")
+        return self.__server.server_address[:2]  # type: ignore[return-value]
+
+    def start(self) -> None:
+        """
+        Starts serving clients on a background thread
+        """
+        if self.__server is not None:
+            return
+        self.api.add_update_listener(self._on_update)
+        self.__server = _Server((self.host, self.port), _Handler)
+        self.__server.gateway = self
+        self.__thread = threading.Thread(target=self.__server.serve_forever, args=(0.1,), name=f"pysolarfocus-gateway-{self.port}", daemon=True)
+        self.__thread.start()
+        logging.info(f"Modbus gateway listening on {self.server_address[0]}:{self.server_address[1]}")
+
+    def stop(self) -> None:
+        """
+        Stops serving clients
+        """
+        self.api.remove_update_listener(self._on_update)
+        server, self.__server = self.__server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def _on_update(self, updated: List[str]) -> None:
+        components = self.api.component_manager.components
+        for name in updated:
+            group = components.get(name)
+            if group is not None:
+                self.cache.refresh(group if isinstance(group, list) else [group])
+
+    def handle(self, pdu: bytes, unit: int) -> bytes:
+        """Answers a modbus request.
+
+        Args:
+            pdu: Function code and data of the request
+            unit: Unit id the request is addressed to
+
+        Returns:
+            Function code and data of the response
+        """
+        function = pdu[0] if pdu else 0
+        if unit != self.unit_id:
+            return _error(function, GATEWAY_PATH_UNAVAILABLE)
+        try:
+            if function in _READ_FUNCTIONS:
+                address, count = struct.unpack(">HH", pdu[1:5])
+                if not 1 <= count <= MAX_READ_COUNT or address + count > 0x10000:
+                    return _error(function, ILLEGAL_DATA_VALUE)
+                registers = self.read(_READ_FUNCTIONS[function], address, count)
+                if registers is None:
+                    return _error(function, GATEWAY_TARGET_FAILED)
+                return struct.pack(f">BB{count}H", function, count * 2, *registers)
+            if function == WRITE_SINGLE_REGISTER:
+                address, value = struct.unpack(">HH", pdu[1:5])
+                if not self.write(address, [value]):
+                    return _error(function, GATEWAY_TARGET_FAILED)
+                return pdu[:5]
+            if function == WRITE_MULTIPLE_REGISTERS:
+                address, count, length = struct.unpack(">HHB", pdu[1:6])
+                if not 1 <= count <= MAX_WRITE_COUNT or length != count * 2 or len(pdu) < 6 + length:
+                    return _error(function, ILLEGAL_DATA_VALUE)
+                if not self.write(address, list(struct.unpack(f">{count}H", pdu[6 : 6 + length]))):
+                    return _error(function, GATEWAY_TARGET_FAILED)
+                return pdu[:5]
+        except struct.error:
+            return _error(function, ILLEGAL_DATA_VALUE)
+        return _error(function, ILLEGAL_FUNCTION)
+
+    def read(self, type: RegisterTypes, address: int, count: int) -> Optional[List[int]]:
+        """
+        Returns the registers at the given address from the cache, or reads them from the plant
+        """
+        registers = self.cache.get(type, address, count, self.max_age)
+        if registers is not None:
+            return registers
+
+        with self.__lock:
+            read = next((r for r in self.__reads if r.covers(type, address, count)), None)
+            is_leader = read is None
+            if read is None:
+                read = _Read(type, address, count)
+                self.__reads.append(read)
+
+        if is_leader:
+            try:
+                read.registers = self.__forward_read(type, address, count)
+                if read.registers is not None:
+                    self.cache.store(type, address, read.registers)
+            finally:
+                with self.__lock:
+                    self.__reads.remove(read)
+                read.done.set()
+        else:
+            read.done.wait()
+
+        if read.registers is None:
+            return None
+        return read.registers[address - read.address : address - read.address + count]
+
+    def __forward_read(self, type: RegisterTypes, address: int, count: int) -> Optional[List[int]]:
+        connector = self.api.modbus_connector
+        if not connector.is_connected and not connector.connect():
+            return None
+        read = connector.read_input_registers if type == RegisterTypes.INPUT else connector.read_holding_registers
+        success, registers = read([RegisterSlice(address, 0, count)], count, priority=RequestPriority.INTERACTIVE)
+        return registers if success else None
+
+    def write(self, address: int, values: List[int]) -> bool:
+        """
+        Writes consecutive holding registers to the plant in one request
+        """
+        connector = self.api.modbus_connector
+        if not connector.is_connected and not connector.connect():
+            return False
+        if not connector.write_registers(values, address):
+            return False
+        self.cache.store(RegisterTypes.HOLDING, address, values)
+        return True
+
+
+def _error(function: int, code: int) -> bytes:
+    return bytes((function | 0x80, code))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    gateway: ModbusGateway
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serves the requests of one client connection"""
+
+    server: _Server
+
+    def handle(self) -> None:
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            header = self.__receive(7)
+            if header is None:
+                return
+            transaction, protocol, length, unit = struct.unpack(">HHHB", header)
+            if protocol != 0 or length < 2:
+                return
+            pdu = self.__receive(length - 1)
+            if pdu is None:
+                return
+            response = self.server.gateway.handle(pdu, unit)
+            self.request.sendall(struct.pack(">HHHB", transaction, 0, len(response) + 1, unit) + response)
+
+    def __receive(self, size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Runs a gateway for one plant until interrupted
+    """
+    from .cli import plant_from_args, plant_parser, serve
+
+    parser = plant_parser("python -m pysolarfocus.gateway", ModbusGateway.__doc__)
+    parser.add_argument("--listen-host", default="127.0.0.1", help="address to listen on, 0.0.0.0 to serve other hosts too")
+    parser.add_argument("--listen-port", type=int, default=5020)
+    options = parser.parse_args(args)
+
+    api = plant_from_args(options)
+    serve(api, options.interval, ModbusGateway(api, options.listen_host, options.listen_port, max_age=options.interval * 3))
+
+
+if __name__ == "__main__":
+    main()
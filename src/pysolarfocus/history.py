@@ -0,0 +1,210 @@
+"""In-memory short-term history of the values of a plant"""
+
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from .snapshot import group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.part import Part
+
+# Samples kept per value by default, 4 hours at a 10 second poll interval
+DEFAULT_CAPACITY = 1440
+
+
+class RingBuffer:
+    """Fixed-capacity series of timestamped samples.
+
+    Timestamps and values are kept in two preallocated `array`s of doubles, so
+    a sample costs 16 bytes and no object, appending overwrites the oldest
+    sample once the buffer is full, and both columns can be handed to numpy
+    without copying (see `to_numpy`). Timestamps never decrease: a sample older
+    than the latest one is stored with the latest timestamp, which keeps range
+    queries a binary search.
+    """
+
+    __slots__ = ("capacity", "times", "values", "__start", "__length")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        """Initialize the buffer.
+
+        Args:
+            capacity: Number of samples kept
+        """
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1, got {capacity}")
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.__start = 0
+        self.__length = 0
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def append(self, timestamp: float, value: float) -> None:
+        """
+        Adds a sample, dropping the oldest one if the buffer is full
+        """
+        if self.__length:
+            timestamp = max(timestamp, self.times[(self.__start + self.__length - 1) % self.capacity])
+        if self.__length < self.capacity:
+            index = (self.__start + self.__length) % self.capacity
+            self.__length += 1
+        else:
+            index = self.__start
+            self.__start = (self.__start + 1) % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = value
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """
+        Returns the newest sample, None if there is none
+        """
+        if not self.__length:
+            return None
+        index = (self.__start + self.__length - 1) % self.capacity
+        return self.times[index], self.values[index]
+
+    def __bisect(self, timestamp: float) -> int:
+        """
+        Returns the logical index of the first sample at or after the timestamp
+        """
+        low, high = 0, self.__length
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[(self.__start + middle) % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __slice(self, column: array, first: int, last: int) -> array:
+        """
+        Returns the samples between two logical indices of a column, in order
+        """
+        begin, end = self.__start + first, self.__start + last
+        if end <= self.capacity:
+            return column[begin:end]
+        if begin >= self.capacity:
+            return column[begin - self.capacity : end - self.capacity]
+        return column[begin:] + column[: end - self.capacity]
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[array, array]:
+        """Returns the samples in a time range.
+
+        Args:
+            start: First timestamp included, None for the oldest sample
+            end: Timestamp excluded, None to include the newest sample
+
+        Returns:
+            Timestamps and values, oldest first
+        """
+        first = 0 if start is None else self.__bisect(start)
+        last = self.__length if end is None else self.__bisect(end)
+        last = max(first, last)
+        return self.__slice(self.times, first, last), self.__slice(self.values, first, last)
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        times, values = self.range()
+        return zip(times, values)
+
+    def to_numpy(self, start: Optional[float] = None, end: Optional[float] = None) -> Any:
+        """
+        Returns the samples in a time range as two numpy float64 arrays, requires numpy
+        """
+        import numpy
+
+        times, values = self.range(start, end)
+        return numpy.frombuffer(times, dtype=numpy.float64), numpy.frombuffer(values, dtype=numpy.float64)
+
+    def clear(self) -> None:
+        self.__start = 0
+        self.__length = 0
+
+
+class History:
+    """Short-term history of every value of a plant.
+
+    Every update appends the scaled value of each DataValue and
+    PerformanceCalculator of the updated components to its `RingBuffer`, with
+    the time the update completed. Buffers are addressed by the paths of
+    `PlantSnapshot`, e.g. `heating_circuits/0/supply_temperature`, and appear once
+    their component is first updated.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", capacity: int = DEFAULT_CAPACITY) -> None:
+        """Initialize the history.
+
+        Args:
+            api: Plant to record
+            capacity: Samples kept per value
+        """
+        self.api = api
+        self.capacity = capacity
+        self.__lock = threading.Lock()
+        self.__buffers: Dict[str, RingBuffer] = {}
+        self.__parts: Dict[str, List[Tuple[RingBuffer, "Part"]]] = {}
+
+    def attach(self) -> "History":
+        """
+        Records the updates of the plant
+        """
+        self.api.add_update_listener(self.record)
+        return self
+
+    def detach(self) -> None:
+        """
+        Stops recording the updates of the plant
+        """
+        self.api.remove_update_listener(self.record)
+
+    def record(self, updated: List[str], timestamp: Optional[float] = None) -> None:
+        """Appends the current values of updated components.
+
+        Args:
+            updated: Names of the updated components
+            timestamp: Time of the samples, now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        components = self.api.component_manager.components
+        with self.__lock:
+            for name in updated:
+                parts = self.__parts.get(name)
+                if parts is None:
+                    group = components.get(name)
+                    if group is None:
+                        continue
+                    parts = self.__parts[name] = []
+                    for keys, part in group_parts(name, group):
+                        buffer = self.__buffers["/".join(keys)] = RingBuffer(self.capacity)
+                        parts.append((buffer, part))
+                for buffer, part in parts:
+                    buffer.append(timestamp, part.scaled_value)
+
+    @property
+    def paths(self) -> List[str]:
+        """
+        Paths of the recorded values
+        """
+        with self.__lock:
+            return list(self.__buffers)
+
+    def buffer(self, path: str) -> Optional[RingBuffer]:
+        """
+        Returns the buffer of a value, None if it is not recorded
+        """
+        return self.__buffers.get(path)
+
+    def range(self, path: str, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[array, array]:
+        """
+        Returns the timestamps and values of a value in a time range, see `RingBuffer.range`
+        """
+        buffer = self.__buffers.get(path)
+        if buffer is None:
+            raise KeyError(f"{path} is not recorded")
+        with self.__lock:
+            return buffer.range(start, end)
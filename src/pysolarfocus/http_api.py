@@ -0,0 +1,320 @@
+"""HTTP/JSON api serving the latest values of a plant"""
+
+import inspect
+import json
+import logging
+import threading
+from enum import Enum
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple, get_type_hints
+from urllib.parse import parse_qs, urlsplit
+
+from .snapshot import PlantSnapshot, Subscription
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+# Largest request body accepted, the operations take a few small arguments
+MAX_BODY_SIZE = 4096
+
+PLANT_PATH = "/api/plant"
+OPERATIONS_PATH = "/api/operations"
+EVENTS_PATH = "/api/events"
+
+# Accepted range of the arguments of the operations by name: the power in W fits the signed
+# holding register and is never negative, temperatures in °C are what a controller accepts
+ARGUMENT_LIMITS: Dict[str, Tuple[float, float]] = {
+    "power": (0, 32767),
+    "temperature": (-30.0, 95.0),
+}
+
+# Seconds after which an idle event stream gets a comment, so proxies and clients keep it open
+KEEPALIVE_INTERVAL = 15.0
+
+
+def operations(api: "SolarfocusAPI") -> List[str]:
+    """
+    Returns the names of the `set_*` operations of the plant
+    """
+    return sorted(name for name in dir(type(api)) if name.startswith("set_") and callable(getattr(type(api), name)))
+
+
+class HttpApi:
+    """HTTP server exposing the snapshot of a plant as JSON.
+
+    `GET /api/plant`, `/api/plant/<component>[/<index>][/<field>]` answer from
+    the `PlantSnapshot`, so any number of readers cost no modbus traffic, with
+    an `ETag` so unchanged values are answered with `304 Not Modified`.
+    `POST /api/operations/<set_*>` runs an operation of `SolarfocusAPI` with the
+    arguments of a JSON object, e.g. `{"index": 0, "mode": 2}` for
+    `set_heating_circuit_mode`, and `GET /api/operations` lists them. Arguments
+    are converted to the types the operation is annotated with (modes must be
+    members of their enum) and checked against `ARGUMENT_LIMITS`, anything else
+    is answered with `400 Bad Request` before it reaches the plant. The
+    operations are not authenticated, so the server only listens on the local
+    host unless given another `host`.
+
+    `GET /api/events[?fields=<path>,<path>]` is a stream of server-sent events:
+    a `sync` event with all current values of the given paths (all if none are
+    given), then a `delta` event with the values which changed after every
+    update, both as a JSON object of values by path.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", host: str = "127.0.0.1", port: int = 8080, snapshot: Optional[PlantSnapshot] = None) -> None:
+        """Initialize the server.
+
+        Args:
+            api: Plant to serve
+            host: Address to listen on, `0.0.0.0` to serve other hosts too
+            port: Port to listen on (0 for any free port)
+            snapshot: Snapshot to serve, one following the plant is created if None
+        """
+        self.api = api
+        self.host = host
+        self.port = port
+        self.snapshot = snapshot if snapshot is not None else PlantSnapshot(api)
+        self.__owns_snapshot = snapshot is None
+        self.__operations = operations(api)
+        self.__server: Optional[ThreadingHTTPServer] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.__streams: Set[Subscription] = set()
+        self.__streams_lock = threading.Lock()
+
+    @property
+    def server_address(self) -> Tuple[str, int]:
+        """
+        Address the server listens on, once started
+        """
+        if self.__server is None:
+            raise RuntimeError("Server is not started")
+        return self.__server.server_address[:2]  # type: ignore[return-value]
+
+    def start(self) -> None:
+        """
+        Starts serving requests on a background thread
+        """
+        if self.__server is not None:
+            return
+        if self.__owns_snapshot:
+            self.snapshot.attach()
+        self.__server = _Server((self.host, self.port), _Handler)
+        self.__server.http_api = self
+        self.__thread = threading.Thread(target=self.__server.serve_forever, args=(0.1,), name=f"pysolarfocus-http-{self.port}", daemon=True)
+        self.__thread.start()
+        logging.info(f"HTTP api listening on {self.server_address[0]}:{self.server_address[1]}")
+
+    def stop(self) -> None:
+        """
+        Stops serving requests
+        """
+        if self.__owns_snapshot:
+            self.snapshot.detach()
+        with self.__streams_lock:
+            streams, self.__streams = self.__streams, set()
+        for subscription in streams:
+            self.snapshot.unsubscribe(subscription)
+        server, self.__server = self.__server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def open_stream(self, fields: Optional[List[str]]) -> Subscription:
+        """
+        Subscribes an event stream to the snapshot, it is closed when the server stops
+        """
+        subscription = self.snapshot.subscribe(fields)
+        with self.__streams_lock:
+            self.__streams.add(subscription)
+        return subscription
+
+    def close_stream(self, subscription: Subscription) -> None:
+        with self.__streams_lock:
+            self.__streams.discard(subscription)
+        self.snapshot.unsubscribe(subscription)
+
+    def run_operation(self, name: str, arguments: Any) -> Tuple[HTTPStatus, Any]:
+        """
+        Runs a `set_*` operation, returns the status and JSON body of the response
+        """
+        if name not in self.__operations:
+            return HTTPStatus.NOT_FOUND, {"error": f"Unknown operation {name}"}
+        if not isinstance(arguments, dict):
+            return HTTPStatus.BAD_REQUEST, {"error": "Arguments must be a JSON object"}
+        operation = getattr(self.api, name)
+        try:
+            bound = inspect.signature(operation).bind(**arguments)
+        except TypeError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        types = get_type_hints(operation)
+        try:
+            arguments = {key: _convert(key, types.get(key, int), value) for key, value in bound.arguments.items()}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        try:
+            return HTTPStatus.OK, {"success": bool(operation(**arguments))}
+        except (TypeError, ValueError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+
+    @property
+    def operation_names(self) -> List[str]:
+        return list(self.__operations)
+
+
+def _convert(name: str, annotation: Any, value: Any) -> Any:
+    """
+    Converts a JSON argument to the annotated type of its parameter, unannotated ones are indices
+    """
+    if annotation is bool:
+        if not isinstance(value, bool):
+            raise ValueError(f"{name} must be true or false, got {value!r}")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        try:
+            return annotation(value)
+        except ValueError:
+            members = ", ".join(f"{member.value} ({member.name})" for member in annotation)
+            raise ValueError(f"{name} must be one of {members}, got {value!r}") from None
+    if annotation is int and value != int(value):
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    value = annotation(value)
+    low, high = ARGUMENT_LIMITS.get(name, (0 if annotation is int else float("-inf"), float("inf")))
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}, got {value!r}")
+    return value
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    http_api: HttpApi
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves the requests of one client connection"""
+
+    server: _Server
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.__get(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self.__get(send_body=False)
+
+    def do_POST(self) -> None:
+        http_api = self.server.http_api
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if not path.startswith(OPERATIONS_PATH + "/"):
+            self.__send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_SIZE:
+            self.__send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request body too large"})
+            return
+        try:
+            arguments = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.__send_json(HTTPStatus.BAD_REQUEST, {"error": "Request body is not JSON"})
+            return
+        self.__send_json(*http_api.run_operation(path[len(OPERATIONS_PATH) + 1 :], arguments))
+
+    def __get(self, send_body: bool) -> None:
+        http_api = self.server.http_api
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        if path == EVENTS_PATH and send_body:
+            fields = [f for value in parse_qs(url.query).get("fields", []) for f in value.split(",") if f]
+            self.__stream(fields or None)
+            return
+        if path == OPERATIONS_PATH:
+            self.__send_json(HTTPStatus.OK, http_api.operation_names, send_body)
+            return
+        if path != PLANT_PATH and not path.startswith(PLANT_PATH + "/"):
+            self.__send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"}, send_body)
+            return
+        rendered = http_api.snapshot.render(path[len(PLANT_PATH) :])
+        if rendered is None:
+            self.__send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"}, send_body)
+            return
+        etag, body = rendered
+        if _matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.__send(HTTPStatus.OK, body, send_body, etag)
+
+    def __stream(self, fields: Optional[List[str]]) -> None:
+        http_api = self.server.http_api
+        subscription = http_api.open_stream(fields)
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            event = "sync"
+            changes = subscription.get(timeout=0)
+            while changes is not None:
+                if changes or event == "sync":
+                    data = json.dumps(changes, separators=(",", ":"))
+                    self.wfile.write(f"id: {http_api.snapshot.version}\nevent: {event}\ndata: {data}\n\n".encode())
+                    event = "delta"
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+                changes = subscription.get(timeout=KEEPALIVE_INTERVAL)
+        except OSError:
+            # The client went away
+            pass
+        finally:
+            http_api.close_stream(subscription)
+
+    def __send_json(self, status: HTTPStatus, content: Any, send_body: bool = True) -> None:
+        self.__send(status, json.dumps(content, separators=(",", ":")).encode(), send_body)
+
+    def __send(self, status: HTTPStatus, body: bytes, send_body: bool, etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Runs the HTTP api of one plant until interrupted
+    """
+    from .cli import plant_from_args, plant_parser, serve
+
+    parser = plant_parser("python -m pysolarfocus.http_api", HttpApi.__doc__)
+    parser.add_argument("--listen-host", default="127.0.0.1", help="address to listen on, 0.0.0.0 to serve other hosts too")
+    parser.add_argument("--listen-port", type=int, default=8080)
+    options = parser.parse_args(args)
+
+    api = plant_from_args(options)
+    serve(api, options.interval, HttpApi(api, options.listen_host, options.listen_port))
+
+
+if __name__ == "__main__":
+    main()
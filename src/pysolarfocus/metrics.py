@@ -0,0 +1,326 @@
+"""Derived metrics of a plant"""
+
+import struct
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from .components.base.counter import Counter
+from .components.base.metric import Metric
+from .snapshot import group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.part import Part
+
+
+class Formula(Metric):
+    """Metric computing a function of the scaled values of its inputs.
+
+    For example the share of the photovoltaic power used in the house:
+
+        Formula(lambda power, export: (power - export) / power if power > 0 else 0.0, pv.power, pv.grid_export)
+    """
+
+    __slots__ = ("function",)
+
+    def __init__(self, function: Callable[..., float], *inputs: "Part") -> None:
+        super().__init__(*inputs)
+        self.function = function
+
+    def compute(self) -> float:
+        try:
+            return self.function(*[part.scaled_value for part in self.inputs])
+        except ZeroDivisionError:
+            return 0.0
+
+
+class SlidingWindow:
+    """Sums of values over a sliding time window, in constant memory.
+
+    The window is divided into `slots` intervals of equal width, each holding
+    the sums of the values added during it in one flat `array` of doubles; the
+    sums of the window are recomputed from the slots only when a new interval
+    starts, so adding a value is a few additions whatever the length of the
+    window. The window covers the current, partial interval and the
+    `slots - 1` before it.
+    """
+
+    __slots__ = ("length", "slots", "width", "columns", "revision", "__sums", "__totals", "__current")
+
+    def __init__(self, length: float, slots: int = 60, columns: int = 1) -> None:
+        """Initialize the window.
+
+        Args:
+            length: Length of the window in seconds
+            slots: Intervals the window is divided into
+            columns: Number of values summed separately
+        """
+        if length <= 0 or slots < 1:
+            raise ValueError(f"Window of {length} seconds in {slots} slots is invalid")
+        self.length = length
+        self.slots = slots
+        self.width = length / slots
+        self.columns = columns
+        # Incremented whenever the sums change
+        self.revision = 0
+        self.__sums = array("d", bytes(8 * slots * columns))
+        self.__totals = [0.0] * columns
+        self.__current: Optional[int] = None
+
+    def advance(self, timestamp: float) -> None:
+        """
+        Moves the window to end at a time, dropping the intervals which left it
+        """
+        slot = int(timestamp // self.width)
+        if self.__current is None:
+            self.__current = slot
+            return
+        if slot <= self.__current:
+            return
+        columns = self.columns
+        for expired in range(self.__current + 1, min(slot, self.__current + self.slots) + 1):
+            start = (expired % self.slots) * columns
+            self.__sums[start : start + columns] = array("d", bytes(8 * columns))
+        self.__current = slot
+        self.__totals = [sum(self.__sums[column::columns]) for column in range(columns)]
+        self.revision += 1
+
+    def add(self, timestamp: float, *values: float) -> None:
+        """
+        Adds one value per column at a time
+        """
+        self.advance(timestamp)
+        assert self.__current is not None
+        start = (self.__current % self.slots) * self.columns
+        for column, value in enumerate(values):
+            self.__sums[start + column] += value
+            self.__totals[column] += value
+        self.revision += 1
+
+    @property
+    def sums(self) -> Tuple[float, ...]:
+        """
+        Sums of every column over the window
+        """
+        return tuple(self.__totals)
+
+    def clear(self) -> None:
+        self.__sums = array("d", bytes(8 * self.slots * self.columns))
+        self.__totals = [0.0] * self.columns
+        self.__current = None
+        self.revision += 1
+
+    def state(self) -> bytes:
+        """
+        Returns the sums of the window, to be restored by `restore`
+        """
+        return struct.pack("<q", -1 if self.__current is None else self.__current) + self.__sums.tobytes()
+
+    def restore(self, state: bytes) -> None:
+        """
+        Restores the sums returned by `state` of a window of the same shape
+        """
+        (current,) = struct.unpack_from("<q", state, 0)
+        sums = array("d")
+        sums.frombytes(state[8:])
+        if len(sums) != self.slots * self.columns:
+            raise ValueError(f"State of {len(sums)} sums does not fit a window of {self.slots} x {self.columns}")
+        self.__sums = sums
+        self.__current = None if current < 0 else current
+        self.__totals = [sum(sums[column :: self.columns]) for column in range(self.columns)]
+        self.revision += 1
+
+
+class WindowedRatio(Metric):
+    """Ratio of the increases of two counters over a sliding window.
+
+    E.g. the COP of the last 24 hours is the ratio of the thermal and the
+    electrical energy produced and consumed in them. The increases are added
+    by `advance`, once per update of the counters (see `MetricGraph`).
+    """
+
+    __slots__ = ("nominator", "denominator", "window")
+
+    def __init__(self, nominator: Counter, denominator: Counter, length: float, slots: int = 60) -> None:
+        """Initialize the metric.
+
+        Args:
+            nominator: Counter whose increase is divided
+            denominator: Counter whose increase divides
+            length: Length of the window in seconds
+            slots: Intervals the window is divided into, see `SlidingWindow`
+        """
+        super().__init__(nominator, denominator)
+        self.nominator = nominator
+        self.denominator = denominator
+        self.window = SlidingWindow(length, slots, 2)
+
+    def _key(self) -> Hashable:
+        return self.window.revision
+
+    def advance(self, timestamp: float) -> None:
+        """
+        Adds the last increases of the counters at a time
+        """
+        self.window.add(timestamp, self.nominator.scaled_delta, self.denominator.scaled_delta)
+
+    def compute(self) -> float:
+        nominator, denominator = self.window.sums
+        return nominator / denominator if denominator else 0.0
+
+
+class MetricGraph:
+    """Named derived metrics of a plant.
+
+    Metrics declare their inputs - DataValues, PerformanceCalculators or other
+    metrics - and are recomputed lazily when one of them changed (see
+    `Metric`). Metrics keeping state across updates, like `WindowedRatio`, are
+    advanced once per update of the components of their inputs, in the order
+    they were added. Inputs can be given by the paths of `PlantSnapshot`, e.g.
+    `photovoltaic/power`.
+    """
+
+    def __init__(self, api: "SolarfocusAPI") -> None:
+        self.api = api
+        self.__lock = threading.Lock()
+        self.__metrics: Dict[str, Metric] = {}
+        # Components whose update advances each stateful metric
+        self.__advanced: Dict[str, List[Metric]] = {}
+
+    def attach(self) -> "MetricGraph":
+        """
+        Advances the stateful metrics with the updates of the plant
+        """
+        self.api.add_update_listener(self.advance)
+        return self
+
+    def detach(self) -> None:
+        self.api.remove_update_listener(self.advance)
+
+    def part(self, path: str) -> "Part":
+        """
+        Returns the part of a path, or the metric of a name
+        """
+        metric = self.__metrics.get(path)
+        if metric is not None:
+            return metric
+        name = path.split("/", 1)[0]
+        group = self.api.component_manager.components.get(name)
+        if group is not None:
+            for keys, part in group_parts(name, group):
+                if "/".join(keys) == path:
+                    return part
+        raise KeyError(f"{path} is neither a value of the plant nor a metric")
+
+    def __component(self, part: "Part") -> Optional[str]:
+        for name, group in self.api.component_manager.components.items():
+            if any(candidate is part for _, candidate in group_parts(name, group)):
+                return name
+        return None
+
+    def add(self, name: str, metric: Metric) -> Metric:
+        """
+        Adds a metric under a name
+        """
+        with self.__lock:
+            if name in self.__metrics:
+                raise ValueError(f"Metric {name} already exists")
+            self.__metrics[name] = metric
+            if hasattr(metric, "advance"):
+                for component in {self.__component(part) for part in metric.inputs} - {None}:
+                    self.__advanced.setdefault(component, []).append(metric)  # type: ignore[index]
+        return metric
+
+    def formula(self, name: str, function: Callable[..., float], *inputs: str) -> Metric:
+        """
+        Adds a `Formula` of the values or metrics of the given paths
+        """
+        return self.add(name, Formula(function, *[self.part(path) for path in inputs]))
+
+    def windowed_ratio(self, name: str, nominator: str, denominator: str, length: float, slots: int = 60) -> Metric:
+        """
+        Adds a `WindowedRatio` of the counters of the given paths
+        """
+        counters = [self.part(nominator), self.part(denominator)]
+        for path, counter in zip((nominator, denominator), counters):
+            if not isinstance(counter, Counter):
+                raise ValueError(f"{path} is not a counter")
+        return self.add(name, WindowedRatio(counters[0], counters[1], length, slots))
+
+    def remove(self, name: str) -> None:
+        with self.__lock:
+            metric = self.__metrics.pop(name)
+            for metrics in self.__advanced.values():
+                if metric in metrics:
+                    metrics.remove(metric)
+
+    def advance(self, updated: List[str], timestamp: Optional[float] = None) -> None:
+        """Advances the stateful metrics of the updated components.
+
+        Args:
+            updated: Names of the updated components
+            timestamp: Time of the update, now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.__lock:
+            advanced: List[Metric] = []
+            for name in updated:
+                for metric in self.__advanced.get(name, ()):
+                    if metric not in advanced:
+                        advanced.append(metric)
+            for metric in advanced:
+                metric.advance(timestamp)  # type: ignore[attr-defined]
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.__metrics)
+
+    def __getitem__(self, name: str) -> Metric:
+        return self.__metrics[name]
+
+    def get(self, name: str) -> float:
+        """
+        Returns the value of a metric
+        """
+        return self.__metrics[name].value
+
+    @property
+    def values(self) -> Dict[str, float]:
+        """
+        Values of all metrics by name
+        """
+        with self.__lock:
+            return {name: metric.value for name, metric in self.__metrics.items()}
+
+
+def plant_metrics(api: "SolarfocusAPI", windows: Sequence[Tuple[str, float]] = (("24h", 86400.0),)) -> MetricGraph:
+    """Returns the common derived metrics of a plant, for the components it has.
+
+    - `heatpump_cop_<window>`: Heating energy per electrical energy of the heat pump over each window
+    - `photovoltaic_self_consumption`: Share of the photovoltaic power used on site
+    - `photovoltaic_solar_fraction`: Share of the consumption of the house covered by photovoltaics
+
+    Args:
+        api: Plant of the metrics
+        windows: Name suffix and length in seconds of the windows of windowed metrics
+    """
+    graph = MetricGraph(api)
+    components = api.component_manager.components
+    if components.get("heatpump") is not None and isinstance(getattr(components["heatpump"], "thermal_energy_total", None), Counter):
+        for suffix, length in windows:
+            graph.windowed_ratio(f"heatpump_cop_{suffix}", "heatpump/thermal_energy_total", "heatpump/electrical_energy_total", length)
+    if components.get("photovoltaic") is not None:
+        graph.formula("photovoltaic_self_consumption", _share_used, "photovoltaic/power", "photovoltaic/grid_export")
+        graph.formula("photovoltaic_solar_fraction", _share_used, "photovoltaic/house_consumption", "photovoltaic/grid_import")
+    return graph
+
+
+def _share_used(total: float, exchanged: float) -> float:
+    """
+    Share of a total not exchanged with the grid, between 0 and 1
+    """
+    if total <= 0:
+        return 0.0
+    return min(1.0, max(0.0, (total - exchanged) / total))
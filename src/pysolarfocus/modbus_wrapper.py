@@ -1,7 +1,12 @@
 """Solarfocus modbus wrapper"""
+import itertools
 import logging
+import queue
+import threading
 import time
-from typing import List, Optional, Tuple
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any, Callable, List, Optional, Tuple
 
 try:
     # modbus version < 3.0
@@ -26,14 +31,42 @@ except ImportError:
 
 from .components.base.register_slice import RegisterSlice
 from .exceptions import ModbusConnectionError, RegisterReadError, RegisterWriteError
+from .rate_limiter import RateLimiter, RequestKind
+
+
+class RequestPriority(IntEnum):
+    """
+    Priority of a request to the modbus server, lower values are served first
+    """
+
+    WRITE = 0
+    INTERACTIVE = 1
+    POLL = 2
+
+
+# Queued after every request, to stop the worker once the queue is drained
+_STOP = len(RequestPriority)
+
+# Seconds the worker waits for requests before it ends, it is restarted by the next request
+WORKER_IDLE_TIMEOUT = 60.0
 
 
 class ModbusConnector:
     """
     Helper methods to read/write data to a modbus server with retry logic and better error handling
+
+    The connector is safe to share between threads: a single worker thread owns the
+    connection and serves all requests one at a time from a priority queue, so writes
+    and interactive reads get ahead of background polling and no two transactions
+    interleave. The `submit_*` methods return futures, the other methods wait for the
+    result. With a `rate_limiter` every request waits for its budget before it is sent;
+    while a read waits, the worker serves the queued writes, which have a budget of
+    their own, so throttled polling does not hold them up.
     """
 
-    def __init__(self, ip: str, port: int, slave_id: int, retry_count: int = 3, retry_delay: float = 1.0) -> None:
+    def __init__(
+        self, ip: str, port: int, slave_id: int, retry_count: int = 3, retry_delay: float = 1.0, rate_limiter: Optional[RateLimiter] = None
+    ) -> None:
         """Initialize ModbusConnector.
 
         Args:
@@ -42,14 +75,150 @@ class ModbusConnector:
             slave_id: Slave ID for modbus communication
             retry_count: Number of retries for failed operations
             retry_delay: Delay between retries in seconds
+            rate_limiter: Budget of requests per second, None for no limit
         """
         self.ip = ip
         self.port = port
         self.slave_id = slave_id
         self.retry_count = retry_count
         self.retry_delay = retry_delay
+        self.rate_limiter = rate_limiter
         self.client = ModbusClient(ip, port=port)
         self.__slave_args = {"unit": slave_id} if IS_LEGACY_VERSION else {"device_id": slave_id} if IS_VERSION_3_10 else {"slave": slave_id}
+        self.__requests: "queue.PriorityQueue[Tuple[int, int, Optional[Future], Optional[Callable[..., Any]], tuple]]" = queue.PriorityQueue()
+        self.__sequence = itertools.count()
+        self.__worker: Optional[threading.Thread] = None
+        self.__worker_lock = threading.Condition()
+        # Set while `close` waits for the worker, requests submitted meanwhile wait for it to end
+        self.__closing = False
+        # Set when a write is queued, wakes the worker while a read waits for its budget
+        self.__write_queued = threading.Event()
+
+    def submit(self, function: Callable[..., Any], *args: Any, priority: RequestPriority = RequestPriority.POLL) -> Future:
+        """Queues a function for the worker thread owning the connection.
+
+        Args:
+            function: Function to run on the worker thread
+            *args: Arguments of the function
+            priority: Priority of the request
+
+        Returns:
+            Future of the result of the function
+        """
+        future: Future = Future()
+        with self.__worker_lock:
+            if threading.current_thread() is not self.__worker:
+                self.__worker_lock.wait_for(lambda: not self.__closing)
+            if self.__worker is None or not self.__worker.is_alive():
+                self.__worker = threading.Thread(target=self.__serve, name=f"pysolarfocus-modbus-{self.ip}:{self.port}", daemon=True)
+                self.__worker.start()
+            self.__requests.put((priority, next(self.__sequence), future, function, args))
+        if priority == RequestPriority.WRITE:
+            self.__write_queued.set()
+        return future
+
+    def __serve(self) -> None:
+        """Serves the queued requests one at a time"""
+        while True:
+            try:
+                priority, _, future, function, args = self.__requests.get(timeout=WORKER_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self.__worker_lock:
+                    if self.__requests.empty():
+                        self.__worker = None
+                        return
+                continue
+            if priority == _STOP:
+                with self.__worker_lock:
+                    # Requests queued after the stop, e.g. by the worker closing itself, are still served
+                    if self.__requests.empty():
+                        self.__worker = None
+                        self.__worker_lock.notify_all()
+                        return
+                continue
+            assert future is not None and function is not None  # Type assertion for type checker
+            ModbusConnector.__run(future, function, args)
+
+    @staticmethod
+    def __run(future: Future, function: Callable[..., Any], args: tuple) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def __next_write(self) -> Optional[Tuple[int, int, Optional[Future], Optional[Callable[..., Any]], tuple]]:
+        """
+        Takes the first queued request if it is a write, None otherwise
+        """
+        try:
+            request = self.__requests.get_nowait()
+        except queue.Empty:
+            return None
+        if request[0] != RequestPriority.WRITE:
+            # Queued with its sequence number, so it keeps its place
+            self.__requests.put(request)
+            return None
+        return request
+
+    def __serve_writes(self, timeout: float) -> None:
+        """
+        Serves the queued writes for the given seconds, while a read on the worker thread waits for its budget
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            # Cleared before looking, so a write queued after the look sets it again
+            self.__write_queued.clear()
+            request = self.__next_write()
+            if request is not None:
+                _, _, future, function, args = request
+                assert future is not None and function is not None  # Type assertion for type checker
+                ModbusConnector.__run(future, function, args)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.__write_queued.wait(remaining)
+
+    def __acquire_read(self, registers: int) -> None:
+        """
+        Waits for the budget of a read, serving the queued writes meanwhile if on the worker thread
+        """
+        assert self.rate_limiter is not None  # Type assertion for type checker
+        sleep = self.__serve_writes if threading.current_thread() is self.__worker else None
+        self.rate_limiter.acquire(RequestKind.READ, 1, registers, sleep=sleep)
+
+    def __call(self, function: Callable[..., Any], *args: Any, priority: RequestPriority) -> Any:
+        """Runs a function on the worker thread and waits for its result"""
+        if threading.current_thread() is self.__worker:
+            return function(*args)
+        return self.submit(function, *args, priority=priority).result()
+
+    def close(self) -> None:
+        """Stops the worker thread once the queued requests are served and closes the connection.
+
+        Requests submitted while the worker stops wait for it to end and are served by a new
+        one, so there is never more than one worker using the connection.
+        """
+        with self.__worker_lock:
+            worker = self.__worker
+            if worker is not None and worker is not threading.current_thread():
+                self.__worker_lock.wait_for(lambda: not self.__closing)
+                worker = self.__worker
+            closing = worker is not None and worker is not threading.current_thread()
+            if worker is not None:
+                self.__requests.put((_STOP, next(self.__sequence), None, None, ()))
+            self.__closing = closing
+        try:
+            if closing:
+                worker.join()
+            self.client.close()
+        finally:
+            with self.__worker_lock:
+                if closing:
+                    self.__closing = False
+                    self.__worker_lock.notify_all()
 
     @property
     def is_connected(self) -> bool:
@@ -58,6 +227,9 @@ class ModbusConnector:
 
     def connect(self) -> bool:
         """Connect to modbus server with retry logic."""
+        return self.__call(self.__connect, priority=RequestPriority.INTERACTIVE)
+
+    def __connect(self) -> bool:
         for attempt in range(self.retry_count):
             try:
                 if self.client.connect():
@@ -75,14 +247,27 @@ class ModbusConnector:
         logging.error(f"Failed to connect to modbus server at {self.ip}:{self.port} after {self.retry_count} attempts")
         return False
 
-    def read_input_registers(self, slices: List[RegisterSlice], count: int, check_connection: bool = True) -> Tuple[bool, Optional[List[int]]]:
+    def read_input_registers(
+        self, slices: List[RegisterSlice], count: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.POLL
+    ) -> Tuple[bool, Optional[List[int]]]:
         """Internal method to read input registers from modbus"""
+        return self.__call(self.__read_input_registers, slices, count, check_connection, priority=priority)
+
+    def submit_read_input_registers(
+        self, slices: List[RegisterSlice], count: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.POLL
+    ) -> "Future[Tuple[bool, Optional[List[int]]]]":
+        """Queues a read of input registers, see `read_input_registers`"""
+        return self.submit(self.__read_input_registers, slices, count, check_connection, priority=priority)
+
+    def __read_input_registers(self, slices: List[RegisterSlice], count: int, check_connection: bool) -> Tuple[bool, Optional[List[int]]]:
         if check_connection and not self.is_connected:
             logging.error("Connection to modbus is not established!")
             return False, None
         try:
             combined_result: List[Optional[int]] = [None] * count
             for register_slice in slices:
+                if self.rate_limiter is not None:
+                    self.__acquire_read(register_slice.count)
                 result = self.client.read_input_registers(address=register_slice.absolute_address, count=register_slice.count, **self.__slave_args)
                 if result.isError():
                     logging.error(f"Modbus read error at address={register_slice.absolute_address}, count={register_slice.count}: {result}")
@@ -96,14 +281,27 @@ class ModbusConnector:
             logging.exception(f"Exception while reading input registers for address: '{slices[0].absolute_address}': {e}")
             return False, None
 
-    def read_holding_registers(self, slices: List[RegisterSlice], count: int, check_connection: bool = True) -> Tuple[bool, Optional[List[int]]]:
+    def read_holding_registers(
+        self, slices: List[RegisterSlice], count: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.POLL
+    ) -> Tuple[bool, Optional[List[int]]]:
         """Internal method to read holding registers from modbus"""
+        return self.__call(self.__read_holding_registers, slices, count, check_connection, priority=priority)
+
+    def submit_read_holding_registers(
+        self, slices: List[RegisterSlice], count: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.POLL
+    ) -> "Future[Tuple[bool, Optional[List[int]]]]":
+        """Queues a read of holding registers, see `read_holding_registers`"""
+        return self.submit(self.__read_holding_registers, slices, count, check_connection, priority=priority)
+
+    def __read_holding_registers(self, slices: List[RegisterSlice], count: int, check_connection: bool) -> Tuple[bool, Optional[List[int]]]:
         if check_connection and not self.is_connected:
             logging.error("Connection to modbus is not established!")
             return False, None
         try:
             combined_result: List[Optional[int]] = [None] * count
             for register_slice in slices:
+                if self.rate_limiter is not None:
+                    self.__acquire_read(register_slice.count)
                 result = self.client.read_holding_registers(address=register_slice.absolute_address, count=register_slice.count, **self.__slave_args)
                 if result.isError():
                     logging.error(f"Modbus read error at address={register_slice.absolute_address}: {result}")
@@ -117,17 +315,40 @@ class ModbusConnector:
             logging.exception(f"Exception while reading holding registers for address: '{slices[0].absolute_address}': {e}")
             return False, None
 
-    def write_register(self, value: int, address: int, check_connection: bool = True) -> bool:
+    def write_register(self, value: int, address: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.WRITE) -> bool:
         """Write a value to the modbus server"""
+        return self.__call(self.__write_register, value, address, check_connection, priority=priority)
+
+    def submit_write_register(self, value: int, address: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.WRITE) -> "Future[bool]":
+        """Queues a write of a value, see `write_register`"""
+        return self.submit(self.__write_register, value, address, check_connection, priority=priority)
+
+    def __write_register(self, value: int, address: int, check_connection: bool) -> bool:
+        return self.__write_registers([value], address, check_connection)
+
+    def write_registers(self, values: List[int], address: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.WRITE) -> bool:
+        """Write consecutive values starting at an address to the modbus server, in one request"""
+        return self.__call(self.__write_registers, values, address, check_connection, priority=priority)
+
+    def submit_write_registers(
+        self, values: List[int], address: int, check_connection: bool = True, priority: RequestPriority = RequestPriority.WRITE
+    ) -> "Future[bool]":
+        """Queues a write of consecutive values, see `write_registers`"""
+        return self.submit(self.__write_registers, values, address, check_connection, priority=priority)
+
+    def __write_registers(self, values: List[int], address: int, check_connection: bool) -> bool:
         if check_connection and not self.is_connected:
             logging.error("Connection to modbus is not established!")
             return False
+        shown = values[0] if len(values) == 1 else values
         try:
-            response = self.client.write_registers(address, [value], **self.__slave_args)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(RequestKind.WRITE, 1, len(values))
+            response = self.client.write_registers(address, values, **self.__slave_args)
             if response.isError():
-                logging.error(f"Error writing value={value} to register: {address}: {response}")
+                logging.error(f"Error writing value={shown} to register: {address}: {response}")
                 return False
         except Exception as e:
-            logging.exception(f"Exception while writing value={value} to register: {address}: {e}")
+            logging.exception(f"Exception while writing value={shown} to register: {address}: {e}")
             return False
         return True
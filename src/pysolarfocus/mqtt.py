@@ -0,0 +1,205 @@
+"""MQTT publisher of the values of a plant"""
+
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Protocol, Tuple
+
+from .snapshot import PlantSnapshot, group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+DEFAULT_PREFIX = "solarfocus"
+DISCOVERY_PREFIX = "homeassistant"
+ONLINE = "online"
+OFFLINE = "offline"
+
+
+class MqttClient(Protocol):
+    """The part of an MQTT client the publisher uses, `paho.mqtt.client.Client` is one"""
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> Any:
+        ...
+
+
+class MqttPublisher:
+    """Publishes the values of a plant to an MQTT broker.
+
+    Every value is a retained topic `<prefix>/<path>`, e.g.
+    `solarfocus/heating_circuits/0/supply_temperature`, published when it
+    changes and, every `heartbeat` seconds, unchanged - the heartbeat is checked
+    after every update, so a plant whose values hold steady is still republished.
+    The values changed by an update are published together once the update
+    completes, so there is no polling layer of its own: a `Poller` (or any
+    caller of `update`) drives it. `<prefix>/status` is `online` while the
+    publisher runs, and Home Assistant discovery payloads, built once from the
+    components of the plant, are published when it starts.
+    """
+
+    def __init__(
+        self,
+        api: "SolarfocusAPI",
+        client: MqttClient,
+        prefix: str = DEFAULT_PREFIX,
+        heartbeat: float = 300.0,
+        discovery_prefix: Optional[str] = DISCOVERY_PREFIX,
+        node_id: str = DEFAULT_PREFIX,
+        qos: int = 0,
+        snapshot: Optional[PlantSnapshot] = None,
+    ) -> None:
+        """Initialize the publisher.
+
+        Args:
+            api: Plant to publish
+            client: Connected MQTT client
+            prefix: Prefix of the value topics
+            heartbeat: Seconds after which all values are published again, changed or not (0 to never)
+            discovery_prefix: Prefix of the Home Assistant discovery topics (None to not publish any)
+            node_id: Identifier of the plant in Home Assistant
+            qos: Quality of service of the published messages
+            snapshot: Snapshot to publish, one following the plant is created if None
+        """
+        self.api = api
+        self.client = client
+        self.prefix = prefix.rstrip("/")
+        self.heartbeat = heartbeat
+        self.discovery_prefix = discovery_prefix
+        self.node_id = node_id
+        self.qos = qos
+        self.snapshot = snapshot if snapshot is not None else PlantSnapshot(api)
+        self.__owns_snapshot = snapshot is None
+        self.__discovery: Optional[List[Tuple[str, str]]] = None
+        self.__published_at = 0.0
+
+    @property
+    def status_topic(self) -> str:
+        return f"{self.prefix}/status"
+
+    def start(self) -> None:
+        """
+        Publishes the discovery payloads and all current values, then the changes of every update
+        """
+        if self.discovery_prefix is not None:
+            self.__publish(self.discovery())
+        self.__publish([(self.status_topic, ONLINE)])
+        self.snapshot.add_listener(self.publish_changes)
+        if self.__owns_snapshot:
+            self.snapshot.attach()
+        # After the snapshot, so a due heartbeat publishes the values of the update
+        self.api.add_update_listener(self.publish_heartbeat)
+        self.publish_all()
+
+    def stop(self) -> None:
+        """
+        Stops publishing and marks the plant offline
+        """
+        self.api.remove_update_listener(self.publish_heartbeat)
+        if self.__owns_snapshot:
+            self.snapshot.detach()
+        self.snapshot.remove_listener(self.publish_changes)
+        self.__publish([(self.status_topic, OFFLINE)])
+
+    def topic(self, path: str) -> str:
+        return f"{self.prefix}/{path}"
+
+    def publish_changes(self, changes: Dict[str, Any]) -> None:
+        """
+        Publishes the changed values by path, or all values if the heartbeat is due
+        """
+        if self.__heartbeat_due():
+            self.publish_all()
+        else:
+            self.__publish([(self.topic(path), _payload(value)) for path, value in changes.items()])
+
+    def publish_heartbeat(self, updated: Optional[List[str]] = None) -> None:
+        """
+        Publishes all values if the heartbeat is due, called after every update whether values changed or not
+        """
+        if self.__heartbeat_due():
+            self.publish_all()
+
+    def __heartbeat_due(self) -> bool:
+        return self.heartbeat > 0 and time.monotonic() - self.__published_at >= self.heartbeat
+
+    def publish_all(self) -> None:
+        """
+        Publishes all current values
+        """
+        self.__published_at = time.monotonic()
+        self.__publish([(self.topic(path), _payload(value)) for path, value in self.snapshot.values.items()])
+
+    def discovery(self) -> List[Tuple[str, str]]:
+        """
+        Returns the topics and payloads announcing every value of the plant to Home Assistant, built once
+        """
+        if self.__discovery is None:
+            device = {"identifiers": [self.node_id], "name": f"Solarfocus {self.api.system.value}", "manufacturer": "Solarfocus", "sw_version": self.api.api_version.value}
+            availability = self.status_topic
+            self.__discovery = []
+            for name, group in self.api.component_manager.components.items():
+                for keys, _ in group_parts(name, group):
+                    path = "/".join(keys)
+                    object_id = "_".join(keys)
+                    config = {
+                        "name": " ".join(keys).replace("_", " ").capitalize(),
+                        "unique_id": f"{self.node_id}_{object_id}",
+                        "state_topic": self.topic(path),
+                        "availability_topic": availability,
+                        "device": device,
+                    }
+                    self.__discovery.append((f"{self.discovery_prefix}/sensor/{self.node_id}/{object_id}/config", json.dumps(config, separators=(",", ":"))))
+        return self.__discovery
+
+    def __publish(self, messages: List[Tuple[str, str]]) -> None:
+        for topic, payload in messages:
+            try:
+                self.client.publish(topic, payload, qos=self.qos, retain=True)
+            except Exception as e:
+                logging.error(f"Failed to publish {topic}: {e}")
+
+
+def _payload(value: Any) -> str:
+    return json.dumps(value)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Runs the publisher of one plant until interrupted, requires paho-mqtt
+    """
+    from .cli import plant_from_args, plant_parser, serve
+
+    parser = plant_parser("python -m pysolarfocus.mqtt", MqttPublisher.__doc__)
+    parser.add_argument("--broker", default="localhost", help="Address of the MQTT broker")
+    parser.add_argument("--broker-port", type=int, default=1883)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    parser.add_argument("--node-id", default=DEFAULT_PREFIX)
+    parser.add_argument("--heartbeat", type=float, default=300.0)
+    parser.add_argument("--no-discovery", action="store_true", help="Do not publish Home Assistant discovery payloads")
+    options = parser.parse_args(args)
+
+    try:
+        from paho.mqtt import client as mqtt
+    except ImportError:
+        parser.error("paho-mqtt is required, install pysolarfocus[mqtt]")
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2) if hasattr(mqtt, "CallbackAPIVersion") else mqtt.Client()
+    if options.username:
+        client.username_pw_set(options.username, options.password)
+    client.will_set(f"{options.prefix.rstrip('/')}/status", OFFLINE, retain=True)
+    client.connect(options.broker, options.broker_port)
+    client.loop_start()
+
+    api = plant_from_args(options)
+    publisher = MqttPublisher(api, client, options.prefix, options.heartbeat, None if options.no_discovery else DISCOVERY_PREFIX, options.node_id)
+    try:
+        serve(api, options.interval, publisher)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Compiled register layouts of complete plants"""
+
+import importlib
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Type, Union
+
+from . import ApiVersions, Systems, __version__
+from .component_factory import ComponentFactory
+from .components.base.component import Component
+from .components.base.component_schema import ComponentSchema
+from .components.base.enums import DataTypes, RegisterTypes
+from .components.base.register_spec import RegisterSpec
+
+if TYPE_CHECKING:
+    from .modbus_wrapper import ModbusConnector
+
+# Class, input address, holding address and schema of one component
+LayoutEntry = Tuple[Type[Component], int, int, ComponentSchema]
+
+
+class PlantLayout:
+    """Resolved components of a plant configuration.
+
+    Resolving which components a (system, api version, component counts)
+    combination has - the version checks, the constructors of every component
+    and their register layouts - is done once per combination and memoized for
+    the process, so creating a plant is a table lookup. The memo can be written
+    to and read from a cache file, for services that restart often.
+    """
+
+    def __init__(self, groups: Dict[str, Union[LayoutEntry, List[LayoutEntry]]]) -> None:
+        """Initialize the layout.
+
+        Args:
+            groups: Component entry, or list of entries for multi-instance components, by component name
+        """
+        self.groups = groups
+
+    @staticmethod
+    def key(system: Systems, api_version: ApiVersions, counts: Tuple[int, ...]) -> Tuple[str, str, Tuple[int, ...]]:
+        return (system.value, api_version.value, tuple(counts))
+
+    @classmethod
+    def get(cls, system: Systems, api_version: ApiVersions, counts: Tuple[int, ...]) -> "PlantLayout":
+        """Returns the layout of the given configuration, compiling it on first use.
+
+        Args:
+            system: Solarfocus system type
+            api_version: API version
+            counts: Number of heating circuits, buffers, boilers, fresh water modules,
+                circulations, differential modules and solar components
+        """
+        key = PlantLayout.key(system, api_version, counts)
+        layout = _LAYOUTS.get(key)
+        if layout is None:
+            layout = _LAYOUTS[key] = cls.compile(system, api_version, counts)
+        return layout
+
+    @classmethod
+    def compile(cls, system: Systems, api_version: ApiVersions, counts: Tuple[int, ...]) -> "PlantLayout":
+        """
+        Resolves the components of the given configuration
+        """
+        components = ComponentFactory().plant(system, api_version, counts)
+
+        def entry(component: Component) -> LayoutEntry:
+            return (type(component), component.input_address, component.holding_address, component.schema)
+
+        return cls({name: [entry(c) for c in value] if isinstance(value, list) else entry(value) for name, value in components.items()})
+
+    def instantiate(self, modbus: "ModbusConnector") -> Dict[str, Any]:
+        """
+        Creates the initialized components of this layout
+        """
+
+        def create(entry: LayoutEntry) -> Component:
+            component_class, input_address, holding_address, schema = entry
+            return component_class.from_schema(schema, input_address, holding_address).initialize(modbus)
+
+        return {name: [create(e) for e in value] if isinstance(value, list) else create(value) for name, value in self.groups.items()}
+
+    @staticmethod
+    def save_cache(filename: str) -> None:
+        """Writes all layouts compiled in this process to a cache file.
+
+        Args:
+            filename: Path of the cache file
+        """
+        schemas: List[ComponentSchema] = []
+        indices: Dict[int, int] = {}
+
+        def schema_index(schema: ComponentSchema) -> int:
+            if id(schema) not in indices:
+                indices[id(schema)] = len(schemas)
+                schemas.append(schema)
+            return indices[id(schema)]
+
+        def dump_entry(entry: LayoutEntry) -> list:
+            component_class, input_address, holding_address, schema = entry
+            return [f"{component_class.__module__}:{component_class.__qualname__}", input_address, holding_address, schema_index(schema)]
+
+        layouts = []
+        for (system, api_version, counts), layout in _LAYOUTS.items():
+            groups = {name: [dump_entry(e) for e in value] if isinstance(value, list) else dump_entry(value) for name, value in layout.groups.items()}
+            layouts.append({"system": system, "api_version": api_version, "counts": list(counts), "groups": groups})
+
+        content = {
+            "version": __version__,
+            "schemas": [PlantLayout.__dump_schema(s) for s in schemas],
+            "layouts": layouts,
+        }
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump(content, file)
+
+    @staticmethod
+    def load_cache(filename: str) -> bool:
+        """Reads the layouts of a cache file into the memo of this process.
+
+        A cache file written by another version of this library is ignored.
+
+        Args:
+            filename: Path of the cache file
+
+        Returns:
+            True if the cache file was loaded, False otherwise
+        """
+        try:
+            with open(filename, encoding="utf-8") as file:
+                content = json.load(file)
+            if content.get("version") != __version__:
+                logging.info(f"Ignoring layout cache {filename} of version {content.get('version')}")
+                return False
+            schemas = [PlantLayout.__load_schema(s) for s in content["schemas"]]
+
+            def load_entry(entry: list) -> LayoutEntry:
+                class_name, input_address, holding_address, index = entry
+                return (PlantLayout.__load_class(class_name), input_address, holding_address, schemas[index])
+
+            layouts = {}
+            for layout in content["layouts"]:
+                key = PlantLayout.key(Systems(layout["system"]), ApiVersions(layout["api_version"]), tuple(layout["counts"]))
+                groups = {name: load_entry(value) if value and isinstance(value[0], str) else [load_entry(e) for e in value] for name, value in layout["groups"].items()}
+                layouts[key] = PlantLayout(groups)
+        except Exception as e:
+            logging.warning(f"Failed to load layout cache {filename}: {e}")
+            return False
+        _LAYOUTS.update(layouts)
+        return True
+
+    @staticmethod
+    def clear() -> None:
+        """
+        Forgets all compiled layouts of this process
+        """
+        _LAYOUTS.clear()
+
+    @staticmethod
+    def __dump_schema(schema: ComponentSchema) -> dict:
+        fields = [
+            [name, spec.address, spec.count, spec.multiplier, spec.write_multiplier, spec.data_type.value, spec.register_type.value, default_value]
+            for name, spec, default_value in schema.input_fields + schema.holding_fields
+        ]
+        return {
+            "input_address": schema.input_address,
+            "holding_address": schema.holding_address,
+            "fields": fields,
+            "calculators": [list(c) for c in schema.calculators],
+            "counters": list(schema.counters),
+        }
+
+    @staticmethod
+    def __load_schema(content: dict) -> ComponentSchema:
+        fields = [
+            (name, RegisterSpec.of(address, count, multiplier, DataTypes(data_type), RegisterTypes(register_type), write_multiplier), default_value)
+            for name, address, count, multiplier, write_multiplier, data_type, register_type, default_value in content["fields"]
+        ]
+        return ComponentSchema(content["input_address"], content["holding_address"], fields, [tuple(c) for c in content["calculators"]], tuple(content["counters"]))
+
+    @staticmethod
+    def __load_class(name: str) -> Type[Component]:
+        module_name, _, class_name = name.partition(":")
+        # Only components of this library can be referenced by a cache file
+        if not module_name.startswith(f"{__package__}.components."):
+            raise ValueError(f"{name} is not a component")
+        component_class = getattr(importlib.import_module(module_name), class_name)
+        if not (isinstance(component_class, type) and issubclass(component_class, Component)):
+            raise ValueError(f"{name} is not a component")
+        return component_class
+
+
+# Compiled layouts, keyed by system, api version and component counts
+_LAYOUTS: Dict[Tuple[str, str, Tuple[int, ...]], PlantLayout] = {}
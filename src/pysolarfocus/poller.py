@@ -0,0 +1,64 @@
+"""Background polling of a Solarfocus plant"""
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+
+class Poller:
+    """Updates a plant periodically on a background thread.
+
+    Services which share one plant between several consumers (the gateway, the
+    http api, the publishers) let one poller read the heating system and are
+    notified of the completed updates through `SolarfocusAPI.add_update_listener`.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", interval: float = 10.0) -> None:
+        """Initialize the poller.
+
+        Args:
+            api: Plant to update
+            interval: Seconds to wait after an update before starting the next
+        """
+        if interval <= 0:
+            raise ValueError(f"Polling interval must be positive, got {interval}")
+        self.api = api
+        self.interval = interval
+        self.__stopped = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Starts polling, the first update is done immediately
+        """
+        if self.is_running:
+            return
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name="pysolarfocus-poller", daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops polling and waits for a running update to complete
+        """
+        self.__stopped.set()
+        thread, self.__thread = self.__thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def __run(self) -> None:
+        while not self.__stopped.is_set():
+            try:
+                if not self.api.is_connected:
+                    self.api.connect()
+                self.api.update()
+            except Exception as e:
+                logging.exception(f"Error while polling: {e}")
+            self.__stopped.wait(self.interval)
@@ -0,0 +1,234 @@
+"""Prometheus exporter of the values of plants"""
+
+import logging
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .snapshot import DECIMALS, component_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.part import Part
+
+METRIC_PREFIX = "solarfocus_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample_value(value: Any) -> str:
+    if isinstance(value, float):
+        return repr(round(value, DECIMALS))
+    return str(int(value))
+
+
+class _Sample:
+    """One value of a plant, with its metric name and labels rendered once"""
+
+    __slots__ = ("prefix", "part", "value", "line")
+
+    def __init__(self, prefix: str, part: "Part") -> None:
+        self.prefix = prefix
+        self.part = part
+        self.value: Any = None
+        self.line = ""
+
+    def render(self) -> bool:
+        """
+        Renders the line of the sample if its value changed, returns whether it did
+        """
+        value = self.part.scaled_value
+        if value == self.value and self.line:
+            return False
+        self.value = value
+        self.line = f"{self.prefix}{_sample_value(value)}\n"
+        return True
+
+
+class PrometheusExporter:
+    """Serves the values of plants in the Prometheus text format.
+
+    Every DataValue and PerformanceCalculator of a component is a gauge named
+    `solarfocus_<field>`, labelled with the system, the component and its index
+    (plus the labels given per plant). Names and labels are rendered once when a
+    component is first updated, and after that an update only renders the values
+    which changed, so a scrape is a copy of the rendered exposition however many
+    plants are exported and however often they are scraped.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9464) -> None:
+        """Initialize the exporter.
+
+        Args:
+            host: Address to listen on, `0.0.0.0` to be scraped from other hosts too
+            port: Port to listen on (0 for any free port)
+        """
+        self.host = host
+        self.port = port
+        self.__lock = threading.Lock()
+        self.__plants: List[Tuple["SolarfocusAPI", Dict[str, str], Any]] = []
+        self.__families: Dict[str, List[_Sample]] = {}
+        self.__samples: Dict[Tuple[int, str], List[_Sample]] = {}
+        self.__exposition = b""
+        self.__dirty = False
+        self.__server: Optional[ThreadingHTTPServer] = None
+        self.__thread: Optional[threading.Thread] = None
+
+    def add_plant(self, api: "SolarfocusAPI", labels: Optional[Dict[str, str]] = None) -> None:
+        """Exports the values of a plant once its components are updated.
+
+        Args:
+            api: Plant to export
+            labels: Additional labels of all values of the plant, e.g. {"plant": "home"}
+        """
+        labels = {"system": api.system.value, **(labels or {})}
+
+        def on_update(updated: List[str]) -> None:
+            self.update(api, labels, updated)
+
+        api.add_update_listener(on_update)
+        self.__plants.append((api, labels, on_update))
+
+    def remove_plant(self, api: "SolarfocusAPI") -> None:
+        """
+        Stops exporting the values of a plant
+        """
+        for plant in [p for p in self.__plants if p[0] is api]:
+            api.remove_update_listener(plant[2])
+            self.__plants.remove(plant)
+        with self.__lock:
+            for key in [key for key in self.__samples if key[0] == id(api)]:
+                samples = self.__samples.pop(key)
+                for name, family in list(self.__families.items()):
+                    family[:] = [s for s in family if s not in samples]
+                    if not family:
+                        del self.__families[name]
+            self.__dirty = True
+
+    def update(self, api: "SolarfocusAPI", labels: Dict[str, str], updated: List[str]) -> None:
+        """
+        Renders the changed values of the updated components of a plant
+        """
+        components = api.component_manager.components
+        with self.__lock:
+            for name in updated:
+                samples = self.__samples.get((id(api), name))
+                if samples is None:
+                    group = components.get(name)
+                    if group is None:
+                        continue
+                    samples = self.__samples[(id(api), name)] = self.__create_samples(labels, name, group if isinstance(group, list) else [group])
+                for sample in samples:
+                    if sample.render():
+                        self.__dirty = True
+
+    def __create_samples(self, labels: Dict[str, str], name: str, components: list) -> List[_Sample]:
+        samples = []
+        for index, component in enumerate(components):
+            rendered = ",".join(f'{key}="{_label_value(value)}"' for key, value in {**labels, "component": name, "index": str(index)}.items())
+            for field, part in component_parts(component):
+                metric = f"{METRIC_PREFIX}{field}"
+                sample = _Sample(f"{metric}{{{rendered}}} ", part)
+                self.__families.setdefault(metric, []).append(sample)
+                samples.append(sample)
+        self.__dirty = True
+        return samples
+
+    def exposition(self) -> bytes:
+        """
+        Returns the values of all plants in the Prometheus text format
+        """
+        with self.__lock:
+            if self.__dirty:
+                lines = []
+                for metric in sorted(self.__families):
+                    lines.append(f"# HELP {metric} Solarfocus {metric[len(METRIC_PREFIX) :]}\n# TYPE {metric} gauge\n")
+                    lines.extend(sample.line for sample in self.__families[metric])
+                self.__exposition = "".join(lines).encode()
+                self.__dirty = False
+            return self.__exposition
+
+    @property
+    def server_address(self) -> Tuple[str, int]:
+        """
+        Address the exporter listens on, once started
+        """
+        if self.__server is None:
+            raise RuntimeError("Exporter is not started")
+        return self.__server.server_address[:2]  # type: ignore[return-value]
+
+    def start(self) -> None:
+        """
+        Starts serving `/metrics` on a background thread
+        """
+        if self.__server is not None:
+            return
+        self.__server = _Server((self.host, self.port), _Handler)
+        self.__server.exporter = self
+        self.__thread = threading.Thread(target=self.__server.serve_forever, args=(0.1,), name=f"pysolarfocus-prometheus-{self.port}", daemon=True)
+        self.__thread.start()
+        logging.info(f"Prometheus exporter listening on {self.server_address[0]}:{self.server_address[1]}")
+
+    def stop(self) -> None:
+        """
+        Stops serving `/metrics`
+        """
+        server, self.__server = self.__server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    exporter: PrometheusExporter
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves the scrapes of one client connection"""
+
+    server: _Server
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = self.server.exporter.exposition()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Runs the exporter of one plant until interrupted
+    """
+    from .cli import plant_from_args, plant_parser, serve
+
+    parser = plant_parser("python -m pysolarfocus.prometheus", PrometheusExporter.__doc__)
+    parser.add_argument("--listen-host", default="127.0.0.1", help="address to listen on, 0.0.0.0 to be scraped from other hosts too")
+    parser.add_argument("--listen-port", type=int, default=9464)
+    parser.add_argument("--label", action="append", default=[], metavar="NAME=VALUE", help="Additional label of all values")
+    options = parser.parse_args(args)
+
+    api = plant_from_args(options)
+    exporter = PrometheusExporter(options.listen_host, options.listen_port)
+    exporter.add_plant(api, dict(label.split("=", 1) for label in options.label))
+    serve(api, options.interval, exporter)
+
+
+if __name__ == "__main__":
+    main()
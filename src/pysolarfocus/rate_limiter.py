@@ -0,0 +1,152 @@
+"""Request budgets protecting the eco manager-touch from being polled too hard"""
+
+import threading
+import time
+from enum import Enum
+from typing import Callable, Dict, Optional, Tuple
+
+
+class RequestKind(str, Enum):
+    """
+    Kind of a modbus request, each kind has a budget of its own
+    """
+
+    READ = "read"
+    WRITE = "write"
+
+
+class TokenBucket:
+    """Allows `rate` units per second on average and bursts of up to `burst` units.
+
+    Not thread-safe on its own, see `RateLimiter`.
+    """
+
+    __slots__ = ("rate", "burst", "__tokens", "__time")
+
+    def __init__(self, rate: float, burst: Optional[float] = None, now: Optional[float] = None) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            rate: Units added per second
+            burst: Capacity of the bucket, one second of the rate if None
+            now: Monotonic time the bucket starts at, now if None
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self.__tokens = self.burst
+        self.__time = time.monotonic() if now is None else now
+
+    def __refill(self, now: float) -> None:
+        if now > self.__time:
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__time) * self.rate)
+            self.__time = now
+
+    def available(self, now: float) -> float:
+        """
+        Returns the units available at a time
+        """
+        self.__refill(now)
+        return self.__tokens
+
+    def wait_time(self, units: float, now: float) -> float:
+        """
+        Returns the seconds until the units are available, units beyond the burst only need a full bucket
+        """
+        self.__refill(now)
+        missing = min(units, self.burst) - self.__tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, units: float, now: float) -> None:
+        """
+        Takes units, the balance may go negative so the debt is paid by waiting for later requests
+        """
+        self.__refill(now)
+        self.__tokens -= units
+
+
+class RateLimiter:
+    """Token bucket budgets of requests and registers per second, separate for reads and writes.
+
+    Every request costs one request and as many registers as it transfers; a
+    request waits until its kind has both left, so the controller is never
+    asked for more than the budgets on average, while short bursts stay fast.
+    A limit of None is no limit. Schedulers can ask `affordable` whether a read
+    fits the budget before queueing it, instead of waiting for it.
+    """
+
+    def __init__(
+        self,
+        read_requests: Optional[float] = 10.0,
+        read_registers: Optional[float] = None,
+        write_requests: Optional[float] = 5.0,
+        write_registers: Optional[float] = None,
+        burst: float = 1.0,
+    ) -> None:
+        """Initialize the limiter.
+
+        Args:
+            read_requests: Read requests per second
+            read_registers: Registers read per second
+            write_requests: Write requests per second
+            write_registers: Registers written per second
+            burst: Seconds of budget which may be spent at once
+        """
+        self.__lock = threading.Lock()
+        now = time.monotonic()
+        limits = {
+            (RequestKind.READ, "requests"): read_requests,
+            (RequestKind.READ, "registers"): read_registers,
+            (RequestKind.WRITE, "requests"): write_requests,
+            (RequestKind.WRITE, "registers"): write_registers,
+        }
+        self.__buckets: Dict[Tuple[RequestKind, str], TokenBucket] = {
+            key: TokenBucket(rate, max(rate * burst, 1.0), now) for key, rate in limits.items() if rate is not None
+        }
+        # Seconds requests waited for the budget in total
+        self.waited = 0.0
+
+    def __costs(self, kind: RequestKind, requests: int, registers: int):
+        for unit, cost in (("requests", requests), ("registers", registers)):
+            bucket = self.__buckets.get((kind, unit))
+            if bucket is not None:
+                yield bucket, cost
+
+    def acquire(self, kind: RequestKind, requests: int = 1, registers: int = 0, sleep: Optional[Callable[[float], None]] = None) -> float:
+        """Waits until the budget of a kind allows the requests, and spends it.
+
+        Args:
+            kind: Kind of the requests
+            requests: Number of requests
+            registers: Number of registers the requests transfer
+            sleep: Waits the given seconds for the budget, e.g. doing other work meanwhile; `time.sleep` if None
+
+        Returns:
+            Seconds waited
+        """
+        waited = 0.0
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                wait = max((bucket.wait_time(cost, now) for bucket, cost in self.__costs(kind, requests, registers)), default=0.0)
+                if wait <= 0:
+                    for bucket, cost in self.__costs(kind, requests, registers):
+                        bucket.take(cost, now)
+                    self.waited += waited
+                    return waited
+            (sleep or time.sleep)(wait)
+            waited += wait
+
+    def affordable(self, kind: RequestKind, requests: int, registers: int, within: float = 0.0) -> bool:
+        """Tells whether the budget of a kind allows the requests within some time, without spending it.
+
+        Args:
+            kind: Kind of the requests
+            requests: Number of requests
+            registers: Number of registers the requests transfer
+            within: Seconds the requests may wait for the budget
+        """
+        with self.__lock:
+            now = time.monotonic()
+            return all(bucket.available(now) + bucket.rate * within >= min(cost, bucket.burst) for bucket, cost in self.__costs(kind, requests, registers))
@@ -0,0 +1,264 @@
+"""Persistent history of the values of a plant in SQLite"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .snapshot import PlantSnapshot
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS samples (
+    series INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (series, time)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    series INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    min REAL,
+    max REAL,
+    sum REAL,
+    last REAL,
+    delta REAL,
+    PRIMARY KEY (series, resolution, start)
+) WITHOUT ROWID;
+"""
+
+# A closed aggregate: path, resolution and start in seconds, count, min, max, sum, last and counter delta
+RollupRow = Tuple[str, int, int, int, float, float, float, float, float]
+
+# Stops the writer once the queue is drained
+_STOP = None
+
+
+class Recorder:
+    """Records the changes of the values of a plant to an SQLite database.
+
+    The values changed by an update are queued with the time of the update and
+    written by a background thread, so the poll loop never waits for the disk;
+    the writer takes everything queued in one transaction, which keeps up with
+    1 Hz polling of a full plant on an SD card. The database runs in WAL mode
+    so queries read alongside the writer. Samples are keyed by the integer id of
+    their path (see `PlantSnapshot`) and the time in milliseconds, in a table
+    without rowid whose primary key is the index of range and latest queries.
+    Only changes are stored: the value at a time is the latest sample at or
+    before it. Aggregates of `rollups.Rollups` are written by the same thread
+    to a table keyed by path, resolution and start.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", filename: str, snapshot: Optional[PlantSnapshot] = None) -> None:
+        """Initialize the recorder.
+
+        Args:
+            api: Plant to record
+            filename: Path of the database, created if missing
+            snapshot: Snapshot whose changes are recorded, one following the plant is created if None
+        """
+        self.api = api
+        self.filename = filename
+        self.snapshot = snapshot if snapshot is not None else PlantSnapshot(api)
+        self.__owns_snapshot = snapshot is None
+        self.__queue: "queue.Queue[Optional[Tuple[Any, ...]]]" = queue.Queue()
+        self.__writer: Optional[threading.Thread] = None
+        self.__series: Dict[str, int] = {}
+        self.__readers = threading.local()
+        with closing(self.__connect()) as connection:
+            connection.executescript(SCHEMA)
+
+    def __connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.filename, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def start(self) -> None:
+        """
+        Starts recording the changes of every update
+        """
+        if self.__writer is not None:
+            return
+        self.__writer = threading.Thread(target=self.__write, name=f"pysolarfocus-recorder-{self.filename}", daemon=True)
+        self.__writer.start()
+        self.snapshot.add_listener(self.record)
+        if self.__owns_snapshot:
+            self.snapshot.attach()
+
+    def stop(self) -> None:
+        """
+        Stops recording and waits for the queued changes to be written
+        """
+        if self.__owns_snapshot:
+            self.snapshot.detach()
+        self.snapshot.remove_listener(self.record)
+        writer, self.__writer = self.__writer, None
+        if writer is not None:
+            self.__queue.put(_STOP)
+            writer.join()
+
+    def record(self, changes: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """Queues changed values for writing.
+
+        Args:
+            changes: Changed values by path
+            timestamp: Time of the changes in seconds since the epoch, now if None
+        """
+        self.__queue.put(("samples", int((time.time() if timestamp is None else timestamp) * 1000), dict(changes)))
+
+    def record_rollups(self, rows: List[RollupRow]) -> None:
+        """
+        Queues aggregates for writing, replacing any stored with the same path, resolution and start
+        """
+        self.__queue.put(("rollups", list(rows)))
+
+    def flush(self) -> None:
+        """
+        Waits until the changes queued so far are written, writes them on the calling thread if the recorder is not started
+        """
+        if self.__writer is not None:
+            self.__queue.join()
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self.__queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            with closing(self.__connect()) as connection:
+                self.__write_batch(connection, [item for item in batch if item is not _STOP])
+        finally:
+            for _ in batch:
+                self.__queue.task_done()
+
+    def __write(self) -> None:
+        connection = self.__connect()
+        try:
+            while True:
+                batch = [self.__queue.get()]
+                while True:
+                    try:
+                        batch.append(self.__queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self.__write_batch(connection, [item for item in batch if item is not _STOP])
+                except sqlite3.Error as e:
+                    logging.error(f"Failed to record {len(batch)} updates to {self.filename}: {e}")
+                finally:
+                    for _ in batch:
+                        self.__queue.task_done()
+                if _STOP in batch:
+                    return
+        finally:
+            connection.close()
+
+    def __write_batch(self, connection: sqlite3.Connection, batch: List[Tuple[Any, ...]]) -> None:
+        with connection:
+            samples, rollups = [], []
+            for item in batch:
+                if item[0] == "samples":
+                    _, timestamp, changes = item
+                    for path, value in changes.items():
+                        samples.append((self.__series_id(connection, path), timestamp, value))
+                else:
+                    for path, *row in item[1]:
+                        rollups.append((self.__series_id(connection, path), *row))
+            connection.executemany("INSERT OR REPLACE INTO samples (series, time, value) VALUES (?, ?, ?)", samples)
+            connection.executemany("INSERT OR REPLACE INTO rollups (series, resolution, start, count, min, max, sum, last, delta) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rollups)
+
+    def __series_id(self, connection: sqlite3.Connection, path: str) -> int:
+        series = self.__series.get(path)
+        if series is None:
+            connection.execute("INSERT OR IGNORE INTO series (path) VALUES (?)", (path,))
+            series = self.__series[path] = connection.execute("SELECT id FROM series WHERE path = ?", (path,)).fetchone()[0]
+        return series
+
+    @property
+    def __reader(self) -> sqlite3.Connection:
+        """
+        Connection for queries of the calling thread
+        """
+        connection = getattr(self.__readers, "connection", None)
+        if connection is None:
+            connection = self.__readers.connection = self.__connect()
+        return connection
+
+    @property
+    def paths(self) -> List[str]:
+        """
+        Paths of the recorded values
+        """
+        return [path for (path,) in self.__reader.execute("SELECT path FROM series ORDER BY id")]
+
+    def range(self, path: str, start: Optional[float] = None, end: Optional[float] = None) -> List[Tuple[float, Any]]:
+        """Returns the recorded changes of a value in a time range.
+
+        Args:
+            path: Path of the value
+            start: First time included in seconds since the epoch, None for the oldest sample
+            end: Time excluded in seconds since the epoch, None to include the newest sample
+
+        Returns:
+            Time in seconds since the epoch and value of every change, oldest first
+        """
+        rows = self.__reader.execute(
+            "SELECT time, value FROM samples WHERE series = (SELECT id FROM series WHERE path = ?) AND time >= ? AND time < ? ORDER BY time",
+            (path, -(2**63) if start is None else int(start * 1000), 2**63 - 1 if end is None else int(end * 1000)),
+        )
+        return [(timestamp / 1000, value) for timestamp, value in rows]
+
+    def latest(self, path: str, at: Optional[float] = None) -> Optional[Tuple[float, Any]]:
+        """Returns the value of a value at a time.
+
+        Args:
+            path: Path of the value
+            at: Time in seconds since the epoch, None for the newest sample
+
+        Returns:
+            Time and value of the latest change at or before the time, None if there is none
+        """
+        row = self.__reader.execute(
+            "SELECT time, value FROM samples WHERE series = (SELECT id FROM series WHERE path = ?) AND time <= ? ORDER BY time DESC LIMIT 1",
+            (path, 2**63 - 1 if at is None else int(at * 1000)),
+        ).fetchone()
+        return (row[0] / 1000, row[1]) if row else None
+
+    def rollups(self, path: str, resolution: int, start: Optional[float] = None, end: Optional[float] = None) -> List[Tuple[int, int, float, float, float, float, float]]:
+        """Returns the stored aggregates of a value in a time range.
+
+        Args:
+            path: Path of the value
+            resolution: Length of the aggregates in seconds
+            start: Start of the first aggregate included in seconds since the epoch, None for the oldest
+            end: Start excluded in seconds since the epoch, None to include the newest
+
+        Returns:
+            Start, count, min, max, sum, last and counter delta of every aggregate, oldest first
+        """
+        return self.__reader.execute(
+            "SELECT start, count, min, max, sum, last, delta FROM rollups WHERE series = (SELECT id FROM series WHERE path = ?) AND resolution = ? AND start >= ? AND start < ? ORDER BY start",
+            (path, resolution, -(2**63) if start is None else int(start), 2**63 - 1 if end is None else int(end)),
+        ).fetchall()
+
+    def close(self) -> None:
+        """
+        Stops recording and closes the connection of the calling thread
+        """
+        self.stop()
+        connection = getattr(self.__readers, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.__readers.connection = None
@@ -0,0 +1,261 @@
+"""Streaming multi-resolution aggregates of the values of a plant"""
+
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .components.base.counter import Counter
+from .snapshot import group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.part import Part
+    from .recorder import Recorder, RollupRow
+
+# 1 minute, 15 minutes, 1 hour and 1 day
+RESOLUTIONS = (60, 900, 3600, 86400)
+# Closed aggregates kept in memory per value and resolution
+DEFAULT_KEEP = 96
+
+
+class Bucket:
+    """Aggregate of the samples of one value in one interval.
+
+    `delta` is the increase of a counter over the interval, including the step
+    from the last sample of the previous interval, as `Counter.scaled_delta`
+    tells it: across resets and rollovers of the register.
+    """
+
+    __slots__ = ("start", "count", "min", "max", "sum", "last", "delta")
+
+    def __init__(self, start: int, count: int = 0, min: float = 0.0, max: float = 0.0, sum: float = 0.0, last: float = 0.0, delta: float = 0.0) -> None:
+        self.start = start
+        self.count = count
+        self.min = min
+        self.max = max
+        self.sum = sum
+        self.last = last
+        self.delta = delta
+
+    def __repr__(self) -> str:
+        return f"Bucket(start={self.start}, count={self.count}, min={self.min}, max={self.max}, mean={self.mean}, last={self.last}, delta={self.delta})"
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def add(self, value: float, delta: float) -> None:
+        if self.count:
+            if value < self.min:
+                self.min = value
+            elif value > self.max:
+                self.max = value
+        else:
+            self.min = self.max = value
+        self.count += 1
+        self.sum += value
+        self.last = value
+        self.delta += delta
+
+
+class Rollup:
+    """Aggregates of one value at several resolutions.
+
+    Each resolution has one open `Bucket`, aligned to multiples of the
+    resolution since the epoch (so days are UTC days); a sample of a later
+    interval closes it. A sample costs a few comparisons and additions per
+    resolution, whatever the length of the intervals.
+    """
+
+    __slots__ = ("resolutions", "counter", "open", "closed", "__started")
+
+    def __init__(self, resolutions: Sequence[int] = RESOLUTIONS, counter: bool = False, keep: int = DEFAULT_KEEP) -> None:
+        """Initialize the aggregates.
+
+        Args:
+            resolutions: Lengths of the intervals in seconds
+            counter: Whether the value is a cumulative register, whose deltas are aggregated
+            keep: Closed aggregates kept per resolution
+        """
+        self.resolutions = tuple(resolutions)
+        self.counter = counter
+        self.open: Dict[int, Bucket] = {}
+        self.closed: Dict[int, Deque[Bucket]] = {resolution: deque(maxlen=keep) for resolution in self.resolutions}
+        self.__started = False
+
+    def add(self, timestamp: float, value: float, delta: float = 0.0) -> List[Tuple[int, Bucket]]:
+        """Adds a sample.
+
+        Args:
+            timestamp: Time of the sample in seconds since the epoch
+            value: Scaled value
+            delta: Increase of a counter since the previous sample, see `Counter.scaled_delta`; the
+                increase up to the first sample happened before the aggregates and is not counted
+
+        Returns:
+            Resolution and aggregate of every interval the sample closed
+        """
+        if not self.counter or not self.__started:
+            delta = 0.0
+        self.__started = True
+        closed = []
+        for resolution in self.resolutions:
+            start = int(timestamp // resolution) * resolution
+            bucket = self.open.get(resolution)
+            if bucket is None or bucket.start < start:
+                if bucket is not None:
+                    self.closed[resolution].append(bucket)
+                    closed.append((resolution, bucket))
+                bucket = self.open[resolution] = Bucket(start)
+            bucket.add(value, delta)
+        return closed
+
+
+class Rollups:
+    """Streaming aggregates of every value of a plant.
+
+    Every update adds the scaled value of each DataValue and
+    PerformanceCalculator of the updated components to its `Rollup`, so the
+    min, max, mean, last value, sample count and, for every `Counter`, the increase over every minute, quarter hour, hour and
+    day are available as the samples arrive. Closed aggregates are kept in
+    memory and, given a `Recorder`, written alongside the recorded history;
+    queries over long ranges then read one row per interval instead of every
+    sample. Values are addressed by the paths of `PlantSnapshot`.
+    """
+
+    def __init__(self, api: "SolarfocusAPI", resolutions: Sequence[int] = RESOLUTIONS, keep: int = DEFAULT_KEEP, recorder: Optional["Recorder"] = None) -> None:
+        """Initialize the aggregates.
+
+        Args:
+            api: Plant to aggregate
+            resolutions: Lengths of the intervals in seconds
+            keep: Closed aggregates kept in memory per value and resolution
+            recorder: Recorder the closed aggregates are written to, None to only keep them in memory
+        """
+        self.api = api
+        self.resolutions = tuple(resolutions)
+        self.keep = keep
+        self.recorder = recorder
+        self.__lock = threading.Lock()
+        self.__rollups: Dict[str, Rollup] = {}
+        self.__parts: Dict[str, List[Tuple[str, Rollup, "Part"]]] = {}
+
+    def attach(self) -> "Rollups":
+        """
+        Aggregates the updates of the plant
+        """
+        self.api.add_update_listener(self.record)
+        return self
+
+    def detach(self) -> None:
+        """
+        Stops aggregating and writes the open aggregates to the recorder, if any
+        """
+        self.api.remove_update_listener(self.record)
+        if self.recorder is not None:
+            with self.__lock:
+                rows = [_row(path, resolution, bucket) for path, rollup in self.__rollups.items() for resolution, bucket in rollup.open.items()]
+            self.recorder.record_rollups(rows)
+
+    def record(self, updated: List[str], timestamp: Optional[float] = None) -> None:
+        """Adds the current values of updated components.
+
+        Args:
+            updated: Names of the updated components
+            timestamp: Time of the samples, now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        components = self.api.component_manager.components
+        rows: List["RollupRow"] = []
+        with self.__lock:
+            for name in updated:
+                parts = self.__parts.get(name)
+                if parts is None:
+                    group = components.get(name)
+                    if group is None:
+                        continue
+                    parts = self.__parts[name] = []
+                    for keys, part in group_parts(name, group):
+                        path = "/".join(keys)
+                        rollup = self.__rollups[path] = Rollup(self.resolutions, isinstance(part, Counter), self.keep)
+                        parts.append((path, rollup, part))
+                for path, rollup, part in parts:
+                    value = part.scaled_value
+                    if value is None:
+                        continue
+                    delta = part.scaled_delta if rollup.counter else 0.0
+                    for resolution, bucket in rollup.add(timestamp, value, delta):
+                        rows.append(_row(path, resolution, bucket))
+        if rows and self.recorder is not None:
+            self.recorder.record_rollups(rows)
+
+    @property
+    def paths(self) -> List[str]:
+        """
+        Paths of the aggregated values
+        """
+        with self.__lock:
+            return list(self.__rollups)
+
+    def rollup(self, path: str) -> Optional[Rollup]:
+        """
+        Returns the aggregates of a value, None if it is not aggregated
+        """
+        return self.__rollups.get(path)
+
+    def current(self, path: str, resolution: int) -> Optional[Bucket]:
+        """
+        Returns the open aggregate of a value, None if there is none
+        """
+        rollup = self.__rollups.get(path)
+        return None if rollup is None else rollup.open.get(resolution)
+
+    def buckets(self, path: str, resolution: int, start: Optional[float] = None, end: Optional[float] = None, include_open: bool = True) -> List[Bucket]:
+        """Returns the aggregates of a value in a time range.
+
+        Closed aggregates are read from the recorder if there is one, from memory otherwise.
+
+        Args:
+            path: Path of the value
+            resolution: Length of the intervals in seconds, one of `resolutions`
+            start: Start of the first interval included in seconds since the epoch, None for the oldest
+            end: Start excluded in seconds since the epoch, None to include the newest
+            include_open: Whether to include the interval still being aggregated
+
+        Returns:
+            Aggregates, oldest first
+        """
+        if resolution not in self.resolutions:
+            raise ValueError(f"Resolution must be one of {self.resolutions}, got {resolution}")
+        low = float("-inf") if start is None else start
+        high = float("inf") if end is None else end
+        with self.__lock:
+            rollup = self.__rollups.get(path)
+            if self.recorder is not None:
+                buckets = [Bucket(*row) for row in self.recorder.rollups(path, resolution, start, end)]
+            elif rollup is None:
+                raise KeyError(f"{path} is not aggregated")
+            else:
+                buckets = list(_between(rollup.closed[resolution], low, high))
+            if include_open and rollup is not None:
+                bucket = rollup.open.get(resolution)
+                if bucket is not None and low <= bucket.start < high:
+                    if buckets and buckets[-1].start == bucket.start:
+                        buckets.pop()
+                    buckets.append(_copy(bucket))
+        return buckets
+
+
+def _between(buckets: Deque[Bucket], low: float, high: float) -> Iterator[Bucket]:
+    for bucket in buckets:
+        if low <= bucket.start < high:
+            yield _copy(bucket)
+
+
+def _copy(bucket: Bucket) -> Bucket:
+    return Bucket(bucket.start, bucket.count, bucket.min, bucket.max, bucket.sum, bucket.last, bucket.delta)
+
+
+def _row(path: str, resolution: int, bucket: Bucket) -> "RollupRow":
+    return (path, resolution, bucket.start, bucket.count, bucket.min, bucket.max, bucket.sum, bucket.last, bucket.delta)
@@ -0,0 +1,294 @@
+"""Alert rules over the values of a plant"""
+
+import logging
+import operator
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .snapshot import group_parts
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.part import Part
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+# The operator which clears a threshold, and the direction the hysteresis moves it in
+_CLEARING = {"<": (operator.ge, 1), "<=": (operator.gt, 1), ">": (operator.le, -1), ">=": (operator.lt, -1)}
+_EXPRESSION = re.compile(r"^\s*([\w/]+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*$")
+
+INACTIVE = "inactive"
+PENDING = "pending"
+ACTIVE = "active"
+CLEARING = "clearing"
+
+
+class Alert:
+    """A change of the state of a rule, raised or cleared"""
+
+    __slots__ = ("rule", "active", "timestamp", "values")
+
+    def __init__(self, rule: str, active: bool, timestamp: float, values: Dict[str, Any]) -> None:
+        self.rule = rule
+        self.active = active
+        self.timestamp = timestamp
+        self.values = values
+
+    def __repr__(self) -> str:
+        return f"Alert(rule={self.rule!r}, active={self.active}, timestamp={self.timestamp}, values={self.values})"
+
+
+class Rule:
+    """A condition over values of a plant, raised while it holds.
+
+    `condition` gets the scaled values of `inputs`, in order. A rule is raised
+    once its condition held for `delay` seconds, and cleared once `clear` (by
+    default: the condition no longer holds) held for `clear_delay` seconds; a
+    `clear` condition different from the negated condition is a hysteresis.
+    """
+
+    __slots__ = ("name", "inputs", "condition", "clear", "delay", "clear_delay", "state", "since")
+
+    def __init__(
+        self,
+        name: str,
+        inputs: Sequence[str],
+        condition: Callable[..., bool],
+        clear: Optional[Callable[..., bool]] = None,
+        delay: float = 0.0,
+        clear_delay: float = 0.0,
+    ) -> None:
+        """Initialize the rule.
+
+        Args:
+            name: Name of the rule
+            inputs: Paths of the values the conditions get, see `PlantSnapshot`
+            condition: Tells whether the rule should be raised
+            clear: Tells whether a raised rule should be cleared, None for when the condition no longer holds
+            delay: Seconds the condition must hold before the rule is raised
+            clear_delay: Seconds the clear condition must hold before the rule is cleared
+        """
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.condition = condition
+        self.clear = clear
+        self.delay = delay
+        self.clear_delay = clear_delay
+        self.state = INACTIVE
+        # Time the state was entered
+        self.since = 0.0
+
+    @classmethod
+    def compile(cls, name: str, expression: str, hysteresis: float = 0.0, delay: float = 0.0, clear_delay: float = 0.0) -> "Rule":
+        """Compiles a threshold expression like `buffers/0/top_temperature < 40`.
+
+        Args:
+            name: Name of the rule
+            expression: Path, one of < <= > >= == != and a number
+            hysteresis: How far past the threshold the value must return to clear the rule, for < <= > >=
+            delay: Seconds the condition must hold before the rule is raised
+            clear_delay: Seconds the value must be back before the rule is cleared
+
+        Raises:
+            ValueError: If the expression is not a threshold
+        """
+        match = _EXPRESSION.match(expression)
+        if match is None:
+            raise ValueError(f"{expression!r} is not a threshold like 'buffers/0/top_temperature < 40'")
+        path, symbol, number = match.groups()
+        threshold = float(number)
+        compare = _OPERATORS[symbol]
+        clear = None
+        if hysteresis:
+            if symbol not in _CLEARING:
+                raise ValueError(f"Hysteresis needs one of < <= > >=, got {symbol}")
+            clearing, direction = _CLEARING[symbol]
+            clear_threshold = threshold + direction * hysteresis
+            clear = lambda value: clearing(value, clear_threshold)  # noqa: E731
+        return cls(name, (path,), lambda value: compare(value, threshold), clear, delay, clear_delay)
+
+    @property
+    def active(self) -> bool:
+        return self.state in (ACTIVE, CLEARING)
+
+    def evaluate(self, values: Sequence[Any], timestamp: float) -> Optional[bool]:
+        """Advances the state with the current values of the inputs.
+
+        Returns:
+            True if the rule was raised, False if it was cleared, None if neither
+        """
+        if self.active:
+            clear = self.clear(*values) if self.clear is not None else not self.condition(*values)
+            if not clear:
+                self.state = ACTIVE
+                return None
+            if self.state == ACTIVE:
+                self.state, self.since = CLEARING, timestamp
+            if timestamp - self.since >= self.clear_delay:
+                self.state, self.since = INACTIVE, timestamp
+                return False
+            return None
+        if not self.condition(*values):
+            self.state = INACTIVE
+            return None
+        if self.state == INACTIVE:
+            self.state, self.since = PENDING, timestamp
+        if timestamp - self.since >= self.delay:
+            self.state, self.since = ACTIVE, timestamp
+            return True
+        return None
+
+
+class RuleEngine:
+    """Evaluates alert rules as a plant is updated.
+
+    Rules are indexed by the paths of their inputs: every update compares only
+    the values rules depend on, of the updated components, with their previous
+    values, and evaluates only the rules of the values which changed. New rules
+    are evaluated by the next update, and rules waiting for a delay every update
+    until they are raised, cleared or their condition is gone. The cost of an update thus scales with
+    the changes, not with the number of rules and values.
+    """
+
+    def __init__(self, api: "SolarfocusAPI") -> None:
+        self.api = api
+        self.__lock = threading.Lock()
+        self.__rules: Dict[str, Rule] = {}
+        # Rules by input path, and the inputs read by component
+        self.__index: Dict[str, List[Rule]] = {}
+        self.__inputs: Dict[str, List[Tuple[str, "Part"]]] = {}
+        self.__values: Dict[str, Any] = {}
+        self.__waiting: Set[str] = set()
+        self.__listeners: List[Callable[[Alert], None]] = []
+
+    def attach(self) -> "RuleEngine":
+        """
+        Evaluates the rules with the updates of the plant
+        """
+        self.api.add_update_listener(self.evaluate)
+        return self
+
+    def detach(self) -> None:
+        self.api.remove_update_listener(self.evaluate)
+
+    def add_listener(self, callback: Callable[[Alert], None]) -> None:
+        """
+        Calls the callback with every raised and cleared rule
+        """
+        self.__listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Alert], None]) -> None:
+        if callback in self.__listeners:
+            self.__listeners.remove(callback)
+
+    def __part(self, path: str) -> "Part":
+        name = path.split("/", 1)[0]
+        group = self.api.component_manager.components.get(name)
+        if group is not None:
+            for keys, part in group_parts(name, group):
+                if "/".join(keys) == path:
+                    return part
+        raise KeyError(f"{path} is not a value of the plant")
+
+    def add(self, rule: Rule) -> Rule:
+        """
+        Adds a rule
+
+        Raises:
+            KeyError: If an input is not a value of the plant
+            ValueError: If there already is a rule of the name
+        """
+        parts = [(path, self.__part(path)) for path in rule.inputs]
+        with self.__lock:
+            if rule.name in self.__rules:
+                raise ValueError(f"Rule {rule.name} already exists")
+            self.__rules[rule.name] = rule
+            # Evaluated with the next update, even if its inputs are already tracked by other rules and do not change
+            self.__waiting.add(rule.name)
+            for path, part in parts:
+                rules = self.__index.setdefault(path, [])
+                if not rules:
+                    self.__inputs.setdefault(path.split("/", 1)[0], []).append((path, part))
+                rules.append(rule)
+        return rule
+
+    def threshold(self, name: str, expression: str, hysteresis: float = 0.0, delay: float = 0.0, clear_delay: float = 0.0) -> Rule:
+        """
+        Adds a rule compiled from a threshold expression, see `Rule.compile`
+        """
+        return self.add(Rule.compile(name, expression, hysteresis, delay, clear_delay))
+
+    def remove(self, name: str) -> None:
+        with self.__lock:
+            rule = self.__rules.pop(name)
+            self.__waiting.discard(name)
+            for path in rule.inputs:
+                rules = self.__index[path]
+                rules.remove(rule)
+                if not rules:
+                    del self.__index[path]
+                    self.__values.pop(path, None)
+                    component = path.split("/", 1)[0]
+                    self.__inputs[component] = [(p, part) for p, part in self.__inputs[component] if p != path]
+
+    @property
+    def rules(self) -> List[Rule]:
+        with self.__lock:
+            return list(self.__rules.values())
+
+    @property
+    def active(self) -> List[str]:
+        """
+        Names of the raised rules
+        """
+        with self.__lock:
+            return [name for name, rule in self.__rules.items() if rule.active]
+
+    def evaluate(self, updated: List[str], timestamp: Optional[float] = None) -> List[Alert]:
+        """Evaluates the rules of the changed values of updated components.
+
+        Args:
+            updated: Names of the updated components
+            timestamp: Time of the update, now if None
+
+        Returns:
+            Rules raised and cleared by the update
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        alerts = []
+        with self.__lock:
+            candidates: Dict[str, Rule] = {name: self.__rules[name] for name in self.__waiting}
+            for component in updated:
+                for path, part in self.__inputs.get(component, ()):
+                    value = part.scaled_value
+                    if path in self.__values and self.__values[path] == value:
+                        continue
+                    self.__values[path] = value
+                    for rule in self.__index[path]:
+                        candidates[rule.name] = rule
+            for name, rule in candidates.items():
+                if any(path not in self.__values for path in rule.inputs):
+                    continue
+                values = [self.__values[path] for path in rule.inputs]
+                raised = rule.evaluate(values, timestamp)
+                if rule.state in (PENDING, CLEARING):
+                    self.__waiting.add(name)
+                else:
+                    self.__waiting.discard(name)
+                if raised is not None:
+                    alerts.append(Alert(name, raised, timestamp, dict(zip(rule.inputs, values))))
+        for alert in alerts:
+            for callback in list(self.__listeners):
+                try:
+                    callback(alert)
+                except Exception as e:
+                    logging.exception(f"Alert listener failed: {e}")
+        return alerts
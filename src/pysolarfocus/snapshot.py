@@ -0,0 +1,289 @@
+"""Latest values of a plant, for serving them to many readers"""
+
+import json
+import logging
+import secrets
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .components.base.enums import RegisterTypes
+
+if TYPE_CHECKING:
+    from . import SolarfocusAPI
+    from .components.base.component import Component
+    from .components.base.part import Part
+
+# Decimals of scaled values, which hides the noise of the float multipliers (0.1 * 215 = 21.500000000000004)
+DECIMALS = 6
+
+
+def _json_value(value: Any) -> Any:
+    return round(value, DECIMALS) if isinstance(value, float) else value
+
+
+def component_parts(component: "Component") -> List[Tuple[str, "Part"]]:
+    """
+    Returns the name and part of every DataValue and PerformanceCalculator the component reads, in schema order
+    """
+    parts: List[Tuple[str, "Part"]] = []
+    if component.has_input_address:
+        parts.extend(component._get_values(RegisterTypes.INPUT))
+    if component.has_holding_address:
+        parts.extend(component._get_values(RegisterTypes.HOLDING))
+    parts.extend((name, getattr(component, name)) for name, _, _ in component.schema.calculators)
+    return parts
+
+
+def group_parts(name: str, group: Any) -> List[Tuple[Tuple[str, ...], "Part"]]:
+    """
+    Returns the path, as keys, and part of every value of a component or list of components of a plant
+    """
+    if isinstance(group, list):
+        return [((name, str(index), field), part) for index, component in enumerate(group) for field, part in component_parts(component)]
+    return [((name, field), part) for field, part in component_parts(group)]
+
+
+class Subscription:
+    """Changed values of a snapshot for one reader, limited to the paths it asked for.
+
+    Changes are merged until the reader takes them, so a slow reader gets the
+    latest value of each path instead of a growing backlog. The first changes
+    taken are all current values.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None) -> None:
+        """Initialize the subscription.
+
+        Args:
+            fields: Paths of the values or subtrees to follow, None for all
+        """
+        self.fields = tuple("/".join(filter(None, f.split("/"))) for f in fields) if fields else None
+        self.closed = False
+        self.__pending: Dict[str, Any] = {}
+        self.__condition = threading.Condition()
+
+    def matches(self, path: str) -> bool:
+        return self.fields is None or any(path == f or path.startswith(f + "/") or not f for f in self.fields)
+
+    def push(self, changes: Dict[str, Any]) -> None:
+        """
+        Adds changed values by path
+        """
+        with self.__condition:
+            for path, value in changes.items():
+                if self.matches(path):
+                    self.__pending[path] = value
+            if self.__pending:
+                self.__condition.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the changes since the last call, waiting up to `timeout` seconds for some ({} if there are none), None once closed
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__pending or self.closed, timeout)
+            if self.closed:
+                return None
+            changes, self.__pending = self.__pending, {}
+            return changes
+
+    def close(self) -> None:
+        with self.__condition:
+            self.closed = True
+            self.__condition.notify_all()
+
+
+class PlantSnapshot:
+    """Latest scaled values of a plant, kept up to date by its updates.
+
+    The snapshot is a tree of component name, index (for multi-instance
+    components) and field name, addressed by paths like `heatpump`,
+    `heating_circuits/0` or `heating_circuits/0/supply_temperature`. Every path
+    has a version which changes whenever a value below it changes, and
+    renderings are kept until then, so readers are served from memory no matter
+    how often they ask and how often the plant is polled. Listeners and
+    subscriptions get the fields that changed with every update.
+    """
+
+    def __init__(self, api: "SolarfocusAPI") -> None:
+        """Initialize the snapshot.
+
+        Args:
+            api: Plant to follow, values appear once their component is updated
+        """
+        self.api = api
+        self.__lock = threading.RLock()
+        self.__token = secrets.token_hex(4)
+        self.__generation = 0
+        self.__tree: Dict[str, Any] = {}
+        self.__values: Dict[str, Any] = {}
+        self.__versions: Dict[str, int] = {"": 0}
+        self.__rendered: Dict[str, Tuple[str, bytes]] = {}
+        self.__parts: Dict[str, List[Tuple[Tuple[str, ...], "Part"]]] = {}
+        self.__listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.__subscriptions: List[Subscription] = []
+
+    def attach(self) -> "PlantSnapshot":
+        """
+        Follows the updates of the plant
+        """
+        self.api.add_update_listener(self.refresh)
+        return self
+
+    def detach(self) -> None:
+        """
+        Stops following the updates of the plant
+        """
+        self.api.remove_update_listener(self.refresh)
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Call `callback` with the changed values by path after every update which changed any
+        """
+        self.__listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        if callback in self.__listeners:
+            self.__listeners.remove(callback)
+
+    def subscribe(self, fields: Optional[Iterable[str]] = None) -> Subscription:
+        """Follows the changes of the given paths.
+
+        Args:
+            fields: Paths of the values or subtrees to follow, None for all
+
+        Returns:
+            Subscription whose first changes are the current values
+        """
+        subscription = Subscription(fields)
+        with self.__lock:
+            subscription.push(self.__values)
+            self.__subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Stops following changes for a subscription and closes it
+        """
+        with self.__lock:
+            if subscription in self.__subscriptions:
+                self.__subscriptions.remove(subscription)
+        subscription.close()
+
+    @property
+    def subscriptions(self) -> List[Subscription]:
+        with self.__lock:
+            return list(self.__subscriptions)
+
+    @property
+    def version(self) -> int:
+        """
+        Version of the whole plant, it changes with every changed value
+        """
+        return self.__versions[""]
+
+    def __component_parts(self, name: str) -> List[Tuple[Tuple[str, ...], "Part"]]:
+        """
+        Returns the path and part of every value of a component (group), resolved once
+        """
+        parts = self.__parts.get(name)
+        if parts is None:
+            group = self.api.component_manager.components.get(name)
+            parts = self.__parts[name] = group_parts(name, group) if group is not None else []
+        return parts
+
+    def refresh(self, updated: List[str]) -> Dict[str, Any]:
+        """Takes over the values of updated components.
+
+        Args:
+            updated: Names of the updated components
+
+        Returns:
+            Changed values by path
+        """
+        changes: Dict[str, Any] = {}
+        with self.__lock:
+            self.__generation += 1
+            for name in updated:
+                parts = self.__component_parts(name)
+                if name not in self.__tree and parts:
+                    group = self.api.component_manager.components[name]
+                    self.__tree[name] = [{} for _ in group] if isinstance(group, list) else {}
+                for keys, part in parts:
+                    value = _json_value(part.scaled_value)
+                    path = "/".join(keys)
+                    if path in self.__values and self.__values[path] == value:
+                        continue
+                    self.__values[path] = value
+                    changes[path] = value
+                    node = self.__tree[keys[0]]
+                    if len(keys) == 3:
+                        node = node[int(keys[1])]
+                    node[keys[-1]] = value
+                    for depth in range(len(keys) + 1):
+                        self.__versions["/".join(keys[:depth])] = self.__generation
+            if changes:
+                for subscription in self.__subscriptions:
+                    subscription.push(changes)
+        if changes:
+            for callback in list(self.__listeners):
+                try:
+                    callback(changes)
+                except Exception as e:
+                    logging.exception(f"Error in snapshot listener {callback}: {e}")
+        return changes
+
+    @property
+    def values(self) -> Dict[str, Any]:
+        """
+        Copy of all values by path
+        """
+        with self.__lock:
+            return dict(self.__values)
+
+    def get(self, path: str = "") -> Optional[Any]:
+        """
+        Returns a copy of the value or subtree at the given path, None if there is none
+        """
+        with self.__lock:
+            node = self.__node(path)
+            return json.loads(json.dumps(node)) if node is not None else None
+
+    def __node(self, path: str) -> Optional[Any]:
+        node: Any = self.__tree
+        for key in filter(None, path.split("/")):
+            if isinstance(node, dict) and key in node:
+                node = node[key]
+            elif isinstance(node, list) and key.isdigit() and int(key) < len(node):
+                node = node[int(key)]
+            else:
+                return None
+        return node
+
+    def etag(self, path: str = "") -> Optional[str]:
+        """
+        Returns the entity tag of the given path, None if there is nothing at it
+        """
+        path = "/".join(filter(None, path.split("/")))
+        with self.__lock:
+            version = self.__versions.get(path)
+            if version is None:
+                if self.__node(path) is None:
+                    return None
+                # An instance of a multi-instance component whose values did not change yet
+                version = 0
+            return f'"{self.__token}-{version}"'
+
+    def render(self, path: str = "") -> Optional[Tuple[str, bytes]]:
+        """
+        Returns the entity tag and JSON of the given path, None if there is nothing at it
+        """
+        path = "/".join(filter(None, path.split("/")))
+        with self.__lock:
+            etag = self.etag(path)
+            if etag is None:
+                return None
+            rendered = self.__rendered.get(path)
+            if rendered is None or rendered[0] != etag:
+                rendered = self.__rendered[path] = (etag, json.dumps(self.__node(path), separators=(",", ":")).encode())
+            return rendered
@@ -0,0 +1,34 @@
+"""Fixtures shared by the tests"""
+from unittest.mock import patch
+
+import pytest
+
+from pysolarfocus import ApiVersions, SolarfocusAPI, Systems
+
+
+def read_zeros(slices, count, **kwargs):
+    """Answers a read of the mocked connection with zeros"""
+    return True, [0] * count
+
+
+@pytest.fixture
+def make_plant():
+    """Creates plants on a mocked connection whose reads return zeros and whose writes succeed"""
+
+    def make(system=Systems.VAMPAIR, api_version=ApiVersions.V_25_030, **kwargs):
+        with patch("pysolarfocus.ModbusConnector"):
+            api = SolarfocusAPI(ip="localhost", system=system, api_version=api_version, **kwargs)
+        connector = api.modbus_connector
+        connector.read_input_registers.side_effect = read_zeros
+        connector.read_holding_registers.side_effect = read_zeros
+        connector.write_register.return_value = True
+        connector.write_registers.return_value = True
+        return api
+
+    return make
+
+
+@pytest.fixture
+def api(make_plant):
+    """A plant with one component of each kind, see `make_plant`"""
+    return make_plant()
@@ -0,0 +1,81 @@
+"""Tests for the Gorilla-style codec"""
+import random
+
+import pytest
+
+from pysolarfocus.codec import BitReader, BitWriter, DeltaOfDeltaDecoder, DeltaOfDeltaEncoder, SeriesEncoder, decode_columns, decode_series, encode_columns, encode_segment
+from pysolarfocus.columnar import ColumnStore, Segment
+
+
+def _round_trip(values):
+    encoder = DeltaOfDeltaEncoder()
+    encoder.extend(values)
+    decoder = DeltaOfDeltaDecoder(BitReader(encoder.writer.getvalue()))
+    return [decoder.next() for _ in values]
+
+
+def test_bits_round_trip():
+    writer = BitWriter()
+    writer.write(0b101, 3)
+    writer.write(0xABCDE, 20)
+    writer.write(1, 1)
+    reader = BitReader(writer.getvalue())
+    assert (reader.read(3), reader.read(20), reader.read(1)) == (0b101, 0xABCDE, 1)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [0, 0, 0],
+        [215, 216, 216, 214, -40, -32768, 32767],
+        [2**32 - 1, 0, 2**31, -(2**31)],
+        [1_700_000_000_000 + 10_000 * i for i in range(50)],
+        [-(2**63), 2**63 - 1, -(2**63), 0],
+    ],
+)
+def test_delta_of_delta_round_trip(values):
+    assert _round_trip(values) == values
+
+
+def test_random_round_trip():
+    generator = random.Random(1)
+    values = [generator.randint(-(2**40), 2**40) for _ in range(200)]
+    assert _round_trip(values) == values
+
+
+def test_series_compresses_regular_samples():
+    encoder = SeriesEncoder()
+    samples = [(1_700_000_000_000 + 10_000 * i, 215 + (i // 30) % 3) for i in range(8640)]
+    for timestamp, value in samples:
+        encoder.append(timestamp, value)
+    data = encoder.getvalue()
+
+    assert list(decode_series(data)) == samples
+    # 8 bytes per timestamp and 2 per value uncompressed
+    assert len(data) * 10 < len(samples) * 10
+
+
+def test_columns_and_segments(tmp_path):
+    segment = Segment.create(str(tmp_path / "segment.col"), [("temperature", "h"), ("energy", "I")], 100)
+    for i in range(100):
+        segment.append(1_700_000_000_000 + 10_000 * i, [-50 + i // 10, 4_000_000_000 + i * 3])
+
+    data = encode_segment(segment, 1_700_000_000_000 + 100_000)
+    times, columns = decode_columns(data)
+    assert len(times) == 90 and times[0] == 1_700_000_000_000 + 100_000
+    assert columns["temperature"][:2] == [-49, -49]
+    assert columns["energy"][-1] == 4_000_000_000 + 99 * 3
+    segment.close()
+
+    assert decode_columns(encode_columns([], {"a": []})) == ([], {"a": []})
+    with pytest.raises(ValueError):
+        decode_columns(b"nope")
+
+
+def test_store_export(tmp_path):
+    store = ColumnStore(str(tmp_path), [("temperature", "h")], capacity=4)
+    for second in range(6):
+        store.append(100 + second, [second])
+    blocks = list(store.export(101))
+    assert [decode_columns(block)[1]["temperature"] for block in blocks] == [[1, 2, 3], [4, 5]]
+    store.close()
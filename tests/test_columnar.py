@@ -0,0 +1,97 @@
+"""Tests for the columnar history files"""
+import os
+
+import pytest
+
+from pysolarfocus.columnar import ColumnarHistory, ColumnStore, Segment
+
+COLUMNS = [("temperature", "h"), ("energy", "I")]
+
+
+def test_segment_appends_and_reads_views(tmp_path):
+    segment = Segment.create(str(tmp_path / "segment.col"), COLUMNS, 4)
+    for second in range(3):
+        segment.append(second * 1000, [-second, 2**32 - 1])
+
+    times, values = segment.range(1000)
+    assert isinstance(times, memoryview)
+    assert list(times) == [1000, 2000]
+    assert list(values["temperature"]) == [-1, -2]
+    assert list(values["energy"]) == [2**32 - 1] * 2
+    del times, values
+
+    size = os.path.getsize(segment.filename)
+    segment.seal()
+    assert segment.sealed and os.path.getsize(segment.filename) < size
+    assert list(segment.range()[1]["temperature"]) == [0, -1, -2]
+    with pytest.raises(ValueError):
+        segment.append(4000, [0, 0])
+    segment.close()
+
+
+def test_store_rotates_full_segments(tmp_path):
+    store = ColumnStore(str(tmp_path), COLUMNS, capacity=3)
+    for second in range(8):
+        store.append(100 + second, [second, second])
+
+    assert [(s.rows, s.sealed) for s in store.segments] == [(3, True), (3, True), (2, False)]
+    times, values = store.read("temperature", 102, 106)
+    assert list(times) == [102.0, 103.0, 104.0, 105.0]
+    assert list(values) == [2, 3, 4, 5]
+    assert [segment.filename for segment, _, _ in store.scan(106)] == [store.segments[2].filename]
+    store.close()
+
+
+def test_store_survives_reopening(tmp_path):
+    store = ColumnStore(str(tmp_path), COLUMNS, capacity=10)
+    store.append(100, [1, 1])
+    store.close()
+
+    store = ColumnStore(str(tmp_path), COLUMNS, capacity=10)
+    store.append(101, [2, 2])
+    assert [(s.rows, s.sealed) for s in store.segments] == [(2, False)]
+    store.close()
+
+    store = ColumnStore(str(tmp_path), COLUMNS + [("mode", "h")], capacity=10)
+    store.append(102, [3, 3, 3])
+    assert [(s.rows, s.sealed) for s in store.segments] == [(2, True), (1, False)]
+    assert list(store.read("temperature")[1]) == [1, 2, 3]
+    assert list(store.read("mode")[1]) == [3]
+    store.close()
+
+
+def test_compaction_and_retention(tmp_path):
+    store = ColumnStore(str(tmp_path), COLUMNS, capacity=10)
+    for second in range(6):
+        store.append(100 + second, [second, second])
+        if second % 2:
+            store.rotate()
+    store.append(200, [9, 9])
+
+    assert len(store.segments) == 4
+    assert store.compact() == 2
+    assert [(s.rows, s.sealed) for s in store.segments] == [(6, True), (1, False)]
+    assert list(store.read("temperature")[1]) == [0, 1, 2, 3, 4, 5, 9]
+    assert len(os.listdir(tmp_path)) == 2
+
+    assert store.drop(150) == 1
+    assert list(store.read("temperature")[1]) == [9]
+    store.close()
+
+
+def test_history_records_raw_values(tmp_path, make_plant):
+    api = make_plant(heating_circuit_count=2)
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [0xFFF6] * count)
+    api.modbus_connector.read_holding_registers.side_effect = lambda slices, count, **kwargs: (True, [1] * count)
+    history = ColumnarHistory(api, str(tmp_path))
+    history.start()
+    api.update_heating()
+    history.stop()
+
+    store = history.store("heating_circuits")
+    assert list(store.read("1/supply_temperature")[1]) == [-10]
+    assert list(store.read("0/mode")[1]) == [1]
+    assert store.read("0/supply_temperature")[1].typecode == "h"
+    assert history.store("heatpump").segments == []
+    assert history.store("missing") is None
+    history.stop()
@@ -203,3 +203,15 @@ def test_factory_with_zero_count():
 
     buffers = factory.buffer(Systems.VAMPAIR, 0, ApiVersions.V_21_140)
     assert len(buffers) == 0
+
+
+def test_plant_without_connector():
+    """Test the factory creates a plant's components uninitialized without a connection"""
+    components = ComponentFactory().plant(Systems.VAMPAIR, ApiVersions.V_25_030, (2, 1, 1, 1, 1, 1, 1))
+    assert len(components["heating_circuits"]) == 2
+    assert len(components["circulations"]) == 1
+    assert components["heatpump"] is not None
+
+    components = ComponentFactory().plant(Systems.VAMPAIR, ApiVersions.V_22_090, (1, 1, 1, 1, 1, 1, 1))
+    assert "fresh_water_modules" not in components
+    assert "circulations" not in components
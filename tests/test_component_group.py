@@ -0,0 +1,195 @@
+"""Tests for ComponentGroup"""
+from unittest.mock import MagicMock
+
+from pysolarfocus import ApiVersions, Systems
+from pysolarfocus.component_manager import ComponentManager
+from pysolarfocus.components.base.component import Component
+from pysolarfocus.components.base.component_group import GAP_REFUSALS, GAP_RETRY, ComponentGroup
+from pysolarfocus.components.base.data_value import DataValue
+from pysolarfocus.components.base.enums import DataTypes, RegisterTypes
+from pysolarfocus.components.boiler import Boiler
+from pysolarfocus.components.differential_module import DifferentialModule
+from pysolarfocus.components.heating_circuit import HeatingCircuit
+
+
+class AdjacentComponent(Component):
+    """Component whose instances touch each other"""
+
+    def __init__(self, input_address=1000):
+        super().__init__(input_address)
+        self.first = DataValue(address=0, data_type=DataTypes.UINT)
+        self.second = DataValue(address=1, count=2)
+
+
+def _initialized(components):
+    modbus = MagicMock()
+    return [c.initialize(modbus) for c in components]
+
+
+def test_can_group_same_layout_and_stride():
+    circuits = _initialized([HeatingCircuit(1100 + 50 * i, 32600 + 50 * i, api_version=ApiVersions.V_25_030) for i in range(3)])
+    assert ComponentGroup.can_group(circuits)
+
+
+def test_can_group_rejects_single_and_mixed_components():
+    circuits = _initialized([HeatingCircuit(1100, 32600, api_version=ApiVersions.V_25_030)])
+    assert not ComponentGroup.can_group(circuits)
+
+    mixed = _initialized([HeatingCircuit(1100, 32600, api_version=ApiVersions.V_25_030), HeatingCircuit(1150, 32650, api_version=ApiVersions.V_21_140)])
+    assert not ComponentGroup.can_group(mixed)
+
+
+def test_can_group_rejects_irregular_or_overlapping_stride():
+    irregular = _initialized([Boiler(500, 32000), Boiler(550, 32050), Boiler(620, 32100)])
+    assert not ComponentGroup.can_group(irregular)
+
+    overlapping = _initialized([Boiler(500, 32000), Boiler(501, 32050)])
+    assert not ComponentGroup.can_group(overlapping)
+
+
+def test_group_reads_all_instances_in_one_request():
+    modbus = MagicMock()
+    modbus.read_input_registers.side_effect = lambda slices, count: (True, list(range(count)))
+    modbus.read_holding_registers.side_effect = lambda slices, count: (True, [7] * count)
+    boilers = [Boiler(500 + 50 * i, 32000 + 50 * i).initialize(modbus) for i in range(4)]
+
+    group = ComponentGroup(boilers, modbus, max_gap=64)
+    assert group.update() is True
+
+    assert modbus.read_input_registers.call_count == 1
+    assert modbus.read_holding_registers.call_count == 1
+    slices, count = modbus.read_input_registers.call_args.args
+    # The gaps between instances are read along, up to the size of a request
+    assert [(s.absolute_address, s.count) for s in slices] == [(500, 103), (650, 3)]
+    assert count == 153
+
+    for i, boiler in enumerate(boilers):
+        assert boiler.temperature.value == 50 * i
+        assert boiler.state.value == 50 * i + 1
+        assert boiler.mode.value == 50 * i + 2
+        assert boiler.single_charge.value == 7
+
+
+def test_group_merges_touching_instances():
+    modbus = MagicMock()
+    modbus.read_input_registers.side_effect = lambda slices, count: (True, [0, 1, 0xFFFF, 0xFFFE, 2, 0, 3])
+    components = [AdjacentComponent(1000 + 3 * i).initialize(modbus) for i in range(2)]
+    group = ComponentGroup(components, modbus)
+
+    assert len(group.input_slices) == 1
+    assert group.input_slices[0].absolute_address == 1000
+    assert group.input_slices[0].count == 6
+
+    # The combined read is one register short
+    assert group.update() is False
+
+    modbus.read_input_registers.side_effect = lambda slices, count: (True, [0, 0xFFFF, 0xFFFE, 2, 0, 3])
+    assert group.update() is True
+    assert components[0].first.value == 0
+    assert components[0].second.value == -2
+    assert components[1].first.value == 2
+    assert components[1].second.value == 3
+
+
+def test_group_matches_individual_decoding():
+    registers = [0xFF38, 0x0001, 0x0002, 0xFFFF, 0x8000, 0x0003]
+
+    modbus = MagicMock()
+    modbus.read_input_registers.side_effect = lambda slices, count: (True, (registers + [0] * 10)[:count])
+    single = DifferentialModule(2200, api_version=ApiVersions.V_25_030).initialize(modbus)
+    assert single.update()
+
+    modbus = MagicMock()
+    modbus.read_input_registers.side_effect = lambda slices, count: (True, (registers + [0] * 4 + registers)[:count])
+    modules = [DifferentialModule(2200 + 10 * i, api_version=ApiVersions.V_25_030).initialize(modbus) for i in range(2)]
+    assert ComponentGroup(modules, modbus).update()
+
+    for module in modules:
+        for name, value in module._get_values(RegisterTypes.INPUT):
+            assert value.value == getattr(single, name).value
+
+
+def test_group_reads_no_gaps_by_default():
+    modbus = MagicMock()
+    boilers = [Boiler(500 + 50 * i, 32000 + 50 * i).initialize(modbus) for i in range(4)]
+    group = ComponentGroup(boilers, modbus)
+    assert [s.absolute_address for s in group.input_slices] == [500, 550, 600, 650]
+
+
+def _refusing_boilers(refuse):
+    modbus = MagicMock()
+    # While refusing, any request spanning more than one instance fails
+    modbus.read_input_registers.side_effect = lambda slices, count: (not refuse() or all(s.count <= 3 for s in slices), [1] * count)
+    modbus.read_holding_registers.side_effect = lambda slices, count: (True, [7] * count)
+    boilers = [Boiler(500 + 50 * i, 32000 + 50 * i).initialize(modbus) for i in range(4)]
+    return modbus, boilers, ComponentGroup(boilers, modbus, max_gap=64)
+
+
+def test_group_stops_reading_gaps_the_controller_refuses():
+    modbus, boilers, group = _refusing_boilers(lambda: True)
+
+    for _ in range(GAP_REFUSALS):
+        modbus.read_input_registers.reset_mock()
+        assert group.update() is True
+        assert modbus.read_input_registers.call_count == 2
+    assert all(boiler.temperature.value == 1 for boiler in boilers)
+
+    # Refused in a row: the merged read is skipped, until it is tried again
+    for _ in range(GAP_RETRY):
+        modbus.read_input_registers.reset_mock()
+        assert group.update() is True
+        assert modbus.read_input_registers.call_count == 1
+        assert len(modbus.read_input_registers.call_args.args[0]) == 4
+    modbus.read_input_registers.reset_mock()
+    assert group.update() is True
+    assert modbus.read_input_registers.call_count == 2
+
+
+def test_group_keeps_reading_gaps_after_a_transient_failure():
+    failures = iter([True])
+    modbus, boilers, group = _refusing_boilers(lambda: next(failures, False))
+
+    assert group.update() is True
+    assert modbus.read_input_registers.call_count == 2
+    for _ in range(GAP_REFUSALS):
+        modbus.read_input_registers.reset_mock()
+        assert group.update() is True
+        assert modbus.read_input_registers.call_count == 1
+        assert len(modbus.read_input_registers.call_args.args[0]) == 2
+
+
+def test_group_read_failure():
+    modbus = MagicMock()
+    modbus.read_input_registers.return_value = (False, None)
+    modules = [DifferentialModule(2200 + 10 * i, api_version=ApiVersions.V_25_030).initialize(modbus) for i in range(2)]
+    group = ComponentGroup(modules, modbus)
+    assert group.update() is False
+    assert group.failed == [0, 1]
+
+
+def test_component_manager_reads_multi_instance_components_as_group():
+    modbus = MagicMock()
+    modbus.read_input_registers.side_effect = lambda slices, count: (True, [0] * count)
+    modbus.read_holding_registers.side_effect = lambda slices, count: (True, [0] * count)
+    manager = ComponentManager(modbus)
+    manager.create_components(Systems.VAMPAIR, ApiVersions.V_25_030, heating_circuit_count=8)
+
+    assert manager.update("heating_circuits") is True
+    assert modbus.read_input_registers.call_count == 1
+    assert modbus.read_holding_registers.call_count == 1
+    assert len(modbus.read_input_registers.call_args.args[0]) == 16
+
+    manager = ComponentManager(modbus, max_gap=64)
+    manager.create_components(Systems.VAMPAIR, ApiVersions.V_25_030, heating_circuit_count=8)
+    assert len(manager._groups["heating_circuits"].input_slices) < 16
+
+
+def test_component_manager_reports_failed_instances():
+    modbus = MagicMock()
+    modbus.read_input_registers.return_value = (False, None)
+    modbus.read_holding_registers.side_effect = lambda slices, count: (True, [0] * count)
+    manager = ComponentManager(modbus)
+    manager.create_components(Systems.VAMPAIR, ApiVersions.V_25_030, heating_circuit_count=2)
+
+    assert manager.update("heating_circuits") is False
+    assert manager.get_failed_components() == ["heating_circuits[0]", "heating_circuits[1]"]
@@ -0,0 +1,159 @@
+"""Tests for ComponentManager"""
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from pysolarfocus.component_manager import ComponentManager
+
+
+class SlowComponent:
+    """Component whose update blocks until released"""
+
+    def __init__(self, result=True):
+        self.calls = 0
+        self.result = result
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def update(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.result
+
+
+def _manager(max_age=0.0, **components):
+    manager = ComponentManager(MagicMock(), max_age)
+    manager.components = components
+    return manager
+
+
+def test_concurrent_updates_share_one_read():
+    component = SlowComponent()
+    manager = _manager(heatpump=component)
+    results = []
+
+    leader = threading.Thread(target=lambda: results.append(manager.update("heatpump")))
+    leader.start()
+    assert component.started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(manager.update("heatpump"))) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    time.sleep(0.05)
+    component.release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert component.calls == 1
+    assert results == [True] * 5
+
+
+def test_failed_update_is_shared_but_not_reused():
+    component = SlowComponent(result=False)
+    component.release.set()
+    manager = _manager(max_age=60, heatpump=component)
+
+    assert manager.update("heatpump") is False
+    assert manager.update("heatpump") is False
+    assert component.calls == 2
+    assert manager.get_failed_components() == ["heatpump", "heatpump"]
+
+
+def test_fresh_enough_update_is_reused():
+    component = SlowComponent()
+    component.release.set()
+    manager = _manager(max_age=60, heatpump=component)
+
+    assert manager.update("heatpump") is True
+    assert manager.update("heatpump") is True
+    assert manager.update_all() is True
+    assert component.calls == 1
+
+    # A caller can ask for a fresher value than the default of the manager
+    assert manager.update("heatpump", max_age=0) is True
+    assert component.calls == 2
+
+
+def test_sequential_updates_read_again_without_max_age():
+    component = SlowComponent()
+    component.release.set()
+    manager = _manager(heatpump=component)
+
+    assert manager.update("heatpump") is True
+    assert manager.update("heatpump") is True
+    assert component.calls == 2
+
+
+def test_update_of_unknown_component():
+    assert _manager().update("unknown") is False
+
+
+def test_listeners_are_notified_of_read_components():
+    component = SlowComponent()
+    component.release.set()
+    manager = _manager(max_age=60.0, heatpump=component, failing=SlowComponent(result=False))
+    manager.components["failing"].release.set()
+    notifications = []
+    manager.add_listener(notifications.append)
+
+    manager.update("heatpump")
+    manager.update("heatpump")  # fresh, not read again
+    manager.update_all()
+    assert notifications == [["heatpump"]]
+
+    manager.remove_listener(notifications.append)
+    manager.update("heatpump", max_age=0)
+    assert notifications == [["heatpump"]]
+
+
+def test_failing_listener_does_not_fail_update():
+    component = SlowComponent()
+    component.release.set()
+    manager = _manager(heatpump=component)
+    manager.add_listener(MagicMock(side_effect=RuntimeError("boom")))
+    assert manager.update("heatpump") is True
+
+
+class TimedComponent:
+    """Component whose update takes a given time on a fake clock"""
+
+    def __init__(self, clock, name, duration, reads):
+        self.clock = clock
+        self.name = name
+        self.duration = duration
+        self.reads = reads
+
+    def update(self):
+        self.clock.now += self.duration
+        self.reads.append(self.name)
+        return True
+
+
+def test_update_with_deadline_reads_by_priority_and_carries_the_rest():
+    reads = []
+    with patch("pysolarfocus.component_manager.time") as clock:
+        clock.now = 0.0
+        clock.monotonic.side_effect = lambda: clock.now
+        durations = {"solar": 1.0, "buffers": 1.0, "heatpump": 2.0, "photovoltaic": 1.0}
+        manager = _manager(**{name: TimedComponent(clock, name, duration, reads) for name, duration in durations.items()})
+
+        assert manager.update_all(deadline=3.5) is True
+        assert reads == ["photovoltaic", "heatpump"]
+        assert manager.get_stale_components() == ["buffers", "solar"]
+        assert manager.get_read_duration("heatpump") == 2.0
+
+        # The stale components come first, then the rest as long as the deadline holds
+        reads.clear()
+        manager.update_all(deadline=3.5)
+        assert reads == ["buffers", "solar", "photovoltaic"]
+        assert manager.get_stale_components() == ["heatpump"]
+
+        # However short the deadline, one component is read
+        reads.clear()
+        manager.update_all(deadline=0.0)
+        assert reads == ["heatpump"]
+
+        reads.clear()
+        assert manager.update_all() is True
+        assert reads == ["solar", "buffers", "heatpump", "photovoltaic"]
+        assert manager.get_stale_components() == []
@@ -0,0 +1,96 @@
+"""Tests for ComponentSchema and RegisterSpec"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from pysolarfocus import ApiVersions, Systems
+from pysolarfocus.component_factory import ComponentFactory
+from pysolarfocus.components.base.component_schema import ComponentSchema
+from pysolarfocus.components.base.data_value import DataValue
+from pysolarfocus.components.base.enums import DataTypes, RegisterTypes
+from pysolarfocus.components.base.register_spec import RegisterSpec
+from pysolarfocus.components.heat_pump import HeatPump
+from pysolarfocus.components.heating_circuit import HeatingCircuit
+
+
+def test_register_specs_are_shared():
+    assert DataValue(address=3, multiplier=0.1).spec is DataValue(address=3, multiplier=0.1).spec
+    assert DataValue(address=3, multiplier=1).spec is not DataValue(address=3, multiplier=1.0).spec
+
+
+def test_register_spec_validation_is_not_skipped_for_plain_values():
+    RegisterSpec.of(0, data_type=DataTypes.INT)
+    with pytest.raises(ValueError):
+        RegisterSpec.of(0, data_type=1)  # type: ignore
+
+
+def test_register_spec_sign_bit():
+    assert RegisterSpec.of(0).sign_bit == 0x8000
+    assert RegisterSpec.of(0, count=2).sign_bit == 0x80000000
+    assert RegisterSpec.of(0, data_type=DataTypes.UINT).sign_bit == 0
+    assert RegisterSpec.of(0).raw_range == (-0x8000, 0x7FFF)
+    assert RegisterSpec.of(0, count=2, data_type=DataTypes.UINT).raw_range == (0, 0xFFFFFFFF)
+
+
+def test_register_spec_decode():
+    data = [0xFFFF, 0xFC18, 0x0001, 0x0000, 0x8000]
+    assert RegisterSpec.decode(data, 0, 2, RegisterSpec.of(0, count=2).sign_bit) == -1000
+    assert RegisterSpec.decode(data, 2, 2, 0) == 0x10000
+    assert RegisterSpec.decode(data, 4, 1, RegisterSpec.of(0).sign_bit) == -0x8000
+    assert RegisterSpec.decode(data, 4, 1, 0) == 0x8000
+
+
+def test_schema_from_component():
+    schema = HeatingCircuit(api_version=ApiVersions.V_25_030).schema
+
+    assert [name for name, _, _ in schema.input_fields][:3] == ["supply_temperature", "room_temperature", "humidity"]
+    assert all(spec.register_type == RegisterTypes.HOLDING for _, spec, _ in schema.holding_fields)
+    assert schema.input_count == 8
+    assert schema.input_ranges == [(0, 4), (5, 3)]
+    assert schema.holding_ranges == [(0, 1), (2, 2), (5, 4)]
+
+
+def test_schema_keeps_performance_calculators():
+    heat_pump = HeatPump(api_version=ApiVersions.V_25_030)
+    clone = HeatPump.from_schema(heat_pump.schema)
+
+    assert ("cop_heating", "thermal_power_heating", "electrical_power") in clone.schema.calculators
+    clone.thermal_power_heating.value = 9000
+    clone.electrical_power.value = 2000
+    assert clone.cop_heating.value == 4.5
+    # Values are not shared between instances
+    assert heat_pump.cop_heating.value == 0.0
+
+
+def test_from_schema_matches_constructor():
+    constructed = HeatingCircuit(1150, 32650, api_version=ApiVersions.V_25_030).initialize(MagicMock())
+    created = HeatingCircuit.from_schema(constructed.schema, 1150, 32650).initialize(MagicMock())
+
+    assert created.schema is constructed.schema
+    assert created.input_slices == constructed.input_slices
+    assert created.holding_slices == constructed.holding_slices
+    for (name, value), (other_name, other_value) in zip(created._get_values(RegisterTypes.HOLDING), constructed._get_values(RegisterTypes.HOLDING)):
+        assert name == other_name
+        assert value.spec is other_value.spec
+        assert value.get_absolute_address() == other_value.get_absolute_address()
+        assert value.modbus is not None
+
+
+def test_factory_shares_schema_across_instances_and_factories():
+    circuits = ComponentFactory(MagicMock()).heating_circuit(Systems.VAMPAIR, 3, ApiVersions.V_25_030)
+    other = ComponentFactory(MagicMock()).heating_circuit(Systems.VAMPAIR, 1, ApiVersions.V_25_030)
+
+    assert circuits[1].schema is circuits[0].schema
+    assert other[0].schema is circuits[0].schema
+    assert circuits[2].supply_temperature is not circuits[0].supply_temperature
+    assert circuits[2].supply_temperature.get_absolute_address() == 1200
+    assert circuits[2].mode.get_absolute_address() == 32703
+
+
+def test_lookup_and_register():
+    key = ("test_lookup_and_register",)
+    assert ComponentSchema.lookup(key) is None
+    schema = HeatPump().schema
+    assert ComponentSchema.register(key, schema) is schema
+    assert ComponentSchema.register(key, HeatPump().schema) is schema
+    assert ComponentSchema.lookup(key) is schema
@@ -0,0 +1,109 @@
+"""Tests for the HEMS control loop"""
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pysolarfocus import ApiVersions
+from pysolarfocus.control import ControlLoop, LoopStatistics
+
+
+@pytest.fixture
+def api(make_plant):
+    return make_plant(api_version=ApiVersions.V_26_020)
+
+
+def connector(registers):
+    connector = MagicMock()
+    connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, list(registers))
+    connector.write_register.return_value = True
+    return connector
+
+
+def test_read_plan_is_compiled_into_few_requests(api):
+    # heatpump/electrical_power at 2322, then photovoltaic 2500-2511
+    registers = [800, 0, 3000, 0, 1200, 0, 800, 0, 0, 0xFFFF, 0xFC18, 1, 0]
+    loop = ControlLoop(api, lambda values: None, connector=connector(registers))
+    assert loop.requests == 2
+
+    values = loop.read()
+    assert values["heatpump/electrical_power"] == 800
+    assert values["photovoltaic/power"] == 3000
+    assert values["photovoltaic/grid_export"] == -1000
+    assert values["photovoltaic/overcharge_possible"] == 1
+
+
+def test_cycle_writes_changed_targets_and_keepalives(api):
+    targets = iter([1500, 1500, 1500, None, 2000])
+    modbus = connector([0] * 13)
+    loop = ControlLoop(api, lambda values: next(targets), connector=modbus, keepalive=30)
+
+    assert loop.cycle(0.0) and loop.cycle(1.0)
+    assert modbus.write_register.call_count == 1
+    modbus.write_register.assert_called_with(1500, 33415)
+    assert loop.cycle(31.0) and modbus.write_register.call_count == 2
+    assert loop.cycle(32.0) and loop.cycle(33.0)
+    modbus.write_register.assert_called_with(2000, 33415)
+    assert loop.statistics.writes == 3
+
+    modbus.read_input_registers.side_effect = lambda slices, count, **kwargs: (False, None)
+    assert not loop.cycle(34.0)
+
+
+@pytest.mark.parametrize("target, written", [(-1, 0), (1e9, 32767), (-1e9, 0)])
+def test_cycle_clamps_targets_to_the_register(target, written, api):
+    modbus = connector([0] * 13)
+    loop = ControlLoop(api, lambda values: target, connector=modbus)
+    assert loop.cycle(0.0)
+    modbus.write_register.assert_called_once_with(written, 33415)
+    assert loop.statistics.clamped == 1
+
+
+@pytest.mark.parametrize("target", [float("nan"), float("inf"), "1500"])
+def test_cycle_rejects_targets_which_are_not_numbers(target, api):
+    modbus = connector([0] * 13)
+    loop = ControlLoop(api, lambda values: target, connector=modbus)
+    assert not loop.cycle(0.0)
+    modbus.write_register.assert_not_called()
+    assert loop.statistics.rejected == 1
+
+
+def test_loop_refuses_what_it_cannot_control(api, make_plant):
+    with pytest.raises(ValueError):
+        ControlLoop(make_plant(api_version=ApiVersions.V_25_030), lambda values: None, connector=MagicMock())
+    with pytest.raises(ValueError):
+        ControlLoop(api, lambda values: None, inputs=["photovoltaic/hems_target_electrical_power"], connector=MagicMock())
+    with pytest.raises(ValueError):
+        ControlLoop(api, lambda values: None, inputs=["heatpump/missing"], connector=MagicMock())
+
+
+def test_statistics():
+    statistics = LoopStatistics()
+    for latency in [0.003] * 99 + [0.3]:
+        statistics.add(latency, 0.001)
+    report = statistics.as_dict()
+    assert report["cycles"] == 100
+    assert report["latency_max"] == 0.3
+    assert report["latency_p99"] == 0.005
+    assert statistics.latency_percentile(100) == 0.5
+    assert report["jitter_mean"] == pytest.approx(0.001)
+
+
+def test_loop_runs_on_its_own_thread(api):
+    modbus = connector([0] * 13)
+    loop = ControlLoop(api, lambda values: 1000, rate=100, connector=modbus)
+    loop.start()
+    time.sleep(0.1)
+    loop.stop()
+    assert not loop.is_running
+    assert loop.statistics.cycles > 1
+    assert modbus.write_register.call_count == 1
+    # The connection was passed in, so it is not the loop's to close
+    modbus.close.assert_not_called()
+
+
+def test_own_connection_shares_the_rate_limiter(api):
+    with patch("pysolarfocus.control.ModbusConnector") as modbus:
+        loop = ControlLoop(api, lambda values: None)
+    assert loop.connector is modbus.return_value
+    assert modbus.call_args.kwargs["rate_limiter"] is api.modbus_connector.rate_limiter
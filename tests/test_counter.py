@@ -0,0 +1,111 @@
+"""Tests for Counter class"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from pysolarfocus import ApiVersions
+from pysolarfocus.components.base.component import Component
+from pysolarfocus.components.base.counter import Counter
+from pysolarfocus.components.base.data_value import DataValue
+from pysolarfocus.components.base.enums import DataTypes, RegisterTypes
+from pysolarfocus.components.heat_pump import HeatPump
+
+
+def test_counter_defaults():
+    counter = Counter(address=10, multiplier=0.001)
+
+    assert isinstance(counter, DataValue)
+    assert counter.count == 2
+    assert counter.data_type == DataTypes.UINT
+    assert counter.modulus == 2**32
+    assert (counter.delta, counter.rate, counter.total, counter.resets, counter.rollovers) == (0, 0.0, 0.0, 0, 0)
+
+
+def test_counter_deltas_and_rates():
+    counter = Counter(address=0, multiplier=0.001)
+    for timestamp, value in [(0.0, 5000), (10.0, 6000), (20.0, 6000), (30.0, 8000)]:
+        counter.value = value
+        counter.advance(timestamp)
+        if timestamp == 10.0:
+            assert counter.delta == 1000
+            assert counter.scaled_delta == pytest.approx(1.0)
+            assert counter.rate == pytest.approx(0.1)
+
+    assert counter.delta == 2000
+    assert counter.total == pytest.approx(3.0)
+
+
+def test_counter_reset_and_rollover():
+    counter = Counter(address=0)
+    for value in [1000, 1200, 50]:
+        counter.value = value
+        counter.advance(0.0)
+    # A reset counts up from 0
+    assert (counter.delta, counter.resets, counter.total) == (50, 1, 250)
+
+    for value in [2**32 - 100, 20]:
+        counter.value = value
+        counter.advance(0.0)
+    assert (counter.delta, counter.rollovers) == (120, 1)
+    assert counter.rate == 0.0
+
+
+def test_counter_declared_signed_counts_unsigned():
+    counter = Counter(address=0, data_type=DataTypes.INT)
+    counter.value = 2**31 - 1
+    counter.advance(0.0)
+    counter.value = -(2**31)
+    counter.advance(1.0)
+    assert counter.delta == 1
+
+
+def _heat_pump(registers, holding=lambda: True):
+    modbus = MagicMock()
+    modbus.read_input_registers.side_effect = lambda slices, count: (True, (registers + [0] * count)[:count])
+    modbus.read_holding_registers.side_effect = lambda slices, count: (holding(), [0] * count)
+    return HeatPump(api_version=ApiVersions.V_25_030).initialize(modbus)
+
+
+def test_heat_pump_energy_is_decoded_unsigned_and_advanced():
+    registers = [0] * 12
+    registers[10] = 0x8000
+    heat_pump = _heat_pump(registers)
+
+    assert heat_pump.update()
+    assert isinstance(heat_pump.thermal_energy_total, Counter)
+    assert not isinstance(heat_pump.supply_temperature, Counter)
+    assert heat_pump.thermal_energy_total.value == 2**31
+
+    registers[11] = 1000
+    assert heat_pump.update()
+    assert heat_pump.thermal_energy_total.delta == 1000
+    assert heat_pump.thermal_energy_total.total == pytest.approx(1.0)
+
+
+def test_failed_update_carries_its_increase_forward():
+    holding = iter([True, False, True])
+    registers = [0] * 12
+    heat_pump = _heat_pump(registers, lambda: next(holding))
+    assert heat_pump.update()
+
+    # The input registers are read, the holding registers are not: the increase is not accounted yet
+    registers[11] = 400
+    assert not heat_pump.update()
+    assert heat_pump.thermal_energy_total.delta == 0
+    registers[11] = 1000
+    assert heat_pump.update()
+    assert heat_pump.thermal_energy_total.delta == 1000
+    assert heat_pump.thermal_energy_total.total == pytest.approx(1.0)
+
+
+def test_counters_survive_the_shared_schema():
+    schema = HeatPump(api_version=ApiVersions.V_25_030).schema
+    assert "electrical_energy_cooling" in schema.counters
+    assert "electrical_power" not in schema.counters
+
+    heat_pump = Component.from_schema(schema)
+    assert isinstance(heat_pump.electrical_energy_cooling, Counter)
+    assert not isinstance(heat_pump.electrical_power, Counter)
+    heat_pump.electrical_energy_cooling.value = 10
+    heat_pump.electrical_energy_cooling.advance(0.0)
+    assert heat_pump.electrical_energy_cooling.delta == 0
@@ -247,3 +247,29 @@ def test_negative_write_multiplier_is_rejected():
     """Same validation as the multiplier itself."""
     with pytest.raises(ValueError):
         DataValue(address=0, multiplier=10, write_multiplier=-1, register_type=RegisterTypes.HOLDING)
+
+
+def test_data_value_is_slotted():
+    """DataValues are kept compact, without a per-instance __dict__"""
+    data_value = DataValue(address=0, multiplier=0.1)
+    assert not hasattr(data_value, "__dict__")
+    with pytest.raises(AttributeError):
+        data_value.unknown = 1
+
+
+def test_register_attributes_can_be_set_per_data_value():
+    """Test setting a register attribute replaces the shared spec of that DataValue only"""
+    dv = DataValue(address=5, multiplier=0.1)
+    other = DataValue(address=5, multiplier=0.1)
+    assert dv.spec is other.spec
+
+    dv.multiplier = 0.5
+    dv.address = 7
+    dv.data_type = DataTypes.UINT
+    assert (dv.address, dv.multiplier, dv.data_type) == (7, 0.5, DataTypes.UINT)
+    assert dv.spec is DataValue(address=7, multiplier=0.5, data_type=DataTypes.UINT).spec
+    assert (other.address, other.multiplier, other.data_type) == (5, 0.1, DataTypes.INT)
+
+    with pytest.raises(ValueError):
+        dv.count = 0
+    assert dv.count == 1
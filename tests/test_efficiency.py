@@ -0,0 +1,90 @@
+"""Tests for HeatPumpEfficiency"""
+from datetime import datetime
+
+import pytest
+
+from pysolarfocus.efficiency import HeatPumpEfficiency
+
+
+def cycle(api, efficiency, timestamp, heating=(0, 0), drinking_water=(0, 0)):
+    """Simulates an update of the heat pump whose counters increased by the given Wh"""
+    heatpump = api.heatpump
+    heatpump.thermal_energy_heating.delta, heatpump.electrical_energy_heating.delta = heating
+    heatpump.thermal_energy_drinking_water.delta, heatpump.electrical_energy_drinking_water.delta = drinking_water
+    heatpump.thermal_energy_total.delta = heating[0] + drinking_water[0]
+    heatpump.electrical_energy_total.delta = heating[1] + drinking_water[1]
+    heatpump.thermal_energy_cooling.delta = heatpump.electrical_energy_cooling.delta = 0
+    efficiency.record(["heatpump"], timestamp)
+
+
+def test_rolling_cops_per_mode(api):
+    efficiency = HeatPumpEfficiency(api, windows=(("1h", 3600.0), ("24h", 86400.0)), slots=4)
+    assert efficiency.modes == ["total", "heating", "drinking_water", "cooling"]
+
+    start = datetime(2026, 1, 10).timestamp()
+    cycle(api, efficiency, start, heating=(4000, 1000))
+    cycle(api, efficiency, start + 600, drinking_water=(3000, 1500))
+    assert efficiency.cop("heating", "1h") == pytest.approx(4.0)
+    assert efficiency.cop("drinking_water", "1h") == pytest.approx(2.0)
+    assert efficiency.cop("total", "1h") == pytest.approx(7 / 2.5)
+    assert efficiency.energy("heating", "24h") == pytest.approx((4.0, 1.0))
+    assert efficiency.cop("cooling", "24h") == 0.0
+
+    cycle(api, efficiency, start + 2 * 3600, heating=(3000, 1000))
+    assert efficiency.cop("heating", "1h") == pytest.approx(3.0)
+    assert efficiency.cop("heating", "24h") == pytest.approx(3.5)
+    assert efficiency.values["season/heating"] == pytest.approx(3.5)
+
+    with pytest.raises(KeyError):
+        efficiency.cop("heating", "30d")
+    with pytest.raises(KeyError):
+        efficiency.cop("defrost", "1h")
+
+
+def test_seasons(api):
+    efficiency = HeatPumpEfficiency(api, season_start=9)
+    assert efficiency.season_of(datetime(2026, 8, 31).timestamp()) == 2025
+    assert efficiency.season_of(datetime(2026, 9, 1).timestamp()) == 2026
+
+    cycle(api, efficiency, datetime(2026, 8, 1).timestamp(), heating=(3000, 1000))
+    assert efficiency.cop("heating", "previous_season") == 0.0
+    cycle(api, efficiency, datetime(2026, 9, 2).timestamp(), heating=(5000, 1000))
+    assert efficiency.cop("heating", "previous_season") == pytest.approx(3.0)
+    assert efficiency.cop("heating", "season") == pytest.approx(5.0)
+    with pytest.raises(ValueError):
+        HeatPumpEfficiency(api, season_start=13)
+
+
+def test_state_round_trip(api):
+    efficiency = HeatPumpEfficiency(api)
+    start = datetime(2026, 8, 30).timestamp()
+    cycle(api, efficiency, start, heating=(3000, 1000))
+    cycle(api, efficiency, start + 3 * 86400, heating=(4000, 1000))
+    state = efficiency.state()
+    assert len(state) < 20000
+
+    restored = HeatPumpEfficiency(api)
+    restored.restore(state)
+    assert restored.values == efficiency.values
+    cycle(api, restored, start + 3 * 86400 + 60, heating=(2000, 1000))
+    assert restored.cop("heating", "7d") == pytest.approx(3.0)
+
+
+def test_follows_updates_of_the_heat_pump(api):
+    efficiency = HeatPumpEfficiency(api).attach()
+    values = iter([0, 0, 1000, 250])
+
+    def read(slices, count, **kwargs):
+        registers = [0] * count
+        # Low words of the total thermal and electrical energy
+        registers[11], registers[17] = next(values), next(values)
+        return True, registers
+
+    api.modbus_connector.read_input_registers.side_effect = read
+    api.update_heatpump()
+    api.update_heatpump()
+    assert efficiency.cop("total", "1h") == pytest.approx(4.0)
+
+    efficiency.detach()
+    api.update_photovoltaic()
+    assert efficiency.energy("total", "1h") == pytest.approx((1.0, 0.25))
@@ -0,0 +1,85 @@
+"""Tests for event detection"""
+from unittest.mock import patch
+
+import pytest
+
+from pysolarfocus.events import EventDetector, EventMonitor, plant_events
+
+
+def test_detector_emits_completed_events():
+    detector = EventDetector("compressor", "heatpump/compressor_speed", lambda speed: speed > 0)
+    samples = [(0, 0), (10, 30), (20, 60), (30, 40), (100, 0), (110, 0), (120, 50)]
+    events = [event for event in (detector.observe(t, v) for t, v in samples) if event is not None]
+
+    assert len(events) == 1
+    event = events[0]
+    assert (event.start, event.end, event.duration, event.peak) == (10, 100, 90, 60)
+    assert detector.current is not None and detector.current.start == 120
+    assert detector.last is event
+    # The running event started in the last hour too
+    assert (detector.count, detector.mean_duration, detector.starts_per_hour) == (1, 90, 2)
+    assert detector.statistics()["histogram"]["<300"] == 1
+    assert detector.statistics()["active"] is True
+
+
+def test_detector_drops_short_events_and_counts_the_last_hour():
+    detector = EventDetector("defrost", "heatpump/defrost_active", lambda active: active != 0, min_duration=30)
+    assert detector.observe(0, 1) is None
+    assert detector.observe(10, 0) is None
+    assert detector.count == 0
+
+    for start in range(100, 4000, 600):
+        detector.observe(start, 1)
+        detector.observe(start + 300, 0)
+    assert detector.count == 7
+    assert detector.histogram[2] == 7
+    detector.observe(2 * 3600 + 4000, 0)
+    assert detector.starts_per_hour == 0
+
+
+def test_starts_are_counted_when_events_start():
+    detector = EventDetector("compressor", "heatpump/compressor_speed", lambda speed: speed > 0)
+    detector.observe(0, 40)
+    assert detector.starts_per_hour == 1
+    # A five hour run ending now did not start in the last hour
+    assert detector.observe(5 * 3600, 0).duration == 5 * 3600
+    assert detector.starts_per_hour == 0
+
+
+def test_plant_events(api):
+    monitor = plant_events(api).attach()
+    assert sorted(detector.kind for detector in monitor.detectors) == ["burner", "compressor", "defrost", "tap"]
+    events = []
+    monitor.add_listener(events.append)
+    monitor.add_listener(lambda event: 1 / 0)
+
+    speeds = iter([0, 40, 0])
+
+    def read(slices, count, **kwargs):
+        registers = [0] * count
+        registers[3] = next(speeds)
+        return True, registers
+
+    api.modbus_connector.read_input_registers.side_effect = read
+    with patch("pysolarfocus.events.time") as clock:
+        clock.time.side_effect = [0.0, 10.0, 70.0]
+        for _ in range(3):
+            api.update_heatpump()
+
+    assert [(event.kind, event.start, event.end) for event in events] == [("compressor", 10.0, 70.0)]
+    assert events[0].to_dict()["duration"] == 60.0
+    assert monitor.statistics()["compressor:heatpump/compressor_speed"]["count"] == 1
+
+    monitor.detach()
+    with pytest.raises(KeyError):
+        monitor.add("pump", "heatpump/missing", bool)
+
+
+def test_monitor_only_feeds_updated_components(api):
+    monitor = EventMonitor(api)
+    detector = monitor.add("tap", "fresh_water_modules/0/flow_rate", lambda flow: flow > 0)
+    api.fresh_water_modules[0].flow_rate.value = 25
+    monitor.record(["heatpump"], 0.0)
+    assert detector.current is None
+    monitor.record(["fresh_water_modules"], 5.0)
+    assert detector.current.peak == pytest.approx(2.5)
@@ -0,0 +1,140 @@
+"""Tests for ModbusGateway"""
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from pysolarfocus.components.base.enums import RegisterTypes
+from pysolarfocus.gateway import ModbusGateway, RegisterCache
+from pysolarfocus.modbus_wrapper import RequestPriority
+
+
+@pytest.fixture
+def gateway(api):
+    gateway = ModbusGateway(api, "127.0.0.1", 0)
+    gateway.start()
+    yield gateway
+    gateway.stop()
+
+
+def _request(sock, transaction, pdu, unit=1):
+    sock.sendall(struct.pack(">HHHB", transaction, 0, len(pdu) + 1, unit) + pdu)
+    header = sock.recv(7)
+    response_transaction, protocol, length, response_unit = struct.unpack(">HHHB", header)
+    assert (response_transaction, protocol, response_unit) == (transaction, 0, unit)
+    return sock.recv(length - 1)
+
+
+def _update(api, registers):
+    def read(slices, count, **kwargs):
+        return True, [registers.get(s.absolute_address + i, 0) for s in slices for i in range(s.count)][:count] + [0] * max(0, count - sum(s.count for s in slices))
+
+    api.modbus_connector.read_input_registers.side_effect = read
+    api.modbus_connector.read_holding_registers.side_effect = read
+    api.update_heatpump()
+    api.modbus_connector.read_input_registers.reset_mock()
+    api.modbus_connector.read_holding_registers.reset_mock()
+
+
+def test_reads_are_answered_from_the_cache(api, gateway):
+    _update(api, {})
+    api.heatpump.supply_temperature.value = -12
+    api.heatpump.electrical_energy_total.value = 70000
+    gateway.cache.refresh([api.heatpump])
+    supply = api.heatpump.supply_temperature.get_absolute_address()
+    power = api.heatpump.electrical_energy_total.get_absolute_address()
+
+    with socket.create_connection(gateway.server_address) as sock:
+        assert _request(sock, 1, struct.pack(">BHH", 4, supply, 1)) == struct.pack(">BBH", 4, 2, 0xFFF4)
+        assert _request(sock, 2, struct.pack(">BHH", 4, power, 2)) == struct.pack(">BBHH", 4, 4, 1, 70000 - 65536)
+
+    api.modbus_connector.read_input_registers.assert_not_called()
+
+
+def test_updates_refresh_the_cache(api, gateway):
+    address = api.heatpump.supply_temperature.get_absolute_address()
+    _update(api, {address: 215})
+    assert gateway.cache.get(RegisterTypes.INPUT, address, 1, 60.0) == [215]
+
+
+def test_uncached_reads_are_forwarded_and_cached(api, gateway):
+    api.modbus_connector.read_holding_registers.side_effect = lambda slices, count, **kwargs: (True, [1, 2, 3])
+
+    with socket.create_connection(gateway.server_address) as sock:
+        assert _request(sock, 1, struct.pack(">BHH", 3, 40000, 3)) == struct.pack(">BB3H", 3, 6, 1, 2, 3)
+        assert _request(sock, 2, struct.pack(">BHH", 3, 40001, 2)) == struct.pack(">BB2H", 3, 4, 2, 3)
+
+    api.modbus_connector.read_holding_registers.assert_called_once()
+    slices, count = api.modbus_connector.read_holding_registers.call_args.args
+    assert (slices[0].absolute_address, count) == (40000, 3)
+    assert api.modbus_connector.read_holding_registers.call_args.kwargs["priority"] == RequestPriority.INTERACTIVE
+
+
+def test_overlapping_reads_are_merged(api):
+    gateway = ModbusGateway(api, max_age=0)
+    started, release = threading.Event(), threading.Event()
+
+    def read(slices, count, **kwargs):
+        started.set()
+        release.wait(5)
+        return True, list(range(count))
+
+    api.modbus_connector.read_input_registers.side_effect = read
+    results = []
+    leader = threading.Thread(target=lambda: results.append(gateway.read(RegisterTypes.INPUT, 100, 10)))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(gateway.read(RegisterTypes.INPUT, 102, 3)))
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert api.modbus_connector.read_input_registers.call_count == 1
+    assert sorted(results) == [list(range(10)), [2, 3, 4]]
+
+
+def test_writes_are_forwarded(api, gateway):
+    with socket.create_connection(gateway.server_address) as sock:
+        assert _request(sock, 1, struct.pack(">BHH", 6, 33415, 1500)) == struct.pack(">BHH", 6, 33415, 1500)
+        assert _request(sock, 2, struct.pack(">BHHB2H", 16, 32600, 2, 4, 1, 2)) == struct.pack(">BHH", 16, 32600, 2)
+
+    calls = [c.args for c in api.modbus_connector.write_registers.call_args_list]
+    assert calls == [([1500], 33415), ([1, 2], 32600)]
+    assert gateway.cache.get(RegisterTypes.HOLDING, 32600, 2, 60.0) == [1, 2]
+
+
+def test_errors(api, gateway):
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (False, None)
+    api.modbus_connector.write_registers.return_value = False
+
+    with socket.create_connection(gateway.server_address) as sock:
+        assert _request(sock, 1, struct.pack(">BHH", 4, 500, 1)) == bytes((0x84, 0x0B))
+        assert _request(sock, 2, struct.pack(">BHH", 4, 500, 126)) == bytes((0x84, 0x03))
+        assert _request(sock, 3, struct.pack(">BHH", 6, 33415, 1)) == bytes((0x86, 0x0B))
+        assert _request(sock, 4, struct.pack(">BHH", 1, 0, 8)) == bytes((0x81, 0x01))
+        assert _request(sock, 5, struct.pack(">BHHB2H", 16, 32600, 2, 4, 1, 2)) == bytes((0x90, 0x0B))
+
+
+def test_other_units_are_rejected(api, gateway):
+    with socket.create_connection(gateway.server_address) as sock:
+        assert _request(sock, 1, struct.pack(">BHH", 6, 33415, 1500), unit=2) == bytes((0x86, 0x0A))
+        assert _request(sock, 2, struct.pack(">BHH", 4, 500, 1), unit=0) == bytes((0x84, 0x0A))
+    api.modbus_connector.write_registers.assert_not_called()
+    api.modbus_connector.read_input_registers.assert_not_called()
+
+
+def test_cache_expires():
+    cache = RegisterCache()
+    cache.store(RegisterTypes.INPUT, 10, [1, 2])
+    assert cache.get(RegisterTypes.INPUT, 10, 2, 60.0) == [1, 2]
+    assert cache.get(RegisterTypes.INPUT, 10, 3, 60.0) is None
+    assert cache.get(RegisterTypes.INPUT, 10, 2, -1.0) is None
+    assert cache.get(RegisterTypes.HOLDING, 10, 1, 60.0) is None
+
+
+def test_listens_on_the_local_host_by_default(api):
+    assert ModbusGateway(api).host == "127.0.0.1"
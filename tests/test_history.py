@@ -0,0 +1,73 @@
+"""Tests for History and RingBuffer"""
+from unittest.mock import patch
+
+import pytest
+
+from pysolarfocus.history import History, RingBuffer
+
+
+def test_ring_buffer_overwrites_oldest_samples():
+    buffer = RingBuffer(4)
+    assert len(buffer) == 0 and buffer.latest() is None
+    for second in range(6):
+        buffer.append(float(second), second * 10.0)
+
+    assert len(buffer) == 4
+    assert list(buffer) == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0), (5.0, 50.0)]
+    assert buffer.latest() == (5.0, 50.0)
+    assert buffer.times.buffer_info()[1] == 4
+
+
+def test_ring_buffer_range():
+    buffer = RingBuffer(5)
+    for second in range(8):
+        buffer.append(float(second), float(second))
+
+    times, values = buffer.range(4.0, 6.0)
+    assert list(times) == [4.0, 5.0] and list(values) == [4.0, 5.0]
+    assert list(buffer.range(4.5)[0]) == [5.0, 6.0, 7.0]
+    assert list(buffer.range(end=4.0)[0]) == [3.0]
+    assert list(buffer.range(10.0)[0]) == []
+    assert list(buffer.range(6.0, 2.0)[0]) == []
+
+
+def test_ring_buffer_timestamps_do_not_decrease():
+    buffer = RingBuffer(3)
+    buffer.append(10.0, 1.0)
+    buffer.append(5.0, 2.0)
+    assert list(buffer) == [(10.0, 1.0), (10.0, 2.0)]
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_ring_buffer_to_numpy():
+    numpy = pytest.importorskip("numpy")
+    buffer = RingBuffer(3)
+    for second in range(4):
+        buffer.append(float(second), second / 2)
+    times, values = buffer.to_numpy()
+    assert times.dtype == numpy.float64
+    assert list(values) == [0.5, 1.0, 1.5]
+
+
+def test_history_records_updates(make_plant):
+    api = make_plant(heating_circuit_count=2)
+    history = History(api, capacity=10).attach()
+    values = iter(range(1, 100))
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [next(values)] * count)
+
+    with patch("pysolarfocus.history.time.time", side_effect=[100.0, 110.0]):
+        api.update_heatpump()
+        api.update_heatpump()
+
+    assert history.buffer("heating_circuits/0/supply_temperature") is None
+    times, supply = history.range("heatpump/supply_temperature")
+    assert list(times) == [100.0, 110.0]
+    assert [round(v, 1) for v in supply] == [0.1, 0.2]
+    assert "heatpump/cop_heating" in history.paths
+
+    history.detach()
+    api.update_heatpump()
+    assert len(history.buffer("heatpump/supply_temperature")) == 2
+    with pytest.raises(KeyError):
+        history.range("heatpump/missing")
@@ -0,0 +1,146 @@
+"""Tests for HttpApi"""
+import json
+from http.client import HTTPConnection
+
+import pytest
+
+from pysolarfocus import ApiVersions
+from pysolarfocus.http_api import HttpApi
+
+
+@pytest.fixture
+def api(make_plant):
+    return make_plant(api_version=ApiVersions.V_26_020)
+
+
+@pytest.fixture
+def server(api):
+    server = HttpApi(api, "127.0.0.1", 0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def _request(server, method, path, body=None, headers=None):
+    connection = HTTPConnection(*server.server_address, timeout=5)
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers or {})
+    response = connection.getresponse()
+    content = response.read()
+    connection.close()
+    return response.status, response.getheader("ETag"), json.loads(content) if content else None
+
+
+def test_snapshot_is_served(api, server):
+    api.heatpump.supply_temperature.value = 215
+    server.snapshot.refresh(["heatpump", "heating_circuits"])
+
+    status, _, plant = _request(server, "GET", "/api/plant")
+    assert status == 200 and set(plant) == {"heatpump", "heating_circuits"}
+    assert _request(server, "GET", "/api/plant/heatpump/supply_temperature")[2] == 21.5
+    assert _request(server, "GET", "/api/plant/heating_circuits/0")[2]["mode"] == 0
+    assert _request(server, "GET", "/api/plant/heating_circuits/1")[0] == 404
+    assert _request(server, "GET", "/api/other")[0] == 404
+    api.modbus_connector.read_input_registers.assert_not_called()
+
+
+def test_etag_and_if_none_match(api, server):
+    server.snapshot.refresh(["heatpump"])
+    status, etag, _ = _request(server, "GET", "/api/plant/heatpump")
+    assert status == 200 and etag
+
+    assert _request(server, "GET", "/api/plant/heatpump", headers={"If-None-Match": etag})[0] == 304
+
+    api.heatpump.supply_temperature.value = 300
+    server.snapshot.refresh(["heatpump"])
+    status, new_etag, content = _request(server, "GET", "/api/plant/heatpump", headers={"If-None-Match": etag})
+    assert (status, content["supply_temperature"]) == (200, 30.0)
+    assert new_etag != etag
+
+
+def test_updates_refresh_the_snapshot(api, server):
+    read = lambda slices, count, **kwargs: (True, [7] * count)
+    api.modbus_connector.read_input_registers.side_effect = read
+    api.modbus_connector.read_holding_registers.side_effect = read
+    api.update_photovoltaic()
+    assert _request(server, "GET", "/api/plant/photovoltaic/overcharge_active")[2] == 7
+
+
+def test_operations(api, server):
+    status, _, names = _request(server, "GET", "/api/operations")
+    assert status == 200 and "set_heating_circuit_mode" in names
+
+    assert _request(server, "POST", "/api/operations/set_heating_circuit_mode", {"index": 0, "mode": 2}) == (200, None, {"success": True})
+    api.modbus_connector.write_register.assert_called_once_with(2, api.heating_circuits[0].mode.get_absolute_address())
+
+    assert _request(server, "POST", "/api/operations/set_heating_circuit_mode", {"index": 5, "mode": 2})[2] == {"success": False}
+    assert _request(server, "POST", "/api/operations/set_heating_circuit_mode", {"mode": 2})[0] == 400
+    assert _request(server, "POST", "/api/operations/set_heating_circuit_mode", [1, 2])[0] == 400
+    assert _request(server, "POST", "/api/operations/connect", {})[0] == 404
+
+
+@pytest.mark.parametrize(
+    "operation, arguments",
+    [
+        ("set_heating_circuit_mode", {"index": 0, "mode": 42}),
+        ("set_heating_circuit_mode", {"index": 0, "mode": "2"}),
+        ("set_heating_circuit_mode", {"index": -1, "mode": 2}),
+        ("set_heating_circuit_mode", {"index": 0.5, "mode": 2}),
+        ("set_domestic_hot_water_mode", {"index": 0, "mode": 9}),
+        ("set_domestic_hot_water_single_charge", {"index": 0, "charge": 3}),
+        ("set_heat_pump_sg_ready_mode", {"mode": -1}),
+        ("set_photovoltaic_hems_target_electrical_power", {"power": -500}),
+        ("set_photovoltaic_hems_target_electrical_power", {"power": 100000}),
+        ("set_photovoltaic_hems_target_electrical_power", {"power": 1500.5}),
+    ],
+)
+def test_operations_reject_bad_values(api, server, operation, arguments):
+    status, _, content = _request(server, "POST", f"/api/operations/{operation}", arguments)
+    assert status == 400 and "error" in content
+    api.modbus_connector.write_register.assert_not_called()
+
+
+def test_operations_convert_arguments(api, server):
+    from pysolarfocus.const import HeatPumpSgReadyMode
+    from pysolarfocus.http_api import _convert
+
+    assert _convert("mode", HeatPumpSgReadyMode, 3) is HeatPumpSgReadyMode.RECOMMENDED
+    assert _convert("power", int, 1500.0) == 1500
+    assert _request(server, "POST", "/api/operations/set_heat_pump_sg_ready_mode", {"mode": 3})[2] == {"success": True}
+    assert _request(server, "POST", "/api/operations/set_photovoltaic_hems_target_electrical_power", {"power": 1500})[2] == {"success": True}
+    api.modbus_connector.write_register.assert_called_with(1500, 33415)
+
+
+def test_listens_on_the_local_host_by_default(api):
+    assert HttpApi(api).host == "127.0.0.1"
+
+
+def _events(response, count):
+    events = []
+    while len(events) < count:
+        event = {}
+        for line in iter(response.fp.readline, b"\n"):
+            key, _, value = line.decode().rstrip("\n").partition(": ")
+            event[key] = value
+        if "event" in event:
+            events.append((event["event"], json.loads(event["data"])))
+    return events
+
+
+def test_event_stream(api, server):
+    server.snapshot.refresh(["heatpump", "heating_circuits"])
+    connection = HTTPConnection(*server.server_address, timeout=5)
+    connection.request("GET", "/api/events?fields=heatpump/supply_temperature,heating_circuits/0/mode")
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "text/event-stream"
+
+    assert _events(response, 1) == [("sync", {"heatpump/supply_temperature": 0.0, "heating_circuits/0/mode": 0})]
+
+    api.heatpump.outdoor_temperature.value = 50
+    server.snapshot.refresh(["heatpump"])
+    api.heatpump.supply_temperature.value = 350
+    server.snapshot.refresh(["heatpump"])
+    assert _events(response, 1) == [("delta", {"heatpump/supply_temperature": 35.0})]
+
+    assert len(server.snapshot.subscriptions) == 1
+    connection.close()
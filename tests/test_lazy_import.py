@@ -0,0 +1,42 @@
+"""Tests for the lazy loading of pysolarfocus"""
+import subprocess
+import sys
+
+import pysolarfocus
+
+
+def _loaded_modules(script: str) -> set[str]:
+    script = f"import sys\n{script}\nprint(','.join(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return set(result.stdout.strip().split(","))
+
+
+def test_import_does_not_load_transport_or_components():
+    modules = _loaded_modules("from pysolarfocus import ApiVersions, HeatingCircuitMode, Systems")
+    assert "pymodbus" not in modules
+    assert "packaging" not in modules
+    assert "pysolarfocus.modbus_wrapper" not in modules
+    assert "pysolarfocus.components.base.component" not in modules
+
+
+def test_components_do_not_load_transport():
+    modules = _loaded_modules("from pysolarfocus.components.heating_circuit import HeatingCircuit; HeatingCircuit()")
+    assert "pysolarfocus.components.base.component" in modules
+    assert "pymodbus" not in modules
+
+
+def test_lazy_attributes():
+    from pysolarfocus.component_manager import ComponentManager
+    from pysolarfocus.modbus_wrapper import ModbusConnector
+
+    assert pysolarfocus.ModbusConnector is ModbusConnector
+    assert pysolarfocus.ComponentManager is ComponentManager
+    assert pysolarfocus.__version__
+
+
+def test_unknown_attribute():
+    try:
+        pysolarfocus.does_not_exist
+        assert False, "Should raise AttributeError"
+    except AttributeError:
+        pass
@@ -0,0 +1,108 @@
+"""Tests for derived metrics"""
+import pytest
+
+from pysolarfocus.components.base.counter import Counter
+from pysolarfocus.components.base.data_value import DataValue
+from pysolarfocus.components.base.performance_calculator import PerformanceCalculator
+from pysolarfocus.metrics import Formula, MetricGraph, SlidingWindow, WindowedRatio, plant_metrics
+
+
+def test_metric_is_only_recomputed_when_an_input_changed():
+    nominator, denominator = DataValue(address=0), DataValue(address=1)
+    nominator.value, denominator.value = 10, 4
+    calls = []
+    metric = Formula(lambda a, b: calls.append((a, b)) or a / b, nominator, denominator)
+
+    assert metric.value == 2.5 and metric.value == 2.5
+    assert len(calls) == 1
+    nominator.value = 20
+    assert metric.scaled_value == 5.0
+    assert len(calls) == 2
+
+
+def test_metric_of_metrics():
+    thermal, electrical = DataValue(address=0), DataValue(address=1)
+    thermal.value, electrical.value = 300, 100
+    cop = PerformanceCalculator(thermal, electrical)
+    percent = Formula(lambda value: value * 100, cop)
+
+    assert percent.value == 300.0
+    electrical.value = 150
+    assert percent.value == 200.0
+    assert Formula(lambda a, b: a / b, thermal, DataValue(address=2)).value == 0.0
+
+
+def test_sliding_window_drops_expired_slots():
+    window = SlidingWindow(60.0, slots=6, columns=2)
+    window.add(0.0, 1.0, 10.0)
+    window.add(25.0, 2.0, 20.0)
+    assert window.sums == (3.0, 30.0)
+
+    window.advance(60.0)
+    assert window.sums == (2.0, 20.0)
+    revision = window.revision
+    window.advance(61.0)
+    assert window.revision == revision
+    window.advance(1000.0)
+    assert window.sums == (0.0, 0.0)
+    with pytest.raises(ValueError):
+        SlidingWindow(0.0)
+
+
+def test_windowed_ratio():
+    thermal, electrical = Counter(address=0, multiplier=0.001), Counter(address=2, multiplier=0.001)
+    cop = WindowedRatio(thermal, electrical, 3600.0, slots=4)
+    for timestamp, produced, consumed in [(0.0, 0, 0), (900.0, 4000, 1000), (1800.0, 7000, 2000), (5500.0, 7500, 2500)]:
+        thermal.value, electrical.value = produced, consumed
+        thermal.advance(timestamp)
+        electrical.advance(timestamp)
+        cop.advance(timestamp)
+        if timestamp == 1800.0:
+            assert cop.value == pytest.approx(3.5)
+
+    # The first hour left the window
+    assert cop.value == pytest.approx(1.0)
+
+
+def test_plant_metrics(api):
+    graph = plant_metrics(api).attach()
+    assert graph.names == ["heatpump_cop_24h", "photovoltaic_self_consumption", "photovoltaic_solar_fraction"]
+
+    photovoltaic = [0, 4000, 0, 2000, 0, 0, 0, 500, 0, 1000, 0, 0]
+
+    def read(slices, count, **kwargs):
+        return True, photovoltaic if slices[0].absolute_address == 2500 else [0] * count
+
+    api.modbus_connector.read_input_registers.side_effect = read
+    api.update_photovoltaic()
+
+    assert graph.get("photovoltaic_self_consumption") == pytest.approx(0.75)
+    assert graph.get("photovoltaic_solar_fraction") == pytest.approx(0.75)
+
+    window = graph["heatpump_cop_24h"].window
+    api.update_heatpump()
+    revision = window.revision
+    api.update_photovoltaic()
+    assert revision > 0 and window.revision == revision
+    heatpump = api.heatpump
+    heatpump.thermal_energy_total.delta, heatpump.electrical_energy_total.delta = 3000, 1000
+    graph.advance(["heatpump"], 100.0)
+    assert graph.values["heatpump_cop_24h"] == pytest.approx(3.0)
+
+
+def test_metric_graph_paths(api):
+    graph = MetricGraph(api)
+    graph.formula("supply_return_spread", lambda supply, back: supply - back, "heatpump/supply_temperature", "heatpump/return_temperature")
+    graph.formula("spread_doubled", lambda spread: spread * 2, "supply_return_spread")
+    api.heatpump.supply_temperature.value = 400
+    api.heatpump.return_temperature.value = 300
+
+    assert graph.get("spread_doubled") == pytest.approx(20.0)
+    with pytest.raises(KeyError):
+        graph.part("heatpump/missing")
+    with pytest.raises(ValueError):
+        graph.windowed_ratio("cop", "heatpump/supply_temperature", "heatpump/electrical_energy_total", 60.0)
+    with pytest.raises(ValueError):
+        graph.formula("spread_doubled", lambda spread: spread, "supply_return_spread")
+    graph.remove("spread_doubled")
+    assert graph.names == ["supply_return_spread"]
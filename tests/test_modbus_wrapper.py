@@ -1,9 +1,11 @@
 """Tests for modbus wrapper"""
+import threading
+import time
 import unittest.mock as mock
 from unittest.mock import MagicMock
 
 from pysolarfocus.components.base.register_slice import RegisterSlice
-from pysolarfocus.modbus_wrapper import ModbusConnector
+from pysolarfocus.modbus_wrapper import ModbusConnector, RequestPriority
 
 
 def test_modbus_connector_init():
@@ -193,6 +195,21 @@ def test_write_register_success():
         mock_client_instance.write_registers.assert_called_once_with(32000, [123], slave=1)
 
 
+def test_write_registers_in_one_request():
+    """Test write_registers writes a block of registers with a single request"""
+    with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
+        mock_client_instance = mock_client.return_value
+        mock_response = MagicMock()
+        mock_response.isError.return_value = False
+        mock_client_instance.write_registers.return_value = mock_response
+        mock_client_instance.is_socket_open.return_value = True
+
+        conn = ModbusConnector("localhost", 502, 1)
+
+        assert conn.write_registers([1, 2, 3], 32600) is True
+        mock_client_instance.write_registers.assert_called_once_with(32600, [1, 2, 3], slave=1)
+
+
 def test_write_register_not_connected():
     """Test write_register when not connected"""
     with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
@@ -266,3 +283,115 @@ def test_multiple_register_slices():
 
         assert success is True
         assert result == [100, 200, 300, 400, 500]
+
+
+def test_requests_are_served_by_one_worker_thread():
+    """Concurrent callers share the connection, every transaction runs on the worker"""
+    with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
+        threads = set()
+        mock_client_instance = MagicMock()
+        mock_client.return_value = mock_client_instance
+        mock_client_instance.is_socket_open.return_value = True
+
+        def read_input_registers(address, count, **kwargs):
+            threads.add(threading.current_thread().name)
+            response = MagicMock()
+            response.isError.return_value = False
+            response.registers = [address] * count
+            return response
+
+        mock_client_instance.read_input_registers.side_effect = read_input_registers
+        conn = ModbusConnector("localhost", 502, 1)
+
+        results = []
+        callers = [threading.Thread(target=lambda i=i: results.append(conn.read_input_registers([RegisterSlice(500 + i, 0, 2)], 2))) for i in range(10)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+
+        assert sorted(r[1][0] for r in results) == list(range(500, 510))
+        assert len(threads) == 1
+        assert threads.pop().startswith("pysolarfocus-modbus-")
+        conn.close()
+
+
+def test_writes_are_served_before_polling():
+    """Queued requests are served by priority, then in order of submission"""
+    with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
+        mock_client.return_value = MagicMock()
+        conn = ModbusConnector("localhost", 502, 1)
+        order = []
+        release = threading.Event()
+
+        blocker = conn.submit(release.wait, 5, priority=RequestPriority.POLL)
+        futures = [
+            conn.submit(order.append, "poll 1", priority=RequestPriority.POLL),
+            conn.submit(order.append, "interactive", priority=RequestPriority.INTERACTIVE),
+            conn.submit(order.append, "poll 2", priority=RequestPriority.POLL),
+            conn.submit(order.append, "write", priority=RequestPriority.WRITE),
+        ]
+        release.set()
+        for future in [blocker] + futures:
+            future.result(timeout=5)
+
+        assert order == ["write", "interactive", "poll 1", "poll 2"]
+        conn.close()
+
+
+def test_submit_returns_future_with_result_or_exception():
+    with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
+        mock_client_instance = MagicMock()
+        mock_client.return_value = mock_client_instance
+        mock_client_instance.is_socket_open.return_value = False
+        conn = ModbusConnector("localhost", 502, 1)
+
+        assert conn.submit_write_register(1, 32000).result(timeout=5) is False
+        assert conn.submit_read_holding_registers([RegisterSlice(32000, 0, 1)], 1).result(timeout=5) == (False, None)
+
+        def fail():
+            raise ValueError("failed")
+
+        future = conn.submit(fail)
+        try:
+            future.result(timeout=5)
+            assert False, "Should raise ValueError"
+        except ValueError:
+            pass
+        conn.close()
+        mock_client_instance.close.assert_called_once()
+
+
+def test_requests_submitted_while_closing_wait_for_the_worker():
+    """A submit during close does not start a second worker next to the stopping one"""
+    with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
+        mock_client_instance = MagicMock()
+        mock_client.return_value = mock_client_instance
+        conn = ModbusConnector("localhost", 502, 1)
+        events = []
+        release = threading.Event()
+
+        def running():
+            events.append(("run", threading.current_thread()))
+            release.wait(5)
+
+        conn.submit(running)
+        while not events:
+            time.sleep(0.01)
+        old_worker = events[0][1]
+        mock_client_instance.close.side_effect = lambda: events.append(("close", old_worker.is_alive()))
+        closer = threading.Thread(target=conn.close)
+        closer.start()
+        time.sleep(0.05)
+
+        late = threading.Thread(target=lambda: conn.submit(lambda: events.append(("late", threading.current_thread()))).result(5))
+        late.start()
+        time.sleep(0.05)
+        assert len(events) == 1
+
+        release.set()
+        closer.join(5)
+        late.join(5)
+        assert events[1] == ("close", False)
+        assert events[2][0] == "late" and events[2][1] is not old_worker
+        conn.close()
@@ -0,0 +1,86 @@
+"""Tests for MqttPublisher"""
+import json
+from unittest.mock import patch
+
+from pysolarfocus.mqtt import MqttPublisher
+
+
+class Broker:
+    """Stand-in of a broker, keeping the retained messages and every publish"""
+
+    def __init__(self):
+        self.retained = {}
+        self.published = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append(topic)
+        if retain:
+            self.retained[topic] = payload
+
+
+def test_discovery_and_status(api):
+    broker = Broker()
+    publisher = MqttPublisher(api, broker, node_id="home")
+    publisher.start()
+
+    config = json.loads(broker.retained["homeassistant/sensor/home/heating_circuits_0_supply_temperature/config"])
+    assert config["state_topic"] == "solarfocus/heating_circuits/0/supply_temperature"
+    assert config["unique_id"] == "home_heating_circuits_0_supply_temperature"
+    assert config["availability_topic"] == "solarfocus/status"
+    assert "homeassistant/sensor/home/heatpump_cop_heating/config" in broker.retained
+    assert broker.retained["solarfocus/status"] == "online"
+    assert publisher.discovery() is publisher.discovery()
+
+    publisher.stop()
+    assert broker.retained["solarfocus/status"] == "offline"
+
+
+def test_only_changes_are_published(api):
+    broker = Broker()
+    MqttPublisher(api, broker, discovery_prefix=None).start()
+    api.update_heatpump()
+    assert broker.retained["solarfocus/heatpump/supply_temperature"] == "0.0"
+
+    broker.published.clear()
+    api.update_heatpump()
+    assert broker.published == []
+
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [215] * count)
+    api.update_heatpump()
+    assert broker.retained["solarfocus/heatpump/supply_temperature"] == "21.5"
+    assert all(topic.startswith("solarfocus/heatpump/") for topic in broker.published)
+
+
+def test_heartbeat_publishes_everything(api):
+    broker = Broker()
+    publisher = MqttPublisher(api, broker, discovery_prefix=None, heartbeat=60)
+    publisher.start()
+    api.update_heatpump()
+    api.update_photovoltaic()
+    broker.published.clear()
+
+    with patch("pysolarfocus.mqtt.time.monotonic", return_value=10**9):
+        api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [1] * count)
+        api.update_photovoltaic()
+    assert "solarfocus/heatpump/supply_temperature" in broker.published
+    assert broker.retained["solarfocus/photovoltaic/overcharge_active"] == "1"
+
+
+def test_heartbeat_republishes_unchanged_values(api):
+    broker = Broker()
+    publisher = MqttPublisher(api, broker, discovery_prefix=None, heartbeat=60)
+    publisher.start()
+    api.update_heatpump()
+    broker.published.clear()
+
+    api.update_heatpump()
+    assert broker.published == []
+    with patch("pysolarfocus.mqtt.time.monotonic", return_value=10**9):
+        api.update_heatpump()
+    assert "solarfocus/heatpump/supply_temperature" in broker.published
+
+    publisher.stop()
+    broker.published.clear()
+    with patch("pysolarfocus.mqtt.time.monotonic", return_value=10**10):
+        api.update_heatpump()
+    assert broker.published == []
@@ -104,3 +104,9 @@ def test_performance_calculator_zero_values():
 
     # Should return zero
     assert calc.value == 0.0
+
+
+def test_performance_calculator_is_slotted():
+    """PerformanceCalculators are kept compact, without a per-instance __dict__"""
+    calc = PerformanceCalculator(DataValue(address=0), DataValue(address=1))
+    assert not hasattr(calc, "__dict__")
@@ -0,0 +1,80 @@
+"""Tests for PlantLayout"""
+import json
+from unittest.mock import MagicMock
+
+from pysolarfocus import ApiVersions, Systems, __version__
+from pysolarfocus.components.base.counter import Counter
+from pysolarfocus.components.base.enums import RegisterTypes
+from pysolarfocus.components.heating_circuit import HeatingCircuit, TherminatorHeatingCircuit
+from pysolarfocus.plant_layout import PlantLayout
+
+COUNTS = (2, 1, 1, 1, 1, 1, 1)
+
+
+def _registers(components):
+    return {name: [(n, v.get_absolute_address()) for c in (comps if isinstance(comps, list) else [comps]) for t in RegisterTypes for n, v in c._get_values(t)] for name, comps in components.items()}
+
+
+def test_layout_is_memoized():
+    layout = PlantLayout.get(Systems.VAMPAIR, ApiVersions.V_25_030, COUNTS)
+    assert PlantLayout.get(Systems.VAMPAIR, ApiVersions.V_25_030, COUNTS) is layout
+    assert PlantLayout.get(Systems.VAMPAIR, ApiVersions.V_23_010, COUNTS) is not layout
+
+
+def test_layout_instantiates_independent_components():
+    layout = PlantLayout.get(Systems.THERMINATOR, ApiVersions.V_25_030, COUNTS)
+    modbus = MagicMock()
+    first = layout.instantiate(modbus)
+    second = layout.instantiate(modbus)
+
+    assert isinstance(first["heating_circuits"][0], TherminatorHeatingCircuit)
+    assert [hc.input_address for hc in first["heating_circuits"]] == [1100, 1150]
+    assert "circulations" in first and "differential_modules" in first
+    assert first["heating_circuits"][0].mode is not second["heating_circuits"][0].mode
+    assert first["heating_circuits"][0].mode.modbus is modbus
+    assert _registers(first) == _registers(second)
+
+
+def test_layout_without_version_specific_components():
+    components = PlantLayout.get(Systems.VAMPAIR, ApiVersions.V_21_140, COUNTS).instantiate(MagicMock())
+    assert "fresh_water_modules" not in components
+    assert "circulations" not in components
+
+
+def test_cache_file_round_trip(tmp_path):
+    filename = str(tmp_path / "layouts.json")
+    expected = _registers(PlantLayout.get(Systems.VAMPAIR, ApiVersions.V_26_020, (3, 0, 2, 1, 1, 1, 4)).instantiate(MagicMock()))
+    PlantLayout.save_cache(filename)
+
+    PlantLayout.clear()
+    assert PlantLayout.load_cache(filename) is True
+    layout = PlantLayout.get(Systems.VAMPAIR, ApiVersions.V_26_020, (3, 0, 2, 1, 1, 1, 4))
+    components = layout.instantiate(MagicMock())
+
+    assert _registers(components) == expected
+    assert components["buffers"] == []
+    assert isinstance(components["heating_circuits"][0], HeatingCircuit)
+    assert components["heatpump"].cop_heating.nominator is components["heatpump"].thermal_power_heating
+    assert components["heating_circuits"][0].indoor_humidity_external.write_multiplier == 1
+    assert isinstance(components["heatpump"].thermal_energy_total, Counter)
+
+
+def test_cache_file_of_another_version_is_ignored(tmp_path):
+    filename = tmp_path / "layouts.json"
+    filename.write_text(json.dumps({"version": "0.0.0", "schemas": [], "layouts": []}))
+    assert PlantLayout.load_cache(str(filename)) is False
+
+
+def test_cache_file_cannot_reference_other_classes(tmp_path):
+    filename = tmp_path / "layouts.json"
+    content = {
+        "version": __version__,
+        "schemas": [{"input_address": 0, "holding_address": -1, "fields": [], "calculators": []}],
+        "layouts": [{"system": "Vampair", "api_version": "25.030", "counts": [1] * 7, "groups": {"heatpump": ["subprocess:Popen", 0, -1, 0]}}],
+    }
+    filename.write_text(json.dumps(content))
+    assert PlantLayout.load_cache(str(filename)) is False
+
+
+def test_missing_cache_file(tmp_path):
+    assert PlantLayout.load_cache(str(tmp_path / "missing.json")) is False
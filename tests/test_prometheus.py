@@ -0,0 +1,85 @@
+"""Tests for PrometheusExporter"""
+from http.client import HTTPConnection
+
+import pytest
+
+from pysolarfocus import Systems
+from pysolarfocus.prometheus import CONTENT_TYPE, PrometheusExporter
+
+
+@pytest.fixture
+def api(make_plant):
+    return make_plant(heating_circuit_count=2)
+
+
+def test_values_are_exported_once_updated(api):
+    exporter = PrometheusExporter()
+    exporter.add_plant(api, {"plant": "home"})
+    assert exporter.exposition() == b""
+
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [215] * count)
+    api.update_heating()
+    exposition = exporter.exposition().decode()
+
+    assert "# TYPE solarfocus_supply_temperature gauge\n" in exposition
+    assert 'solarfocus_supply_temperature{system="Vampair",plant="home",component="heating_circuits",index="1"} 21.5\n' in exposition
+    assert 'solarfocus_mode{system="Vampair",plant="home",component="heating_circuits",index="0"} 0\n' in exposition
+    assert "heatpump" not in exposition
+
+
+def test_only_changed_values_are_rendered(api):
+    exporter = PrometheusExporter()
+    exporter.add_plant(api)
+    api.update_heatpump()
+    exposition = exporter.exposition()
+    assert exporter.exposition() is exposition
+
+    api.update_heatpump()
+    assert exporter.exposition() is exposition
+
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [10] * count)
+    api.update_heatpump()
+    assert exporter.exposition() is not exposition
+    assert 'solarfocus_supply_temperature{system="Vampair",component="heatpump",index="0"} 1.0\n' in exporter.exposition().decode()
+
+
+def test_metrics_of_plants_are_grouped(api, make_plant):
+    other = make_plant(system=Systems.THERMINATOR)
+    exporter = PrometheusExporter()
+    exporter.add_plant(api)
+    exporter.add_plant(other)
+    api.update_heating()
+    other.update_heating()
+
+    lines = exporter.exposition().decode().splitlines()
+    family = [line for line in lines if line.startswith("solarfocus_supply_temperature")]
+    assert len(family) == 3
+    assert lines.count("# TYPE solarfocus_supply_temperature gauge") == 1
+    assert lines.index("# TYPE solarfocus_supply_temperature gauge") == lines.index(family[0]) - 1
+
+    exporter.remove_plant(other)
+    assert 'system="Therminator"' not in exporter.exposition().decode()
+    other.update_heating()
+    assert 'system="Therminator"' not in exporter.exposition().decode()
+
+
+def test_metrics_endpoint(api):
+    exporter = PrometheusExporter("127.0.0.1", 0)
+    exporter.add_plant(api)
+    api.update_photovoltaic()
+    exporter.start()
+    try:
+        connection = HTTPConnection(*exporter.server_address, timeout=5)
+        connection.request("GET", "/metrics")
+        response = connection.getresponse()
+        assert (response.status, response.getheader("Content-Type")) == (200, CONTENT_TYPE)
+        assert response.read() == exporter.exposition()
+        connection.request("GET", "/other")
+        assert connection.getresponse().status == 404
+        connection.close()
+    finally:
+        exporter.stop()
+
+
+def test_listens_on_the_local_host_by_default():
+    assert PrometheusExporter().host == "127.0.0.1"
@@ -0,0 +1,118 @@
+"""Tests for the rate limiter"""
+import time
+import unittest.mock as mock
+from unittest.mock import MagicMock
+
+import pytest
+
+from pysolarfocus.component_manager import ComponentManager
+from pysolarfocus.components.base.register_slice import RegisterSlice
+from pysolarfocus.modbus_wrapper import ModbusConnector
+from pysolarfocus.rate_limiter import RateLimiter, RequestKind, TokenBucket
+
+
+def test_token_bucket_refills_up_to_its_burst():
+    bucket = TokenBucket(10.0, burst=5.0, now=0.0)
+    assert bucket.available(0.0) == 5.0
+    bucket.take(5.0, 0.0)
+    assert bucket.wait_time(2.0, 0.0) == pytest.approx(0.2)
+    assert bucket.available(0.1) == pytest.approx(1.0)
+    assert bucket.available(60.0) == 5.0
+    # More than the burst needs a full bucket, and leaves a debt
+    assert bucket.wait_time(8.0, 60.0) == 0.0
+    bucket.take(8.0, 60.0)
+    assert bucket.wait_time(1.0, 60.0) == pytest.approx(0.4)
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_limiter_paces_requests_and_keeps_reads_and_writes_apart():
+    with mock.patch("pysolarfocus.rate_limiter.time") as clock:
+        clock.now = 0.0
+        clock.monotonic.side_effect = lambda: clock.now
+        clock.sleep.side_effect = lambda seconds: setattr(clock, "now", clock.now + seconds)
+        limiter = RateLimiter(read_requests=2.0, read_registers=100.0, write_requests=1.0)
+
+        assert limiter.acquire(RequestKind.READ, 1, 50) == 0.0
+        assert limiter.acquire(RequestKind.READ, 1, 50) == 0.0
+        # The registers run out before the requests
+        assert limiter.acquire(RequestKind.READ, 1, 50) == pytest.approx(0.5)
+        assert limiter.waited == pytest.approx(0.5)
+        # Writes have a budget of their own
+        assert limiter.acquire(RequestKind.WRITE, 1, 1) == 0.0
+
+        assert not limiter.affordable(RequestKind.READ, 2, 10)
+        assert limiter.affordable(RequestKind.READ, 2, 10, within=1.0)
+
+
+def test_connector_waits_for_the_budget():
+    with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
+        client = mock_client.return_value
+        client.is_socket_open.return_value = True
+        response = MagicMock()
+        response.isError.return_value = False
+        response.registers = [1, 2]
+        client.read_input_registers.return_value = response
+        client.write_registers.return_value = response
+        limiter = MagicMock(spec=RateLimiter)
+        conn = ModbusConnector("localhost", 502, 1, rate_limiter=limiter)
+
+        assert conn.read_input_registers([RegisterSlice(500, 0, 2), RegisterSlice(510, 2, 2)], 4)[0]
+        assert conn.write_register(5, 32000)
+        assert [call.args for call in limiter.acquire.call_args_list] == [
+            (RequestKind.READ, 1, 2),
+            (RequestKind.READ, 1, 2),
+            (RequestKind.WRITE, 1, 1),
+        ]
+
+
+def test_writes_are_served_while_a_read_waits_for_the_budget():
+    with mock.patch("pysolarfocus.modbus_wrapper.ModbusClient") as mock_client:
+        client = mock_client.return_value
+        client.is_socket_open.return_value = True
+        response = MagicMock()
+        response.isError.return_value = False
+        response.registers = [1]
+        client.read_input_registers.return_value = response
+        client.write_registers.return_value = response
+        # One read per 0.2 seconds: the read of three slices takes 0.4 seconds
+        limiter = RateLimiter(read_requests=5.0, burst=0.2)
+        conn = ModbusConnector("localhost", 502, 1, rate_limiter=limiter)
+
+        read = conn.submit_read_input_registers([RegisterSlice(500 + i, i, 1) for i in range(3)], 3)
+        time.sleep(0.05)
+        write = conn.submit_write_register(5, 32000)
+        assert write.result(timeout=0.2) is True
+        assert not read.done()
+        assert read.result(timeout=1.0)[0]
+        assert limiter.waited > 0
+        conn.close()
+
+
+class SlicedComponent:
+    """Component reading one slice, spending the budget as the connector would"""
+
+    def __init__(self, limiter, registers, reads):
+        self.input_slices = [RegisterSlice(0, 0, registers)]
+        self.holding_slices = []
+        self.limiter = limiter
+        self.reads = reads
+
+    def update(self):
+        self.limiter.acquire(RequestKind.READ, 1, self.input_slices[0].count)
+        self.reads.append(self.input_slices[0].count)
+        return True
+
+
+def test_deadline_update_packs_reads_into_the_budget():
+    reads = []
+    connector = MagicMock()
+    limiter = connector.rate_limiter = RateLimiter(read_requests=None, read_registers=100.0, burst=0.3)
+    manager = ComponentManager(connector)
+    manager.components = {name: SlicedComponent(limiter, registers, reads) for name, registers in (("solar", 10), ("heatpump", 40), ("photovoltaic", 12))}
+    assert manager.read_cost("heatpump") == (1, 40)
+
+    # The budget holds 30 registers: after the photovoltaics the heat pump no longer fits, the solar does
+    manager.update_all(deadline=0.05)
+    assert reads == [12, 10]
+    assert manager.get_stale_components() == ["heatpump"]
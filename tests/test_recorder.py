@@ -0,0 +1,86 @@
+"""Tests for Recorder"""
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from pysolarfocus.recorder import Recorder
+
+
+@pytest.fixture
+def recorder(api, tmp_path):
+    recorder = Recorder(api, str(tmp_path / "history.db"))
+    yield recorder
+    recorder.close()
+
+
+def test_updates_are_recorded(api, recorder):
+    recorder.start()
+    with patch("pysolarfocus.recorder.time.time", side_effect=[100.0, 110.0]):
+        api.update_heatpump()
+        api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [215] * count)
+        api.update_heatpump()
+    recorder.flush()
+
+    assert "heatpump/supply_temperature" in recorder.paths
+    assert [value for _, value in recorder.range("heatpump/supply_temperature")] == [0.0, 21.5]
+    assert recorder.latest("heatpump/supply_temperature")[1] == 21.5
+    assert recorder.latest("heatpump/missing") is None
+
+
+def test_range_and_latest_queries(recorder):
+    recorder.start()
+    recorder.record({"heatpump/supply_temperature": 20.0, "heatpump/mode": 1}, timestamp=100.0)
+    recorder.record({"heatpump/supply_temperature": 21.0}, timestamp=110.0)
+    recorder.record({"heatpump/supply_temperature": 22.0}, timestamp=120.0)
+    recorder.flush()
+
+    assert recorder.range("heatpump/supply_temperature", 105.0, 120.0) == [(110.0, 21.0)]
+    assert recorder.range("heatpump/supply_temperature", 110.0) == [(110.0, 21.0), (120.0, 22.0)]
+    assert recorder.latest("heatpump/supply_temperature", at=115.0) == (110.0, 21.0)
+    assert recorder.latest("heatpump/mode", at=1000.0) == (100.0, 1)
+    assert recorder.latest("heatpump/supply_temperature", at=99.0) is None
+
+
+def test_database_is_compact_and_in_wal_mode(recorder):
+    recorder.start()
+    recorder.record({"heatpump/supply_temperature": 20.0}, timestamp=100.0)
+    recorder.stop()
+
+    connection = sqlite3.connect(recorder.filename)
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert connection.execute("SELECT series, time, value FROM samples").fetchall() == [(1, 100000, 20.0)]
+    connection.close()
+
+
+def test_recording_does_not_wait_for_the_writer(recorder):
+    recorder.start()
+    with patch.object(Recorder, "_Recorder__write_batch", side_effect=sqlite3.OperationalError("disk I/O error")):
+        recorder.record({"heatpump/supply_temperature": 20.0}, timestamp=100.0)
+        recorder.flush()
+    recorder.record({"heatpump/supply_temperature": 21.0}, timestamp=110.0)
+    recorder.flush()
+    assert recorder.range("heatpump/supply_temperature") == [(110.0, 21.0)]
+
+
+def test_flush_without_writer_writes_synchronously(recorder):
+    recorder.record({"heatpump/supply_temperature": 21.5}, 100.0)
+    recorder.flush()
+    assert recorder.range("heatpump/supply_temperature") == [(100.0, 21.5)]
+    # Nothing queued, nothing to wait for
+    recorder.flush()
+
+
+def test_schema_connection_is_closed(api, tmp_path):
+    connections = []
+    connect = sqlite3.connect
+
+    def tracked(*args, **kwargs):
+        connection = connect(*args, **kwargs)
+        connections.append(connection)
+        return connection
+
+    with patch("pysolarfocus.recorder.sqlite3.connect", side_effect=tracked):
+        Recorder(api, str(tmp_path / "history.db"))
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
@@ -0,0 +1,107 @@
+"""Tests for Rollups"""
+from unittest.mock import patch
+
+import pytest
+
+from pysolarfocus.recorder import Recorder
+from pysolarfocus.rollups import Rollup, Rollups
+
+
+def test_rollup_aggregates_each_resolution():
+    rollup = Rollup((60, 3600))
+    for timestamp, value in [(0, 4.0), (30, 2.0), (59, 6.0), (60, 1.0)]:
+        closed = rollup.add(timestamp, value)
+
+    assert [(resolution, bucket.start) for resolution, bucket in closed] == [(60, 0)]
+    minute = rollup.closed[60][0]
+    assert (minute.count, minute.min, minute.max, minute.mean, minute.last) == (3, 2.0, 6.0, 4.0, 6.0)
+    hour = rollup.open[3600]
+    assert (hour.start, hour.count, hour.min, hour.max, hour.last) == (0, 4, 1.0, 6.0, 1.0)
+    assert rollup.open[60].start == 60 and minute.delta == 0.0
+
+
+def test_rollup_counter_deltas():
+    rollup = Rollup((60,), counter=True)
+    # The increase up to the first sample is not counted
+    for timestamp, value, delta in [(0, 100.0, 7.0), (20, 102.0, 2.0), (40, 105.0, 3.0), (70, 1.0, 1.0), (90, 3.0, 2.0)]:
+        rollup.add(timestamp, value, delta)
+
+    assert rollup.closed[60][0].delta == 5.0
+    assert rollup.open[60].delta == 3.0
+    plain = Rollup((60,))
+    plain.add(0, 1.0)
+    plain.add(10, 2.0, 5.0)
+    assert plain.open[60].delta == 0.0
+
+
+def test_rollups_book_counter_rollovers(api):
+    rollups = Rollups(api, resolutions=(60,))
+    energy = api.heatpump.thermal_energy_total
+    for timestamp, raw in [(0.0, 0xFFFFFFF0), (30.0, 0x10)]:
+        energy.value = raw
+        energy.advance(timestamp)
+        rollups.record(["heatpump"], timestamp)
+
+    assert energy.rollovers == 1
+    assert rollups.current("heatpump/thermal_energy_total", 60).delta == pytest.approx(energy.scaled_delta)
+    assert energy.delta == 0x20
+
+
+def test_rollup_keeps_a_bounded_number_of_buckets():
+    rollup = Rollup((60,), keep=3)
+    for minute in range(10):
+        rollup.add(minute * 60, float(minute))
+    assert [bucket.start for bucket in rollup.closed[60]] == [360, 420, 480]
+
+
+@pytest.fixture
+def api(make_plant):
+    """A plant whose input registers read 1, 2, 3, ... in consecutive reads"""
+    api = make_plant()
+    values = iter(range(1, 1000))
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [next(values)] * count)
+    return api
+
+
+def test_rollups_aggregate_updates(api):
+    rollups = Rollups(api, resolutions=(60, 900)).attach()
+    with patch("pysolarfocus.rollups.time.time", side_effect=[0.0, 30.0, 60.0]):
+        for _ in range(3):
+            api.update_heatpump()
+
+    assert "heatpump/supply_temperature" in rollups.paths
+    closed, current = rollups.buckets("heatpump/supply_temperature", 60)
+    assert (closed.start, closed.count, current.start, current.count) == (0, 2, 60, 1)
+    assert [bucket.start for bucket in rollups.buckets("heatpump/supply_temperature", 60, include_open=False)] == [0]
+    assert rollups.buckets("heatpump/supply_temperature", 60, start=60)[0].start == 60
+    assert rollups.current("heatpump/supply_temperature", 900).count == 3
+    assert rollups.rollup("heatpump/thermal_energy_total").counter
+    assert not rollups.rollup("heatpump/supply_temperature").counter
+
+    with pytest.raises(ValueError):
+        rollups.buckets("heatpump/supply_temperature", 3600)
+    with pytest.raises(KeyError):
+        rollups.buckets("heatpump/missing", 60)
+    rollups.detach()
+    api.update_heatpump()
+    assert rollups.current("heatpump/supply_temperature", 900).count == 3
+
+
+def test_rollups_are_written_alongside_the_recorded_history(api, tmp_path):
+    recorder = Recorder(api, str(tmp_path / "history.db"))
+    recorder.start()
+    rollups = Rollups(api, resolutions=(60,), recorder=recorder)
+    for timestamp in (0.0, 30.0, 60.0):
+        api.update_heatpump()
+        rollups.record(["heatpump"], timestamp)
+    recorder.flush()
+
+    stored = recorder.rollups("heatpump/supply_temperature", 60)
+    assert [(start, count) for start, count, *_ in stored] == [(0, 2)]
+    assert [(bucket.start, bucket.count) for bucket in rollups.buckets("heatpump/supply_temperature", 60)] == [(0, 2), (60, 1)]
+
+    rollups.detach()
+    recorder.flush()
+    assert [start for start, *_ in recorder.rollups("heatpump/supply_temperature", 60)] == [0, 60]
+    assert recorder.latest("heatpump/supply_temperature") is not None
+    recorder.close()
@@ -0,0 +1,86 @@
+"""Tests for the rule engine"""
+import pytest
+
+from pysolarfocus.rules import ACTIVE, CLEARING, INACTIVE, PENDING, Rule, RuleEngine
+
+
+def test_compile_threshold_with_hysteresis():
+    rule = Rule.compile("buffer_cold", "buffers/0/top_temperature < 40", hysteresis=2)
+    assert rule.inputs == ("buffers/0/top_temperature",)
+
+    assert rule.evaluate([41.0], 0) is None
+    assert rule.evaluate([39.5], 1) is True
+    # Back above the threshold, but not past the hysteresis
+    assert rule.evaluate([41.0], 2) is None and rule.active
+    assert rule.evaluate([42.0], 3) is False and rule.state == INACTIVE
+
+    with pytest.raises(ValueError):
+        Rule.compile("broken", "buffers/0/top_temperature is cold")
+    with pytest.raises(ValueError):
+        Rule.compile("broken", "biomassboiler/door_contact == 1", hysteresis=1)
+
+
+def test_delays_debounce_raising_and_clearing():
+    rule = Rule.compile("overheat", "solar/collector_temperature_1 > 120", delay=60, clear_delay=30)
+    assert rule.evaluate([130], 0) is None and rule.state == PENDING
+    assert rule.evaluate([110], 30) is None and rule.state == INACTIVE
+    assert rule.evaluate([130], 40) is None
+    assert rule.evaluate([130], 100) is True and rule.state == ACTIVE
+    assert rule.evaluate([100], 110) is None and rule.state == CLEARING
+    assert rule.evaluate([125], 120) is None and rule.state == ACTIVE
+    assert rule.evaluate([100], 130) is None
+    assert rule.evaluate([100], 160) is False
+
+
+def test_engine_only_evaluates_rules_of_changed_values(api):
+    engine = RuleEngine(api)
+    calls = []
+    engine.add(Rule("supply_hot", ["heatpump/supply_temperature"], lambda supply: calls.append(supply) or supply > 60))
+    engine.threshold("buffer_cold", "buffers/0/top_temperature < 40", delay=120)
+    alerts = []
+    engine.add_listener(alerts.append)
+    engine.add_listener(lambda alert: 1 / 0)
+
+    api.heatpump.supply_temperature.value = 650
+    assert [(a.rule, a.active) for a in engine.evaluate(["heatpump"], 0.0)] == [("supply_hot", True)]
+    engine.evaluate(["heatpump"], 1.0)
+    engine.evaluate(["buffers"], 2.0)
+    assert len(calls) == 1
+    assert engine.active == ["supply_hot"]
+
+    # The buffer rule waits for its delay without its value changing
+    engine.evaluate(["buffers"], 10.0)
+    engine.evaluate(["heatpump"], 131.0)
+    assert engine.active == ["supply_hot", "buffer_cold"]
+    assert alerts[-1].rule == "buffer_cold" and alerts[-1].values == {"buffers/0/top_temperature": 0.0}
+
+    api.heatpump.supply_temperature.value = 500
+    assert [(a.rule, a.active) for a in engine.evaluate(["heatpump"], 140.0)] == [("supply_hot", False)]
+
+    with pytest.raises(ValueError):
+        engine.threshold("buffer_cold", "buffers/0/top_temperature < 30")
+    with pytest.raises(KeyError):
+        engine.threshold("missing", "buffers/0/missing < 30")
+    engine.remove("buffer_cold")
+    assert [rule.name for rule in engine.rules] == ["supply_hot"]
+    assert engine.evaluate(["buffers"], 200.0) == []
+
+
+def test_rule_added_on_a_tracked_value_is_evaluated(api):
+    engine = RuleEngine(api)
+    engine.threshold("a", "heatpump/supply_temperature > 100")
+    api.heatpump.supply_temperature.value = 650
+    engine.evaluate(["heatpump"], 0.0)
+
+    engine.threshold("b", "heatpump/supply_temperature > 60")
+    assert [(a.rule, a.active) for a in engine.evaluate(["heatpump"], 1.0)] == [("b", True)]
+    assert engine.active == ["b"]
+
+
+def test_engine_follows_updates(api):
+    engine = RuleEngine(api).attach()
+    engine.threshold("supply_hot", "heatpump/supply_temperature > 60")
+    api.modbus_connector.read_input_registers.side_effect = lambda slices, count, **kwargs: (True, [700] * count)
+    api.update_heatpump()
+    assert engine.active == ["supply_hot"]
+    engine.detach()
@@ -0,0 +1,86 @@
+"""Tests for PlantSnapshot"""
+import pytest
+
+from pysolarfocus.snapshot import PlantSnapshot
+
+
+@pytest.fixture
+def api(make_plant):
+    return make_plant(heating_circuit_count=2)
+
+
+def test_values_appear_once_updated(api):
+    snapshot = PlantSnapshot(api)
+    assert snapshot.get() == {}
+    assert snapshot.render("heatpump") is None
+
+    api.heating_circuits[1].supply_temperature.value = 215
+    changes = snapshot.refresh(["heating_circuits"])
+
+    assert changes["heating_circuits/1/supply_temperature"] == 21.5
+    assert snapshot.get("heating_circuits/1/supply_temperature") == 21.5
+    assert snapshot.get("heating_circuits/0")["supply_temperature"] == 0.0
+    assert snapshot.get("heating_circuits/2") is None
+    assert snapshot.values["heating_circuits/1/supply_temperature"] == 21.5
+
+
+def test_only_changed_values_are_reported(api):
+    snapshot = PlantSnapshot(api)
+    snapshot.refresh(["heatpump"])
+    assert snapshot.refresh(["heatpump"]) == {}
+
+    api.heatpump.thermal_power_heating.value = 9000
+    api.heatpump.electrical_power.value = 2000
+    assert snapshot.refresh(["heatpump"]) == {"heatpump/thermal_power_heating": 9000, "heatpump/electrical_power": 2000, "heatpump/cop_heating": 4.5}
+
+
+def test_etags_change_with_values_below_them(api):
+    snapshot = PlantSnapshot(api)
+    snapshot.refresh(["heatpump", "heating_circuits"])
+    plant, heatpump, circuit = snapshot.etag(), snapshot.etag("heatpump"), snapshot.etag("heating_circuits/0")
+    rendered = snapshot.render("heatpump")
+    assert snapshot.render("heatpump") is rendered
+
+    api.heatpump.supply_temperature.value = 300
+    snapshot.refresh(["heatpump"])
+
+    assert snapshot.etag() != plant
+    assert snapshot.etag("heatpump") != heatpump
+    assert snapshot.etag("heating_circuits/0") == circuit
+    assert snapshot.render("heatpump") != rendered
+    assert snapshot.etag("missing") is None
+
+
+def test_listeners_get_changes(api):
+    snapshot = PlantSnapshot(api).attach()
+    changes = []
+    snapshot.add_listener(changes.append)
+    api.update_photovoltaic()
+    api.update_photovoltaic()
+    snapshot.detach()
+
+    assert len(changes) == 1
+    assert "photovoltaic/grid_import" in changes[0]
+
+
+def test_subscriptions_start_with_current_values_and_merge_changes(api):
+    snapshot = PlantSnapshot(api)
+    snapshot.refresh(["heatpump", "heating_circuits"])
+    subscription = snapshot.subscribe(["heatpump/supply_temperature", "heating_circuits/1"])
+
+    initial = subscription.get(timeout=0)
+    assert "heatpump/supply_temperature" in initial
+    assert "heating_circuits/1/mode" in initial
+    assert not any(path.startswith("heating_circuits/0") for path in initial)
+    assert subscription.get(timeout=0) == {}
+
+    api.heatpump.supply_temperature.value = 100
+    api.heatpump.outdoor_temperature.value = 100
+    snapshot.refresh(["heatpump"])
+    api.heatpump.supply_temperature.value = 200
+    snapshot.refresh(["heatpump"])
+    assert subscription.get(timeout=0) == {"heatpump/supply_temperature": 20.0}
+
+    snapshot.unsubscribe(subscription)
+    assert subscription.get(timeout=1) is None
+    assert snapshot.subscriptions == []